@@ -0,0 +1,288 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import mm_python as mmpy
+
+# Performance benchmarks of the Lennard-Jones code: full-box and single
+# particle energies over N = 10^2 to 10^5, a MC sweep, a MD step, xyz
+# output and input, and cutoff and density sweeps. Configurations are
+# jittered cubic lattices built from a fixed seed, so every run measures
+# the same work.
+#
+# Results are written to JSON and compared with a baseline (by default
+# baseline.json next to this script). Timings are the best of several
+# repeats, in seconds per call. The comparison fails (exit status 1) if a
+# benchmark is slower than the baseline by more than the threshold.
+#
+#   python benchmarks/run_benchmarks.py --quick --output results.json
+#   cp results.json benchmarks/baseline.json      # store a new baseline
+
+baselineFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "baseline.json")
+
+def makeBox(numParticles, density = 0.8, seed = 2019, temperature = None):
+    """
+    Returns a box and its manager with numParticles on a jittered cubic
+    lattice at a reduced density, with velocities if a temperature is
+    given.
+    """
+    rng = np.random.RandomState(seed)
+    myBox = mmpy.Box(length = np.cbrt(numParticles / density))
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.addParticles(n = numParticles, method = "lattice",
+            mass = 39.0)
+    myBox.coordinates = myBox.coordinates \
+            + rng.uniform(-0.05, 0.05, myBox.coordinates.shape)
+    myBox.forces = np.zeros((numParticles, 3))
+    if temperature is not None:
+        myBox.velocities = rng.normal(0.0, np.sqrt(temperature),
+                (numParticles, 3))
+        myBoxManager.scaleVelocities(temperature)
+    return myBox, myBoxManager
+
+def timeIt(function, repeat, number = 1, items = None):
+    """
+    Times number calls of function, repeat times, and returns the best and
+    the median time per call (and items per second if items is given).
+    """
+    function()
+    times = []
+    for iRepeat in range(0, repeat):
+        start = time.perf_counter()
+        for iCall in range(0, number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    result = dict(seconds = min(times), median = float(np.median(times)),
+            repeat = repeat, number = number)
+    if items is not None:
+        result["itemsPerSecond"] = items / result["seconds"]
+    return result
+
+def benchTotalEnergy(options):
+    results = {}
+    for numParticles in options.sizes:
+        myBox, myBoxManager = makeBox(numParticles)
+        cutoff = min(2.5, 0.5 * myBox.length)
+        for useCellList in (True, False):
+            # All-pairs evaluations of 10^5 particles take minutes
+            if not useCellList and numParticles > 10**4:
+                continue
+            ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff),
+                    useCellList = useCellList, backend = options.backend)
+            name = "totalEnergy/%s/N=%d" % ("cellList" if useCellList
+                    else "allPairs", numParticles)
+            results[name] = timeIt(lambda: ffManager
+                    .getTotalPairEnergyAndVirial(myBox, populateForces = True),
+                    options.repeat, items = numParticles)
+    return results
+
+def benchMolEnergy(options):
+    results = {}
+    numCalls = 100
+    for numParticles in options.sizes:
+        myBox, myBoxManager = makeBox(numParticles)
+        cutoff = min(2.5, 0.5 * myBox.length)
+        particles = np.random.RandomState(7).randint(numParticles,
+                size = numCalls)
+        for useCellList in (True, False):
+            ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff),
+                    useCellList = useCellList, backend = options.backend)
+            def function():
+                for iParticle in particles:
+                    ffManager.getMolPairEnergyAndVirial(iParticle, myBox)
+            name = "molEnergy/%s/N=%d" % ("cellList" if useCellList
+                    else "allPairs", numParticles)
+            results[name] = timeIt(function, options.repeat, items = numCalls)
+    return results
+
+def benchMonteCarlo(options, directory):
+    numParticles = options.stepSize
+    myBox, myBoxManager = makeBox(numParticles)
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(2.5),
+            useCellList = True, backend = options.backend)
+    mySimulation = mmpy.Simulation(method = "monteCarlo", temperature = 0.9,
+            steps = 0, printProp = numParticles, printXYZ = 10**9,
+            maxDisp = 0.1, ffManager = ffManager, boxManager = myBoxManager,
+            trajectoryFile = os.path.join(directory, "mc.xyz"),
+            verbose = False)
+    np.random.seed(11)
+    mySimulation.setup()
+    # One sweep is one trial move per particle
+    result = timeIt(lambda: mySimulation.runSteps(numParticles),
+            options.repeat, items = numParticles)
+    mySimulation.finish()
+    return {"mcSweep/N=%d" % numParticles: result}
+
+def benchMolecularDynamics(options, directory):
+    results = {}
+    numParticles = options.stepSize
+    for skin in (None, 0.3):
+        myBox, myBoxManager = makeBox(numParticles, temperature = 0.9)
+        ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(2.5),
+                useCellList = True, skin = skin, backend = options.backend)
+        myIntegrator = mmpy.VelocityVerlet(timeStep = 0.002, box = myBox,
+                backend = options.backend)
+        mySimulation = mmpy.Simulation(method = "molecularDynamics",
+                temperature = 0.9, steps = 0, printProp = 100,
+                printXYZ = 10**9, ffManager = ffManager,
+                boxManager = myBoxManager, integrator = myIntegrator,
+                scaleFreq = 10, trajectoryFile = os.path.join(directory,
+                "md.xyz"), verbose = False)
+        mySimulation.setup()
+        name = "mdStep/%s/N=%d" % ("cellList" if skin is None
+                else "verletList", numParticles)
+        results[name] = timeIt(lambda: mySimulation.runSteps(10),
+                options.repeat, items = 10)
+        results[name]["seconds"] /= 10
+        results[name]["median"] /= 10
+        mySimulation.finish()
+    return results
+
+def benchXYZ(options, directory):
+    numParticles = options.stepSize
+    numFrames = 20
+    myBox, myBoxManager = makeBox(numParticles)
+    fileName = os.path.join(directory, "frames.xyz")
+
+    def write():
+        with open(fileName, "w") as trajectory:
+            for iFrame in range(0, numFrames):
+                myBoxManager.printXYZ(trajectory)
+
+    def read():
+        readBoxManager = mmpy.BoxManager(mmpy.Box(myBox.length))
+        readBoxManager.getConfigFromFile(restartFile = fileName)
+
+    results = {}
+    results["printXYZ/N=%d" % numParticles] = timeIt(write, options.repeat,
+            items = numFrames)
+    results["getConfigFromFile/N=%d" % numParticles] = timeIt(read,
+            options.repeat, items = numFrames)
+    return results
+
+def benchSweeps(options):
+    results = {}
+    numParticles = options.stepSize
+    for cutoff in (2.0, 2.5, 3.0, 3.5, 4.0):
+        myBox, myBoxManager = makeBox(numParticles)
+        if cutoff > 0.5 * myBox.length:
+            continue
+        ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff),
+                useCellList = True, backend = options.backend)
+        results["cutoffSweep/rc=%.1f/N=%d" % (cutoff, numParticles)] = \
+                timeIt(lambda: ffManager.getTotalPairEnergyAndVirial(myBox,
+                    populateForces = True), options.repeat)
+    for density in (0.2, 0.4, 0.6, 0.8, 1.0):
+        myBox, myBoxManager = makeBox(numParticles, density = density)
+        cutoff = min(2.5, 0.5 * myBox.length)
+        ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff),
+                useCellList = True, backend = options.backend)
+        results["densitySweep/rho=%.1f/N=%d" % (density, numParticles)] = \
+                timeIt(lambda: ffManager.getTotalPairEnergyAndVirial(myBox,
+                    populateForces = True), options.repeat)
+    return results
+
+def runBenchmarks(options):
+    """
+    Runs the selected groups of benchmarks and returns the report.
+    """
+    groups = dict(totalEnergy = lambda directory: benchTotalEnergy(options),
+            molEnergy = lambda directory: benchMolEnergy(options),
+            mcSweep = lambda directory: benchMonteCarlo(options, directory),
+            mdStep = lambda directory: benchMolecularDynamics(options,
+                directory),
+            xyz = lambda directory: benchXYZ(options, directory),
+            sweeps = lambda directory: benchSweeps(options))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in options.groups:
+            print("Running %s..." % name, file = sys.stderr)
+            results.update(groups[name](directory))
+    metadata = dict(date = datetime.datetime.now().isoformat(),
+            python = platform.python_version(), numpy = np.__version__,
+            platform = platform.platform(), processor = platform.processor(),
+            cpuCount = os.cpu_count(), backend = str(options.backend),
+            repeat = options.repeat)
+    return dict(metadata = metadata, results = results)
+
+def compare(report, baseline, threshold):
+    """
+    Prints the ratio current/baseline of every benchmark in both reports
+    and returns the names of the benchmarks slower than 1 + threshold.
+    """
+    regressions = []
+    print("%-36s %12s %12s %8s" % ("benchmark", "baseline", "current",
+        "ratio"))
+    for name, result in sorted(report["results"].items()):
+        if name not in baseline["results"]:
+            print("%-36s %12s %12.4g %8s" % (name, "-", result["seconds"],
+                "new"))
+            continue
+        reference = baseline["results"][name]["seconds"]
+        ratio = result["seconds"] / reference
+        flag = ""
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print("%-36s %12.4g %12.4g %8.2f%s" % (name, reference,
+            result["seconds"], ratio, flag))
+    return regressions
+
+def parseArguments(arguments = None):
+    parser = argparse.ArgumentParser(description = "Lennard-Jones "
+            "performance benchmarks.")
+    parser.add_argument("--quick", action = "store_true",
+            help = "sizes up to 10^4 particles and 3 repeats")
+    parser.add_argument("--sizes", type = int, nargs = "+",
+            help = "particle numbers of the energy benchmarks "
+            "(default 100 1000 10000 100000)")
+    parser.add_argument("--step-size", dest = "stepSize", type = int,
+            default = 1000, help = "particle number of the MC, MD, xyz "
+            "and sweep benchmarks (default 1000)")
+    parser.add_argument("--repeat", type = int,
+            help = "repeats per benchmark (default 5, 3 with --quick)")
+    parser.add_argument("--groups", nargs = "+", default = ["totalEnergy",
+            "molEnergy", "mcSweep", "mdStep", "xyz", "sweeps"],
+            help = "benchmark groups to run")
+    parser.add_argument("--backend", default = "numpy",
+            help = "compute backend (default numpy)")
+    parser.add_argument("--output", help = "write the results to this "
+            "JSON file")
+    parser.add_argument("--baseline", default = baselineFile,
+            help = "JSON file to compare with (default baseline.json next "
+            "to this script, skipped if missing)")
+    parser.add_argument("--threshold", type = float, default = 0.1,
+            help = "relative slowdown reported as a regression (default "
+            "0.1)")
+    options = parser.parse_args(arguments)
+    if options.sizes is None:
+        options.sizes = [100, 1000, 10000] if options.quick \
+                else [100, 1000, 10000, 100000]
+    if options.repeat is None:
+        options.repeat = 3 if options.quick else 5
+    return options
+
+if __name__ == "__main__":
+    options = parseArguments()
+    report = runBenchmarks(options)
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent = 2, sort_keys = True)
+
+    regressions = []
+    if options.baseline and os.path.exists(options.baseline):
+        with open(options.baseline) as baseline:
+            regressions = compare(report, json.load(baseline),
+                    options.threshold)
+    else:
+        for name, result in sorted(report["results"].items()):
+            print("%-36s %12.4g" % (name, result["seconds"]))
+    if regressions:
+        print("%d benchmark(s) slower than the baseline" % len(regressions))
+        sys.exit(1)
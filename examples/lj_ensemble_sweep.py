@@ -0,0 +1,22 @@
+import numpy as np
+import mm_python as mmpy
+
+# Monte Carlo sweep over several (reducedTemperature, reducedDensity)
+# state points, run in parallel. Every point writes its own trajectory
+# to ensemble/pointNNN.xyz.
+
+statePoints = [(temperature, density)
+        for temperature in (0.9, 1.2, 1.5)
+        for density in (0.5, 0.7, 0.9)]
+
+if __name__ == "__main__":
+    ensemble = mmpy.Ensemble(statePoints, method = "monteCarlo",
+            numParticles = 100, steps = 50000, printProp = 1000,
+            printXYZ = 1000, seed = 12345)
+    results = ensemble.run()
+
+    for iPoint, (temperature, density) in enumerate(statePoints):
+        rows = ensemble.getStatePoint(iPoint)
+        production = rows[len(rows) // 2:]
+        print(temperature, density, np.mean(production["energy"]),
+                np.mean(production["pressure"]))
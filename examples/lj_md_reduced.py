@@ -31,13 +31,16 @@ mySimulation = mmpy.Simulation(
     method="molecularDynamics",
     temperature=reducedTemperature,
     steps=10000,
-    printProp=1,
+    printProp=100,
     printXYZ=10,
     ffManager=myForceFieldManager,
     boxManager=myBoxManager,
     integrator = myIntegrator,
-    scaleFreq = 10)
+    scaleFreq = 10,
+    propertyFile = "properties.csv",
+    propertyFreq = 1)
 
 mySimulation.run()
 ###
-####mySimulation.getRDF(trajectory = "trajectory.xyz", bins=50)
+r, gr = mySimulation.getRDF(trajectory = "trajectory.xyz", bins=50)
+np.savetxt("rdf.dat", np.column_stack((r, gr)), header = "r g(r)")
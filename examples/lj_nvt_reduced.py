@@ -34,4 +34,5 @@ mySimulation = mmpy.Simulation(
 
 mySimulation.run()
 
-#mySimulation.getRDF(trajectory = "trajectory.xyz", bins=50)
+r, gr = mySimulation.getRDF(trajectory = "trajectory.xyz", bins=50)
+np.savetxt("rdf.dat", np.column_stack((r, gr)), header = "r g(r)")
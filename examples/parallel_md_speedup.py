@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import numpy as np
+import mm_python as mmpy
+
+# Measures the speedup of the MD loop with the parallel backend on 1-N
+# cores. The NIST sample configuration is replicated 2x2x2 (6400 particles).
+# The largest number of workers defaults to the number of cores:
+#
+#   python parallel_md_speedup.py [maxWorkers]
+#
+# The multi-core speedup has not been measured: so far this script has
+# only been run on a single-core machine, where NumPy takes about
+# 0.48 s/step and the parallel backend 0.48-0.50 s/step for 1-4 workers
+# (no speedup is possible there, only the pool overhead shows). Run it on
+# a multi-core node to obtain the 1-N core speedups.
+
+numSteps = 20
+replicas = 2
+
+def makeBox():
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "test",
+        "lj_sample_config_periodic1.txt"))
+    shifts = np.array([[i, j, k] for i in range(replicas)
+                                 for j in range(replicas)
+                                 for k in range(replicas)]) * myBox.length
+    coordinates = (myBox.coordinates[np.newaxis, :, :]
+            + shifts[:, np.newaxis, :]).reshape(-1, 3)
+    myBox.length = replicas * myBox.length
+    myBox.coordinates = coordinates - myBox.length * \
+            np.round(coordinates / myBox.length)
+    myBox.numParticles = len(coordinates)
+    myBox.velocities = np.random.RandomState(1).normal(0.0, 0.9,
+            (myBox.numParticles, 3))
+    return myBox
+
+def runMD(backend):
+    myBox = makeBox()
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList = True,
+            backend = backend)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox,
+            backend = backend)
+    ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+    start = time.perf_counter()
+    for iStep in range(0, numSteps):
+        myIntegrator.updatePositions()
+        myIntegrator.updateVelocities()
+        ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+        myIntegrator.updateVelocities()
+    return (time.perf_counter() - start) / numSteps
+
+if __name__ == "__main__":
+    serial = runMD("numpy")
+    print("%-12s %10s %8s" % ("backend", "s/step", "speedup"))
+    print("%-12s %10.4f %8.2f" % ("numpy", serial, 1.0))
+    maxWorkers = int(sys.argv[1]) if len(sys.argv) > 1 \
+            else os.cpu_count() or 1
+    for numWorkers in range(1, maxWorkers + 1):
+        backend = mmpy.ParallelBackend(numWorkers = numWorkers)
+        try:
+            perStep = runMD(backend)
+        finally:
+            backend.close()
+        print("%-12s %10.4f %8.2f" % ("parallel-%d" % numWorkers, perStep,
+            serial / perStep))
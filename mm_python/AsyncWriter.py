@@ -0,0 +1,169 @@
+import queue
+import threading
+import numpy as np
+
+
+class Snapshot(object):
+    """
+    Copy of the state of a box at one step, handed to the output thread so
+    that the simulation can keep modifying the box.
+
+    Parameters
+    ----------
+    box : Box
+        Box to be copied.
+
+    """
+    def __init__(self, box):
+        self.length = box.length
+        self.numParticles = box.numParticles
+        self.coordinates = np.array(box.coordinates)
+        velocities = getattr(box, "velocities", None)
+        forces = getattr(box, "forces", None)
+        self.velocities = None if velocities is None else np.array(velocities)
+        self.forces = None if forces is None else np.array(forces)
+
+
+class AsyncWriter(object):
+    """
+    Moves the output of a simulation to a background thread. Frames are
+    copied into snapshots and handed, with any other output task (e.g.
+    printing properties), to the thread through a bounded queue. The
+    thread formats and writes them in order.
+
+    The simulation only waits when the queue is full, i.e. when output is
+    produced faster than the disk or terminal accept it (backpressure).
+    Exceptions raised in the thread are re-raised in the simulation at the
+    next call.
+
+    Properties
+    ----------
+    trajectory : XYZTrajectoryWriter or BinaryTrajectoryWriter
+        Wrapped trajectory writer.
+    maxQueueSize : integer
+        Maximum number of pending tasks.
+
+    Parameters
+    ----------
+    trajectory : XYZTrajectoryWriter or BinaryTrajectoryWriter
+        Writer used by the output thread.
+    maxQueueSize : integer, optional, default=16
+        Maximum number of pending tasks. Every pending frame holds a copy
+        of the coordinates (and velocities and forces, if written).
+
+    """
+    def __init__(self, trajectory, maxQueueSize = 16):
+        self.trajectory = trajectory
+        self.maxQueueSize = maxQueueSize
+        self.tasks = queue.Queue(maxsize = maxQueueSize)
+        self.error = None
+        self.thread = threading.Thread(target = self._work, daemon = True)
+        self.thread.start()
+
+    def _work(self):
+        """
+        Main loop of the output thread.
+        """
+        while True:
+            task = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                if self.error is None:
+                    function, args = task
+                    function(*args)
+            except BaseException as error:
+                self.error = error
+            finally:
+                self.tasks.task_done()
+
+    def checkError(self):
+        """
+        Re-raises an exception raised in the output thread.
+        """
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise Exception("Asynchronous output failed: %r" % error) \
+                    from error
+
+    def submit(self, function, *args):
+        """
+        Queues a call to function(*args) in the output thread.
+
+        Parameters
+        ----------
+        function: callable
+        Function to call.
+
+        args:
+        Arguments of the call. They must not be modified afterwards.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if a previous task failed.
+
+
+        Notes
+        ----------
+        Blocks only while the queue is full.
+
+        """
+        self.checkError()
+        self.tasks.put((function, args))
+
+    def write(self, box, step):
+        """
+        Queues a frame of a box. The box is copied, so it can be modified
+        as soon as the call returns.
+        """
+        self.submit(self.trajectory.write, Snapshot(box), step)
+
+    def flush(self):
+        """
+        Waits until every queued task has been executed.
+        """
+        self.tasks.join()
+        self.checkError()
+
+    def tell(self):
+        """
+        Flushes the queue and returns the size of the trajectory in bytes.
+        """
+        self.flush()
+        return self.trajectory.tell()
+
+    def close(self):
+        """
+        Executes the pending tasks, stops the thread and closes the
+        trajectory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if a task failed.
+
+
+        Notes
+        ----------
+        The trajectory is closed even if a task failed.
+
+        """
+        if self.thread.is_alive():
+            self.tasks.put(None)
+            self.thread.join()
+        self.trajectory.close()
+        self.checkError()
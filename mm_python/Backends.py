@@ -0,0 +1,701 @@
+import warnings
+from abc import ABC, abstractmethod
+import numpy as np
+from .ForceField import LennardJones
+
+
+_backends = {}
+
+
+def registerBackend(name, backendClass):
+    """
+    Registers a compute backend under a name, so that it can be selected
+    with getBackend (e.g. ForceFieldManager(..., backend=name)).
+
+    Parameters
+    ----------
+    name: string
+    Name of the backend.
+
+    backendClass: class
+    Child class of Backend.
+
+    Returns
+    ----------
+    None
+
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    Registering an existing name replaces the previous backend.
+
+    """
+    _backends[name] = backendClass
+
+
+def availableBackends():
+    """
+    Lists the registered backends that can run on this machine.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    ----------
+    names: list of strings
+    Names of the available backends.
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    None
+
+    """
+    return [name for name, backendClass in _backends.items()
+            if backendClass.isAvailable()]
+
+
+def getBackend(backend = "numpy", **kwargs):
+    """
+    Returns a compute backend.
+
+    Parameters
+    ----------
+    backend: string or Backend
+    Registered name of the backend, or an already constructed backend,
+    which is returned unchanged.
+
+    kwargs:
+    Arguments passed to the constructor of the backend.
+
+    Returns
+    ----------
+    backend: Backend
+    The compute backend.
+
+    Raises
+    ----------
+    Exception if the name is not registered.
+
+
+    Notes
+    ----------
+    If the requested backend cannot run on this machine (e.g. Numba is
+    not installed), a warning is issued and the NumPy backend is
+    returned instead.
+
+    """
+    if isinstance(backend, Backend):
+        return backend
+    if backend not in _backends:
+        raise Exception("Unknown backend '%s'. Registered backends: %s"
+                % (backend, ", ".join(_backends)))
+    backendClass = _backends[backend]
+    if not backendClass.isAvailable():
+        warnings.warn("Backend '%s' is not available, falling back to "
+                "'numpy'" % backend)
+        return NumpyBackend()
+    return backendClass(**kwargs)
+
+
+class Backend(ABC):
+    """
+    Abstract base class for compute backends. A backend provides the
+    kernels used by ForceFieldManager (pair energies, virials and forces)
+    and by the integrators (position and velocity updates). Every kernel
+    receives the manager or integrator it works for, so a single backend
+    can be shared between them. Child classes must implement every
+    abstract kernel.
+
+    Properties
+    ----------
+    name : str
+        Registered name of the backend.
+
+    """
+    name = None
+
+    @classmethod
+    def isAvailable(cls):
+        """
+        Returns True if the backend can run on this machine.
+        """
+        return True
+
+    @abstractmethod
+    def getMolPairEnergyAndVirial(self, ffManager, iParticle, box,
+            populateForces = False):
+        """
+        Kernel of ForceFieldManager.getMolPairEnergyAndVirial.
+        """
+
+    @abstractmethod
+    def getMolPairTerms(self, ffManager, iParticle, box, position = None):
+        """
+        Kernel of ForceFieldManager.getMolPairTerms.
+        """
+
+    def getMolPairMoveTerms(self, ffManager, iParticle, box, oldPosition):
+        """
+        Kernel of ForceFieldManager.getMolPairMoveTerms. By default the
+        particles near oldPosition are not searched (None).
+        """
+        return self.getMolPairTerms(ffManager, iParticle, box) + (None,)
+
+    @abstractmethod
+    def getTotalPairEnergyAndVirial(self, ffManager, box,
+            populateForces = False):
+        """
+        Kernel of ForceFieldManager.getTotalPairEnergyAndVirial.
+        """
+
+    @abstractmethod
+    def updatePositions(self, integrator):
+        """
+        Kernel of VelocityVerlet.updatePositions.
+        """
+
+    @abstractmethod
+    def updateVelocities(self, integrator):
+        """
+        Kernel of VelocityVerlet.updateVelocities.
+        """
+
+
+class NumpyBackend(Backend):
+    """
+    Vectorized NumPy backend. This is the default backend; it supports
+    every force field, cell lists, Verlet neighbor lists and tabulated
+    potentials.
+    """
+    name = "numpy"
+
+    def getMolPairEnergyAndVirial(self, ffManager, iParticle, box,
+            populateForces = False):
+        return ffManager._getMolPairEnergyAndVirial(iParticle, box,
+                populateForces)
+
+    def getMolPairTerms(self, ffManager, iParticle, box, position = None):
+        return ffManager._getMolPairTerms(iParticle, box, position)
+
+    def getMolPairMoveTerms(self, ffManager, iParticle, box, oldPosition):
+        return ffManager._getMolPairMoveTerms(iParticle, box, oldPosition)
+
+    def getTotalPairEnergyAndVirial(self, ffManager, box,
+            populateForces = False):
+        return ffManager._getTotalPairEnergyAndVirial(box, populateForces)
+
+    def updatePositions(self, integrator):
+        # In place, through the scratch array of the integrator, with the
+        # operations in the order of x + v dt + 0.5 f dt dt. Python floats
+        # keep the precision of the box arrays.
+        box = integrator.box
+        timeStep = float(integrator.timeStep)
+        length = float(box.length)
+        scratch = integrator.getScratch(box.coordinates)
+
+        np.multiply(box.velocities, timeStep, out=scratch)
+        box.coordinates += scratch
+        np.multiply(box.forces, 0.5, out=scratch)
+        scratch *= timeStep
+        scratch *= timeStep
+        box.coordinates += scratch
+
+        np.divide(box.coordinates, length, out=scratch)
+        np.round(scratch, out=scratch)
+        scratch *= length
+        box.coordinates -= scratch
+
+    def updateVelocities(self, integrator):
+        box = integrator.box
+        scratch = integrator.getScratch(box.velocities)
+        np.multiply(box.forces, 0.5, out=scratch)
+        scratch *= float(integrator.timeStep)
+        box.velocities += scratch
+
+
+class PythonBackend(Backend):
+    """
+    Reference backend written with plain Python loops over particles and
+    pairs. It is slow and meant for validating the other backends. Every
+    pair is evaluated directly from the force field (cell lists, neighbor
+    lists and tables are not used).
+    """
+    name = "python"
+
+    def getPairTerms(self, ForceField, rij2):
+        """
+        Computes the switched energy and virial of a single pair.
+
+        Parameters
+        ----------
+        ForceField: ForceField
+        Force field of the pair.
+
+        rij2: float
+        Squared distance between both particles.
+
+        Returns
+        ----------
+        ePair: float
+        Pair energy.
+
+        wPair: float
+        Pair virial.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        ePair = ForceField.evaluate(rij2)
+        wPair = ForceField.getPairVirial(rij2)
+        if ForceField.switch is not None and rij2 > ForceField.switch2:
+            S = ForceField.computeSwitch(rij2)
+            dS_dr = ForceField.computeSwitchDerivative(rij2)
+            wPair = wPair * S - ePair * np.sqrt(rij2) * dS_dr
+            ePair = ePair * S
+        return ePair, wPair
+
+    def getPairDisplacement(self, position, jPosition, length):
+        """
+        Returns the minimum-image displacement between two positions and
+        its squared norm.
+        """
+        rij = [0.0, 0.0, 0.0]
+        rij2 = 0.0
+        for dim in range(0, 3):
+            rij[dim] = position[dim] - jPosition[dim]
+            rij[dim] = rij[dim] - length * round(rij[dim] / length)
+            rij2 += rij[dim] * rij[dim]
+        return rij, rij2
+
+    def getMolPairTerms(self, ffManager, iParticle, box, position = None):
+        if position is None:
+            position = box.coordinates[iParticle]
+        ForceField = ffManager.ForceField
+        jParticles = []
+        ePairs = []
+        wPairs = []
+        for jParticle in range(0, box.numParticles):
+            if jParticle == iParticle: continue
+            rij, rij2 = self.getPairDisplacement(position,
+                    box.coordinates[jParticle], box.length)
+            if rij2 < ForceField.cutoff2:
+                ePair, wPair = self.getPairTerms(ForceField, rij2)
+                jParticles.append(jParticle)
+                ePairs.append(ePair)
+                wPairs.append(wPair)
+        return np.array(jParticles, dtype=int), np.array(ePairs), \
+                np.array(wPairs)
+
+    def getMolPairEnergyAndVirial(self, ffManager, iParticle, box,
+            populateForces = False):
+        ForceField = ffManager.ForceField
+        eTotal = 0.0
+        wTotal = 0.0
+        for jParticle in range(0, box.numParticles):
+            if jParticle == iParticle: continue
+            rij, rij2 = self.getPairDisplacement(box.coordinates[iParticle],
+                    box.coordinates[jParticle], box.length)
+            if rij2 < ForceField.cutoff2:
+                ePair, wPair = self.getPairTerms(ForceField, rij2)
+                eTotal += ePair
+                wTotal += wPair
+                if populateForces == True:
+                    for dim in range(0, 3):
+                        box.forces[iParticle, dim] += wPair * rij[dim] / rij2
+        return eTotal, wTotal
+
+    def getTotalPairEnergyAndVirial(self, ffManager, box,
+            populateForces = False):
+        ForceField = ffManager.ForceField
+        if populateForces == True:
+            ffManager.resetForces(box)
+        if ffManager.computeVirialTensor:
+            ffManager.virialTensor = np.zeros((3, 3))
+
+        ePair = 0.0
+        wPair = 0.0
+        for iParticle in range(0, box.numParticles):
+            for jParticle in range(iParticle + 1, box.numParticles):
+                rij, rij2 = self.getPairDisplacement(
+                        box.coordinates[iParticle],
+                        box.coordinates[jParticle], box.length)
+                if rij2 >= ForceField.cutoff2: continue
+                e, w = self.getPairTerms(ForceField, rij2)
+                ePair += e
+                wPair += w
+                for dim in range(0, 3):
+                    fij = w * rij[dim] / rij2
+                    if populateForces == True:
+                        box.forces[iParticle, dim] += fij
+                        box.forces[jParticle, dim] -= fij
+                    if ffManager.computeVirialTensor:
+                        for dim2 in range(0, 3):
+                            ffManager.virialTensor[dim2, dim] += rij[dim2] * fij
+        return ePair, wPair
+
+    def updatePositions(self, integrator):
+        box = integrator.box
+        dt = integrator.timeStep
+        for iParticle in range(0, box.numParticles):
+            for dim in range(0, 3):
+                x = box.coordinates[iParticle, dim] \
+                        + box.velocities[iParticle, dim] * dt \
+                        + 0.5 * box.forces[iParticle, dim] * dt * dt
+                box.coordinates[iParticle, dim] = x \
+                        - box.length * round(x / box.length)
+
+    def updateVelocities(self, integrator):
+        box = integrator.box
+        dt = integrator.timeStep
+        for iParticle in range(0, box.numParticles):
+            for dim in range(0, 3):
+                box.velocities[iParticle, dim] = box.velocities[iParticle, dim] \
+                        + 0.5 * box.forces[iParticle, dim] * dt
+
+
+_numbaKernels = {}
+
+
+def _getNumbaKernels():
+    """
+    Compiles the Numba kernels the first time they are needed, so that
+    importing mm_python does not require Numba.
+    """
+    if _numbaKernels:
+        return _numbaKernels
+
+    import numba
+
+    @numba.njit
+    def ljPairTerms(rij2, cutoff2, switch2, useSwitch):
+        sigByR2 = 1.0 / rij2
+        sigByR6 = sigByR2 * sigByR2 * sigByR2
+        sigByR12 = sigByR6 * sigByR6
+        ePair = 4.0 * (sigByR12 - sigByR6)
+        wPair = 24.0 * (2.0*sigByR12 - sigByR6)
+        if useSwitch and rij2 > switch2:
+            denominator = (cutoff2 - switch2)**3
+            S = (cutoff2 - rij2)**2 * (cutoff2 + 2*rij2 - 3*switch2) \
+                    / denominator
+            dS_dr = 12 * np.sqrt(rij2) * (rij2 - cutoff2) \
+                    * (rij2 - switch2) / denominator
+            wPair = wPair * S - ePair * np.sqrt(rij2) * dS_dr
+            ePair = ePair * S
+        return ePair, wPair
+
+    @numba.njit
+    def pairKernel(coordinates, i, j, length, cutoff2, switch2, useSwitch,
+            forces, populateForces, virialTensor, computeVirialTensor, rij):
+        rij2 = 0.0
+        for dim in range(3):
+            d = coordinates[i, dim] - coordinates[j, dim]
+            d = d - length * np.rint(d / length)
+            rij[dim] = d
+            rij2 += d * d
+        if rij2 >= cutoff2:
+            return 0.0, 0.0
+        e, w = ljPairTerms(rij2, cutoff2, switch2, useSwitch)
+        if populateForces or computeVirialTensor:
+            for dim in range(3):
+                fij = w * rij[dim] / rij2
+                if populateForces:
+                    forces[i, dim] += fij
+                    forces[j, dim] -= fij
+                if computeVirialTensor:
+                    for dim2 in range(3):
+                        virialTensor[dim2, dim] += rij[dim2] * fij
+        return e, w
+
+    @numba.njit
+    def totalPairKernel(coordinates, iPairs, jPairs, allPairs, length,
+            cutoff2, switch2, useSwitch, forces, populateForces,
+            virialTensor, computeVirialTensor):
+        numParticles = coordinates.shape[0]
+        if allPairs:
+            numOuter = numParticles
+        else:
+            numOuter = iPairs.shape[0]
+        ePair = 0.0
+        wPair = 0.0
+        rij = np.zeros(3)
+        for outer in range(numOuter):
+            if allPairs:
+                i = outer
+                jStart = i + 1
+                jEnd = numParticles
+            else:
+                i = iPairs[outer]
+                jStart = 0
+                jEnd = 1
+            for inner in range(jStart, jEnd):
+                if allPairs:
+                    j = inner
+                else:
+                    j = jPairs[outer]
+                e, w = pairKernel(coordinates, i, j, length, cutoff2,
+                        switch2, useSwitch, forces, populateForces,
+                        virialTensor, computeVirialTensor, rij)
+                ePair += e
+                wPair += w
+        return ePair, wPair
+
+    @numba.njit
+    def cellPairKernel(coordinates, order, cellStart, iCells, jCells,
+            length, cutoff2, switch2, useSwitch, forces, populateForces,
+            virialTensor, computeVirialTensor):
+        ePair = 0.0
+        wPair = 0.0
+        rij = np.zeros(3)
+        for pair in range(iCells.shape[0]):
+            iCell = iCells[pair]
+            jCell = jCells[pair]
+            for a in range(cellStart[iCell], cellStart[iCell + 1]):
+                # Pairs within a cell are visited once
+                if iCell == jCell:
+                    bStart = a + 1
+                else:
+                    bStart = cellStart[jCell]
+                for b in range(bStart, cellStart[jCell + 1]):
+                    e, w = pairKernel(coordinates, order[a], order[b],
+                            length, cutoff2, switch2, useSwitch, forces,
+                            populateForces, virialTensor,
+                            computeVirialTensor, rij)
+                    ePair += e
+                    wPair += w
+        return ePair, wPair
+
+    @numba.njit
+    def molPairKernel(coordinates, position, candidates, length, cutoff2,
+            switch2, useSwitch):
+        numCandidates = candidates.shape[0]
+        jParticles = np.empty(numCandidates, dtype=np.int64)
+        ePairs = np.empty(numCandidates)
+        wPairs = np.empty(numCandidates)
+        force = np.zeros(3)
+        rij = np.zeros(3)
+        count = 0
+        for n in range(numCandidates):
+            j = candidates[n]
+            rij2 = 0.0
+            for dim in range(3):
+                d = position[dim] - coordinates[j, dim]
+                d = d - length * np.rint(d / length)
+                rij[dim] = d
+                rij2 += d * d
+            if rij2 >= cutoff2:
+                continue
+            e, w = ljPairTerms(rij2, cutoff2, switch2, useSwitch)
+            jParticles[count] = j
+            ePairs[count] = e
+            wPairs[count] = w
+            for dim in range(3):
+                force[dim] += w * rij[dim] / rij2
+            count += 1
+        return jParticles[:count], ePairs[:count], wPairs[:count], force
+
+    @numba.njit
+    def updatePositions(coordinates, velocities, forces, timeStep, length):
+        for i in range(coordinates.shape[0]):
+            for dim in range(3):
+                x = coordinates[i, dim] + velocities[i, dim] * timeStep \
+                        + 0.5 * forces[i, dim] * timeStep * timeStep
+                coordinates[i, dim] = x - length * np.rint(x / length)
+
+    @numba.njit
+    def updateVelocities(velocities, forces, timeStep):
+        for i in range(velocities.shape[0]):
+            for dim in range(3):
+                velocities[i, dim] = velocities[i, dim] \
+                        + 0.5 * forces[i, dim] * timeStep
+
+    _numbaKernels["totalPair"] = totalPairKernel
+    _numbaKernels["cellPair"] = cellPairKernel
+    _numbaKernels["molPair"] = molPairKernel
+    _numbaKernels["updatePositions"] = updatePositions
+    _numbaKernels["updateVelocities"] = updateVelocities
+    return _numbaKernels
+
+
+class NumbaBackend(Backend):
+    """
+    Backend compiled with Numba. The pair kernels are explicit loops that
+    evaluate the Lennard-Jones potential (with its switch) in registers,
+    without temporary arrays. Kernels are compiled the first time they are
+    used.
+
+    Notes
+    -----
+    Only LennardJones force fields without tables are supported (the
+    potential is always evaluated directly); tabulated force fields raise
+    an exception. Full evaluations of the box visit the pairs of the
+    Verlet neighbor list if the manager has one, the pairs of neighboring
+    cells if it uses a cell list, and every pair otherwise.
+    Single-particle evaluations use the cell list if the manager has one.
+
+    """
+    name = "numba"
+
+    def __init__(self):
+        # Pairs of neighboring cells, by number of cells per side
+        self.cellPairs = {}
+
+    @classmethod
+    def isAvailable(cls):
+        try:
+            import numba
+        except ImportError:
+            return False
+        return True
+
+    def getForceFieldParameters(self, ffManager):
+        """
+        Returns the parameters of the force field of a manager in the
+        form expected by the kernels.
+
+        Parameters
+        ----------
+        ffManager: ForceFieldManager
+        The manager whose force field is used.
+
+        Returns
+        ----------
+        cutoff2: float
+        Squared cutoff.
+
+        switch2: float
+        Squared switch distance (0 if no switch is used).
+
+        useSwitch: bool
+        True if a switch is used.
+
+        Raises
+        ----------
+        Exception if the force field is not LennardJones or is tabulated.
+
+
+        Notes
+        ----------
+        None
+
+        """
+        ForceField = ffManager.ForceField
+        if not isinstance(ForceField, LennardJones):
+            raise Exception("The numba backend only supports LennardJones "
+                    "force fields")
+        if ForceField.tabulated:
+            raise Exception("The numba backend does not support tabulated "
+                    "force fields")
+        useSwitch = ForceField.switch is not None
+        switch2 = float(ForceField.switch2) if useSwitch else 0.0
+        return float(ForceField.cutoff2), switch2, useSwitch
+
+    def getCandidates(self, ffManager, iParticle, box, position):
+        """
+        Returns the sorted indices of the particles that may interact with
+        iParticle, excluding iParticle itself.
+        """
+        if ffManager.useCellList:
+            candidates = ffManager.getCellList(box).getNeighbors(position)
+        else:
+            candidates = np.arange(box.numParticles)
+        return candidates[candidates != iParticle].astype(np.int64)
+
+    def getMolPairTerms(self, ffManager, iParticle, box, position = None):
+        if position is None:
+            position = box.coordinates[iParticle]
+        cutoff2, switch2, useSwitch = self.getForceFieldParameters(ffManager)
+        candidates = self.getCandidates(ffManager, iParticle, box, position)
+        jParticles, ePairs, wPairs, force = _getNumbaKernels()["molPair"](
+                box.coordinates, np.asarray(position, dtype=float),
+                candidates, float(box.length), cutoff2, switch2, useSwitch)
+        return jParticles, ePairs, wPairs
+
+    def getMolPairEnergyAndVirial(self, ffManager, iParticle, box,
+            populateForces = False):
+        cutoff2, switch2, useSwitch = self.getForceFieldParameters(ffManager)
+        position = box.coordinates[iParticle]
+        candidates = self.getCandidates(ffManager, iParticle, box, position)
+        jParticles, ePairs, wPairs, force = _getNumbaKernels()["molPair"](
+                box.coordinates, position, candidates, float(box.length),
+                cutoff2, switch2, useSwitch)
+        if populateForces == True:
+            box.forces[iParticle] += force
+        return np.sum(ePairs, dtype=np.float64), \
+                np.sum(wPairs, dtype=np.float64)
+
+    def getTotalPairEnergyAndVirial(self, ffManager, box,
+            populateForces = False):
+        cutoff2, switch2, useSwitch = self.getForceFieldParameters(ffManager)
+        if populateForces == True:
+            ffManager.resetForces(box)
+            forces = box.forces
+        else:
+            forces = np.zeros((0, 3), dtype=box.coordinates.dtype)
+        if ffManager.computeVirialTensor:
+            ffManager.virialTensor = np.zeros((3, 3))
+            virialTensor = ffManager.virialTensor
+        else:
+            virialTensor = np.zeros((3, 3))
+
+        if ffManager.neighborList is not None:
+            ffManager.neighborList.update(box)
+            iPairs = ffManager.neighborList.iParticles.astype(np.int64)
+            jPairs = ffManager.neighborList.jParticles.astype(np.int64)
+            allPairs = False
+        elif ffManager.useCellList:
+            cellList = ffManager.getCellList(box, rebuild = True)
+            if cellList.numCellsPerSide not in self.cellPairs:
+                self.cellPairs[cellList.numCellsPerSide] = tuple(
+                        cells.astype(np.int64)
+                        for cells in cellList.getCellPairIndices())
+            iCells, jCells = self.cellPairs[cellList.numCellsPerSide]
+            return _getNumbaKernels()["cellPair"](box.coordinates,
+                    cellList.order.astype(np.int64),
+                    cellList.cellStart.astype(np.int64), iCells, jCells,
+                    float(box.length), cutoff2, switch2, useSwitch, forces,
+                    populateForces == True, virialTensor,
+                    bool(ffManager.computeVirialTensor))
+        else:
+            iPairs = np.zeros(0, dtype=np.int64)
+            jPairs = np.zeros(0, dtype=np.int64)
+            allPairs = True
+
+        ePair, wPair = _getNumbaKernels()["totalPair"](box.coordinates,
+                iPairs, jPairs, allPairs, float(box.length), cutoff2,
+                switch2, useSwitch, forces, populateForces == True,
+                virialTensor, bool(ffManager.computeVirialTensor))
+        return ePair, wPair
+
+    def updatePositions(self, integrator):
+        box = integrator.box
+        _getNumbaKernels()["updatePositions"](box.coordinates,
+                box.velocities, box.forces, float(integrator.timeStep),
+                float(box.length))
+
+    def updateVelocities(self, integrator):
+        box = integrator.box
+        _getNumbaKernels()["updateVelocities"](box.velocities, box.forces,
+                float(integrator.timeStep))
+
+
+registerBackend("python", PythonBackend)
+registerBackend("numpy", NumpyBackend)
+registerBackend("numba", NumbaBackend)
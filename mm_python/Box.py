@@ -1,11 +1,41 @@
 import numpy as np
 
+precisions = {"single": np.float32, "double": np.float64}
+
 class Box(object):
     """
     Class to define box objects. The attributes are the box length (length),
     velocities and coordinates.
+
+    Parameters
+    ----------
+    length : float
+        Box length.
+    precision : str, optional, default="double"
+        Floating point precision of the coordinates, velocities and forces,
+        "single" (float32) or "double" (float64). Single precision halves
+        the memory footprint and bandwidth of the particle arrays; energy
+        and virial totals are still accumulated in double precision.
+
     """
-    def __init__(self, length):
-        self.length = length
+    def __init__(self, length, precision = "double"):
+        if precision not in precisions:
+            raise Exception("'precision' must be 'single' or 'double'")
+        self.length = float(length)
+        self.precision = precision
+        self.dtype = np.dtype(precisions[precision])
         self.velocities = None
         self.coordinates = None
+        self.buffers = {}
+
+    def getBuffer(self, name, like):
+        """
+        Returns a persistent scratch array with the shape and dtype of
+        like, allocated only on first use or when they change. Callers
+        must not keep the buffer between calls.
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != like.shape \
+                or buffer.dtype != like.dtype:
+            buffer = self.buffers[name] = np.empty_like(like)
+        return buffer
@@ -1,5 +1,8 @@
+import collections
+import itertools
 import numpy as np
 import math
+from .Trajectory import formatXYZFrame, readXYZFrames
 
 class BoxManager(object):
     """
@@ -44,7 +47,8 @@ class BoxManager(object):
         self.box.numParticles = n
 
         if method == "random":
-            self.box.coordinates = (0.5 - np.random.rand(n,3)) * self.box.length
+            self.box.coordinates = ((0.5 - np.random.rand(n,3))
+                    * self.box.length).astype(self.box.dtype)
 
         elif method == "lattice":
         #    nSide = 1
@@ -68,16 +72,16 @@ class BoxManager(object):
         #        self.box.coordinates[iParticle] -= 0.5
 
 
-            xVector = np.linspace(0.0,self.box.length,np.cbrt(self.box.numParticles) + 1)
-            yVector = np.linspace(0.0,self.box.length,np.cbrt(self.box.numParticles) + 1)
-            zVector = np.linspace(0.0,self.box.length,np.cbrt(self.box.numParticles) + 1)
-            self.box.coordinates = np.vstack(np.meshgrid(xVector,yVector,zVector)).reshape(3,-1).T
-
-            excess = len(self.box.coordinates) - self.box.numParticles
-
-            self.box.coordinates = self.box.coordinates[:-excess]
-
-            self.box.coordinates *= 0.98
+            # Simple cubic lattice with the smallest number of sites per
+            # side holding n particles, filled in order
+            nSide = int(np.ceil(np.cbrt(self.box.numParticles) - 1e-9))
+            sites = (np.arange(nSide) + 0.5) * self.box.length / nSide \
+                    - 0.5 * self.box.length
+            xVector, yVector, zVector = np.meshgrid(sites, sites, sites,
+                    indexing="ij")
+            self.box.coordinates = np.stack((xVector.ravel(), yVector.ravel(),
+                zVector.ravel()), axis=1)[:self.box.numParticles] \
+                .astype(self.box.dtype)
 
            # print self.box.coordinates
 
@@ -119,10 +123,11 @@ class BoxManager(object):
 
         momentum = np.sum(self.box.mass * self.box.velocities, axis = 0)
 
-        self.box.velocities = self.box.velocities \
-            - momentum/(self.box.numParticles * self.box.mass)
+        self.box.velocities = (self.box.velocities
+            - momentum/(self.box.numParticles * self.box.mass)) \
+            .astype(self.box.dtype)
 
-    def getConfigFromFile(self, restartFile, mass=0.0):
+    def getConfigFromFile(self, restartFile, mass=0.0, frame=-1):
         """
         Reads in a configuration in xyz format.
 
@@ -131,6 +136,10 @@ class BoxManager(object):
         restartFile: string
         Location of the xyz file containing the configuration
 
+        frame: integer
+        Index of the frame to read from a multi-frame file. Negative
+        values count from the end; the default is the last frame.
+
         Returns
         ----------
         None
@@ -138,31 +147,34 @@ class BoxManager(object):
 
         Raises
         ----------
-        None
+        Exception if the requested frame does not exist.
 
 
         Notes
         ----------
-        None
+        Frames are streamed, so only the frames up to the requested one
+        are parsed.
 
         """
 
         self.box.mass = mass / 6.023e23 * 10.0**-3
 
-        with open(restartFile, "r") as f:
-            for lineNbr, line in enumerate(f):
-                lineSplit = line.split()
-                lenLine = len(lineSplit)
-                if lenLine == 1:
-                    self.box.numParticles = int(lineSplit[0])
-                    self.box.coordinates = np.zeros((self.box.numParticles,3))
-                if lenLine > 1:
-                    iParticle = int(lineSplit[0]) - 1
-                    x = float(lineSplit[1])
-                    y = float(lineSplit[2])
-                    z = float(lineSplit[3])
-
-                    self.box.coordinates[iParticle] = np.array([x,y,z])
+        if frame >= 0:
+            frames = readXYZFrames(restartFile)
+            coordinates = next(itertools.islice(frames, frame, None), None)
+            frames.close()
+        else:
+            lastFrames = collections.deque(readXYZFrames(restartFile),
+                    maxlen=-frame)
+            if len(lastFrames) == -frame:
+                coordinates = lastFrames[0]
+            else:
+                coordinates = None
+        if coordinates is None:
+            raise Exception("Frame %d not found in %s" % (frame, restartFile))
+
+        self.box.numParticles = len(coordinates)
+        self.box.coordinates = coordinates.astype(self.box.dtype, copy=False)
 
     def printXYZ(self, trajectory):
        """
@@ -187,13 +199,7 @@ class BoxManager(object):
        None
 
        """
-       trajectory.write(str(self.box.numParticles)+"\n\n")
-       for iParticle in range(0,self.box.numParticles):
-           index = "{0:4d}".format(iParticle+1)
-           x = "{0:20.15f}".format(self.box.coordinates[iParticle][0])
-           y = "{0:20.15f}".format(self.box.coordinates[iParticle][1])
-           z = "{0:20.15f}".format(self.box.coordinates[iParticle][2])
-           trajectory.write("   ".join([index,x,y,z,"\n"]))
+       trajectory.write(formatXYZFrame(self.box.coordinates))
 
     def scaleVelocities(self, temperature):
        """
@@ -214,12 +220,29 @@ class BoxManager(object):
 
        Notes
        ----------
-       None
+       The velocities are updated in place. The kinetic energy is
+       accumulated in double precision.
 
        """
 
-       self.box.velocities = self.box.velocities \
-               - self.box.velocities.mean(axis = 0)
-       K = 0.5 * np.sum(self.box.velocities * self.box.velocities)
-       factor = np.sqrt(1.5 * len(self.box.velocities) * temperature / K)
-       self.box.velocities = self.box.velocities * factor
+       # Column by column: subtracting the broadcast mean in one call
+       # makes NumPy allocate a temporary of the size of the velocities
+       velocities = self.box.velocities
+       meanVelocity = velocities.mean(axis = 0, dtype = np.float64)
+       for dim in range(0, 3):
+           velocities[:, dim] -= velocities.dtype.type(meanVelocity[dim])
+       K = self.getKineticEnergy()
+       factor = np.sqrt(1.5 * len(velocities) * temperature / K)
+       velocities *= velocities.dtype.type(factor)
+
+    def getKineticEnergy(self):
+       """
+       Returns the kinetic energy of the box in reduced units (unit
+       mass), accumulated in double precision. The squared velocities are
+       stored in a persistent buffer of the box, so no memory is
+       allocated.
+       """
+       velocities = self.box.velocities
+       squares = self.box.getBuffer("squaredVelocities", velocities)
+       np.multiply(velocities, velocities, out = squares)
+       return 0.5 * np.sum(squares, dtype = np.float64)
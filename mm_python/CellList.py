@@ -0,0 +1,325 @@
+import numpy as np
+
+
+class CellList(object):
+    """
+    Linked-cell spatial index for a cubic periodic box. The box is divided
+    into numCellsPerSide^3 cells whose side is at least the cutoff, so all
+    the particles interacting with a given particle are found in its own
+    cell or in one of the 26 surrounding cells.
+
+    Properties
+    ----------
+    length : float
+        Box length the cell list was built for.
+    cutoff : float
+        Minimum cell side length (usually the force field cutoff).
+    numCellsPerSide : integer
+        Number of cells along each box dimension.
+    numCells : integer
+        Total number of cells.
+    neighborCells : list of numpy arrays
+        For every cell, the (unique) indices of the cells it interacts
+        with, including itself.
+    cells : list of numpy arrays
+        For every cell, the indices of the particles it contains.
+    particleCell : numpy array
+        Cell index of every particle.
+    order : numpy array
+        Particle indices sorted by cell, as of the last build.
+    cellStart : numpy array
+        Position in order of the first particle of every cell, followed
+        by the number of particles, as of the last build.
+
+    Parameters
+    ----------
+    length : float
+        Box length.
+    cutoff : float
+        Minimum cell side length.
+
+    """
+    def __init__(self, length, cutoff):
+        self.length = length
+        self.cutoff = cutoff
+        self.numCellsPerSide = max(int(np.floor(length / cutoff)), 1)
+        self.numCells = self.numCellsPerSide**3
+        self.neighborCells = self._buildNeighborCells()
+        self.cells = None
+        self.particleCell = None
+        self.order = None
+        self.cellStart = None
+
+    def _buildNeighborCells(self):
+        """
+        Builds the stencil of neighboring cells for every cell. When there
+        are fewer than three cells per side the periodic images overlap,
+        so duplicated neighbors are removed.
+        """
+        n = self.numCellsPerSide
+        shifts = np.array([[dx, dy, dz] for dx in (-1, 0, 1)
+                                        for dy in (-1, 0, 1)
+                                        for dz in (-1, 0, 1)])
+        neighborCells = []
+        for iCell in range(0, self.numCells):
+            cellCoord = np.array([iCell // (n*n), (iCell // n) % n, iCell % n])
+            neighborCoord = np.mod(cellCoord + shifts, n)
+            neighbors = (neighborCoord[:, 0]*n + neighborCoord[:, 1])*n \
+                    + neighborCoord[:, 2]
+            neighborCells.append(np.unique(neighbors))
+        return neighborCells
+
+    def getCellIndex(self, position):
+        """
+        Computes the cell index of one position or of an array of
+        positions. Positions do not need to be wrapped into the box.
+
+        Parameters
+        ----------
+        position: numpy array
+        A single position (3,) or an array of positions (n,3).
+
+        Returns
+        ----------
+        cellIndex: integer or numpy array
+        Index of the cell containing each position.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        n = self.numCellsPerSide
+        fractional = np.asarray(position) / self.length + 0.5
+        fractional = fractional - np.floor(fractional)
+        cellCoord = np.minimum((fractional * n).astype(int), n - 1)
+        return (cellCoord[..., 0]*n + cellCoord[..., 1])*n + cellCoord[..., 2]
+
+    def build(self, coordinates):
+        """
+        Assigns every particle to its cell.
+
+        Parameters
+        ----------
+        coordinates: numpy array
+        Particle coordinates (numParticles,3).
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The cost of a build is O(N).
+
+        """
+        self.particleCell = self.getCellIndex(coordinates)
+        self.order = np.argsort(self.particleCell, kind="stable")
+        counts = np.bincount(self.particleCell, minlength=self.numCells)
+        self.cellStart = np.concatenate(([0], np.cumsum(counts)))
+        self.cells = np.split(self.order, self.cellStart[1:-1])
+
+    def updateParticle(self, iParticle, position):
+        """
+        Moves a single particle to the cell containing position.
+
+        Parameters
+        ----------
+        iParticle: integer
+        Index of the particle
+
+        position: numpy array
+        New position of the particle.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The cost of an update is O(1).
+
+        """
+        oldCell = self.particleCell[iParticle]
+        newCell = self.getCellIndex(position)
+        if oldCell == newCell:
+            return
+        self.cells[oldCell] = self.cells[oldCell][self.cells[oldCell] != iParticle]
+        self.cells[newCell] = np.append(self.cells[newCell], iParticle)
+        self.particleCell[iParticle] = newCell
+
+    def getNeighbors(self, position):
+        """
+        Returns the indices of all the particles found in the cells
+        surrounding a position.
+
+        Parameters
+        ----------
+        position: numpy array
+        Position (3,) around which particles are searched.
+
+        Returns
+        ----------
+        neighbors: numpy array
+        Sorted indices of the candidate neighbors. If a particle sits at
+        position, it is included as well.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Indices are sorted so that results do not depend on the order in
+        which particles were moved between cells.
+
+        """
+        cell = self.getCellIndex(position)
+        neighbors = np.concatenate([self.cells[jCell]
+                for jCell in self.neighborCells[cell]])
+        return np.sort(neighbors)
+
+    def getCellPairs(self):
+        """
+        Iterates over every unordered pair of neighboring, non-empty
+        cells exactly once.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        cellPairs: generator
+        Yields (iCellParticles, jCellParticles, sameCell) tuples, where
+        sameCell is True when both entries are the same cell.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        for iCell in range(0, self.numCells):
+            iCellParticles = self.cells[iCell]
+            if len(iCellParticles) == 0: continue
+            for jCell in self.neighborCells[iCell]:
+                if jCell < iCell: continue
+                jCellParticles = self.cells[jCell]
+                if len(jCellParticles) == 0: continue
+                yield iCellParticles, jCellParticles, jCell == iCell
+
+    def getCellPairIndices(self):
+        """
+        Returns every unordered pair of neighboring cells, empty or not,
+        in the order of getCellPairs.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        iCells: numpy array
+        First cell of every pair.
+
+        jCells: numpy array
+        Second cell of every pair, with iCells <= jCells.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The pairs only depend on the geometry of the cells, not on the
+        particles.
+
+        """
+        iCells = []
+        jCells = []
+        for iCell in range(0, self.numCells):
+            neighbors = self.neighborCells[iCell]
+            neighbors = neighbors[neighbors >= iCell]
+            iCells.append(np.full(len(neighbors), iCell))
+            jCells.append(neighbors)
+        return np.concatenate(iCells), np.concatenate(jCells)
+
+    def getPairs(self, coordinates, cutoff):
+        """
+        Finds all the unordered pairs of particles closer than a cutoff,
+        visiting only pairs of neighboring cells.
+
+        Parameters
+        ----------
+        coordinates: numpy array
+        Particle coordinates (numParticles,3), as used in the last build.
+
+        cutoff: float
+        Pair distance cutoff. Must not exceed the cell list cutoff.
+
+        Returns
+        ----------
+        iParticles: numpy array
+        First index of every pair.
+
+        jParticles: numpy array
+        Second index of every pair, with iParticles < jParticles.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Pairs are sorted by (iParticle, jParticle).
+
+        """
+        cutoff2 = cutoff * cutoff
+        iPairs = []
+        jPairs = []
+        for iCellParticles, jCellParticles, sameCell in self.getCellPairs():
+            rij = coordinates[iCellParticles][:, np.newaxis, :] \
+                    - coordinates[jCellParticles][np.newaxis, :, :]
+            rij = rij - self.length * np.round(rij / self.length)
+            rij2 = np.sum(rij * rij, axis=2)
+            mask = rij2 < cutoff2
+            if sameCell:
+                mask &= iCellParticles[:, np.newaxis] \
+                        < jCellParticles[np.newaxis, :]
+            iIndex, jIndex = np.nonzero(mask)
+            iPairs.append(iCellParticles[iIndex])
+            jPairs.append(jCellParticles[jIndex])
+
+        if len(iPairs) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        iPairs = np.concatenate(iPairs)
+        jPairs = np.concatenate(jPairs)
+        iParticles = np.minimum(iPairs, jPairs)
+        jParticles = np.maximum(iPairs, jPairs)
+        order = np.lexsort((jParticles, iParticles))
+        return iParticles[order], jParticles[order]
@@ -0,0 +1,565 @@
+import numpy as np
+from .Trajectory import openTrajectory
+
+
+class BlockCorrelator(object):
+    """
+    Time correlation function accumulator based on FFTs. Samples are
+    processed in blocks of blockLength frames and the last maxLag frames
+    of every block are carried over to the next one, so all time origins
+    are used while memory is bounded by (blockLength + maxLag) samples.
+    Each block costs O(T log T) instead of the O(T^2) of a direct sum.
+
+    For a series x(t), the accumulated function is
+
+        C(lag) = < sum_k x_k(t) x_k(t + lag) >_t
+
+    where k runs over all the elements of a sample (e.g. every component
+    of every particle). With msd=True the accumulated function is instead
+
+        MSD(lag) = < sum_k (x_k(t + lag) - x_k(t))^2 >_t
+
+    Properties
+    ----------
+    maxLag : integer
+        Largest lag (in samples) of the correlation function.
+    blockLength : integer
+        Number of new samples processed per block.
+    numSamples : integer
+        Number of samples added so far.
+
+    Parameters
+    ----------
+    maxLag : integer
+        Largest lag (in samples).
+    blockLength : integer, optional, default=None
+        Number of samples per block. Defaults to 4*maxLag.
+    msd : bool, optional, default=False
+        Accumulate a mean squared displacement instead of a correlation.
+
+    """
+    def __init__(self, maxLag, blockLength = None, msd = False):
+        self.maxLag = maxLag
+        self.blockLength = blockLength or max(4 * maxLag, 1)
+        self.msd = msd
+        self.buffer = None
+        self.carry = 0
+        self.fill = 0
+        self.numSamples = 0
+        self.sums = np.zeros(maxLag + 1)
+        self.counts = np.zeros(maxLag + 1)
+
+    def add(self, x):
+        """
+        Adds one sample to the series.
+
+        Parameters
+        ----------
+        x: numpy array or float
+        Sample. All the samples must have the same shape.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        if self.buffer is None:
+            self.buffer = np.zeros((self.maxLag + self.blockLength, len(x)))
+        self.buffer[self.carry + self.fill] = x
+        self.fill += 1
+        self.numSamples += 1
+
+        if self.fill == self.blockLength:
+            sums, counts = self._correlateBuffer()
+            self.sums += sums
+            self.counts += counts
+            total = self.carry + self.fill
+            keep = min(self.maxLag, total)
+            self.buffer[:keep] = self.buffer[total - keep:total]
+            self.carry = keep
+            self.fill = 0
+
+    def _correlateBuffer(self):
+        """
+        Correlates the new samples of the buffer with every earlier
+        sample still held in it.
+        """
+        lags = np.arange(0, self.maxLag + 1)
+        counts = np.maximum(self.fill - np.maximum(lags - self.carry, 0), 0)
+        if self.fill == 0:
+            return np.zeros(self.maxLag + 1), counts
+
+        total = self.carry + self.fill
+        series = self.buffer[:total]
+        newSeries = series.copy()
+        newSeries[:self.carry] = 0.0
+
+        # Zero padded to avoid circular wrap-around, and long enough to
+        # hold every lag up to maxLag
+        nFFT = 1 << int(np.ceil(np.log2(max(2 * total, self.maxLag + 1))))
+        spectrum = np.sum(np.conj(np.fft.rfft(series, nFFT, axis=0))
+                * np.fft.rfft(newSeries, nFFT, axis=0), axis=1)
+        sums = np.fft.irfft(spectrum, nFFT)[:self.maxLag + 1]
+        sums[lags >= total] = 0.0
+
+        if self.msd:
+            squares = np.cumsum(np.concatenate(([0.0],
+                    np.sum(series * series, axis=1))))
+            first = np.minimum(np.maximum(self.carry, lags), total)
+            later = squares[total] - squares[first]
+            earlier = squares[np.maximum(total - lags, 0)] \
+                    - squares[np.maximum(first - lags, 0)]
+            sums = later + earlier - 2.0 * sums
+
+        return sums, counts
+
+    def getCorrelation(self):
+        """
+        Returns the correlation function averaged over all time origins.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        correlation: numpy array
+        Correlation (or MSD) for lags 0 to maxLag. Lags without any
+        sample pair are NaN.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Samples of the current, incomplete block are included.
+
+        """
+        sums, counts = self._correlateBuffer()
+        sums = sums + self.sums
+        counts = counts + self.counts
+        correlation = np.full(self.maxLag + 1, np.nan)
+        correlation[counts > 0] = sums[counts > 0] / counts[counts > 0]
+        return correlation
+
+
+class DiffusionCalculator(object):
+    """
+    Computes the velocity autocorrelation function (VACF), the mean
+    squared displacement (MSD) and the self-diffusion coefficient of a
+    system, using FFT based correlators with bounded memory.
+
+    The diffusion coefficient is estimated both with the Green-Kubo
+    relation, D = 1/3 int_0^t VACF(t') dt', and with the Einstein
+    relation, MSD(t) ~ 6 D t.
+
+    Properties
+    ----------
+    timeStep : float
+        Integration time step.
+    sampleFreq : integer
+        Frequency (in steps) at which Simulation samples the box.
+    vacf : BlockCorrelator
+        Correlator of the particle velocities.
+    msd : BlockCorrelator
+        Correlator of the unwrapped particle positions.
+
+    Parameters
+    ----------
+    timeStep : float
+        Integration time step.
+    maxLag : integer
+        Largest lag (in samples) of the VACF and MSD.
+    sampleFreq : integer, optional, default=1
+        Sampling frequency when used inside Simulation.run.
+    blockLength : integer, optional, default=None
+        Samples per correlator block. Defaults to 4*maxLag.
+
+    Notes
+    ----------
+    Unwrapped positions are rebuilt from the minimum-image displacement
+    between consecutive samples, so no particle may move more than half
+    a box length between two samples.
+
+    """
+    def __init__(self, timeStep, maxLag, sampleFreq = 1, blockLength = None):
+        self.timeStep = timeStep
+        self.sampleFreq = sampleFreq
+        self.vacf = BlockCorrelator(maxLag, blockLength)
+        self.msd = BlockCorrelator(maxLag, blockLength, msd = True)
+        self.lastCoordinates = None
+        self.displacements = None
+        self.numParticles = 0
+
+    def sample(self, box):
+        """
+        Accumulates the current velocities and positions of a box.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        self.accumulate(box.coordinates, box.velocities, box.length)
+
+    def accumulate(self, coordinates, velocities, length):
+        """
+        Accumulates one frame.
+
+        Parameters
+        ----------
+        coordinates: numpy array
+        Particle coordinates (numParticles,3).
+
+        velocities: numpy array or None
+        Particle velocities (numParticles,3). If None, only the MSD is
+        accumulated.
+
+        length: float
+        Box length.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.lastCoordinates is None:
+            self.numParticles = len(coordinates)
+            self.displacements = np.zeros((self.numParticles, 3))
+        else:
+            step = coordinates - self.lastCoordinates
+            self.displacements += step - length * np.round(step / length)
+        self.lastCoordinates = np.array(coordinates, dtype=np.float64)
+
+        self.msd.add(self.displacements)
+        if velocities is not None:
+            self.vacf.add(velocities)
+
+    def accumulateTrajectory(self, fileName, length = None):
+        """
+        Streams all the frames of a trajectory into the correlators.
+
+        Parameters
+        ----------
+        fileName: string
+        Location of a binary or xyz trajectory. Velocities are only
+        available from binary trajectories written with velocities.
+
+        length: float
+        Box length. Required for xyz trajectories.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if the box length is unknown.
+
+
+        Notes
+        ----------
+        The frame spacing of the trajectory must be sampleFreq steps.
+
+        """
+        trajectory = openTrajectory(fileName)
+        if length is None:
+            length = getattr(trajectory, "length", None)
+        if length is None:
+            raise Exception("The box length of %s is unknown" % fileName)
+        velocities = getattr(trajectory, "velocities", None)
+        for iFrame, coordinates in enumerate(trajectory):
+            self.accumulate(coordinates,
+                    None if velocities is None else velocities[iFrame], length)
+
+    def getTimes(self):
+        """
+        Returns the time of every lag.
+        """
+        return np.arange(0, self.vacf.maxLag + 1) \
+                * self.timeStep * self.sampleFreq
+
+    def getVACF(self):
+        """
+        Returns the VACF, <v(0).v(t)>, averaged over particles and time
+        origins.
+        """
+        return self.vacf.getCorrelation() / self.numParticles
+
+    def getMSD(self):
+        """
+        Returns the MSD, <|r(t) - r(0)|^2>, averaged over particles and
+        time origins.
+        """
+        return self.msd.getCorrelation() / self.numParticles
+
+    def getDiffusionCoefficient(self, fitStart = 0.5):
+        """
+        Computes the self-diffusion coefficient.
+
+        Parameters
+        ----------
+        fitStart: float
+        Fraction of the lags skipped before the linear fit of the MSD,
+        to leave out the ballistic regime.
+
+        Returns
+        ----------
+        dGreenKubo: float
+        Green-Kubo estimate, from the integral of the VACF. NaN if no
+        velocities were accumulated.
+
+        dEinstein: float
+        Einstein estimate, from the slope of the MSD.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        times = self.getTimes()
+        if self.vacf.numSamples > 0:
+            vacf = self.getVACF()
+            valid = ~np.isnan(vacf)
+            vacf = vacf[valid]
+            dGreenKubo = np.sum(0.5 * (vacf[1:] + vacf[:-1])
+                    * np.diff(times[valid])) / 3.0
+        else:
+            dGreenKubo = np.nan
+
+        msd = self.getMSD()
+        fit = ~np.isnan(msd)
+        fit[:int(fitStart * len(msd))] = False
+        slope = np.polyfit(times[fit], msd[fit], 1)[0]
+        dEinstein = slope / 6.0
+
+        return dGreenKubo, dEinstein
+
+
+class ViscosityCalculator(object):
+    """
+    Computes the shear viscosity with the Green-Kubo relation,
+
+        eta = V / T int_0^t < P_ab(0) P_ab(t') > dt'
+
+    averaged over the three off-diagonal components (xy, xz, yz) of the
+    pressure tensor. The stress autocorrelation is accumulated on the fly
+    with a BlockCorrelator, so no per-step data is stored.
+
+    Properties
+    ----------
+    ffManager : ForceFieldManager
+        Force field manager providing the pair virial tensor. It must be
+        created with computeVirialTensor=True.
+    temperature : float
+        System temperature (reduced units).
+    timeStep : float
+        Integration time step.
+    sampleFreq : integer
+        Frequency (in steps) at which Simulation samples the box.
+    correlator : BlockCorrelator
+        Correlator of the off-diagonal pressure tensor components.
+
+    Parameters
+    ----------
+    ffManager : ForceFieldManager
+        Force field manager of the simulation.
+    temperature : float
+        System temperature.
+    timeStep : float
+        Integration time step.
+    maxLag : integer
+        Largest lag (in samples) of the stress autocorrelation.
+    sampleFreq : integer, optional, default=1
+        Sampling frequency when used inside Simulation.run.
+    blockLength : integer, optional, default=None
+        Samples per correlator block. Defaults to 4*maxLag.
+
+    Notes
+    ----------
+    Reduced units are assumed (unit mass and Boltzmann constant).
+
+    """
+    def __init__(self, ffManager, temperature, timeStep, maxLag,
+            sampleFreq = 1, blockLength = None):
+        if not ffManager.computeVirialTensor:
+            raise Exception("'ffManager' must compute the virial tensor")
+        self.ffManager = ffManager
+        self.temperature = temperature
+        self.timeStep = timeStep
+        self.sampleFreq = sampleFreq
+        self.correlator = BlockCorrelator(maxLag, blockLength)
+        self.volume = None
+
+    def getPressureTensor(self, box):
+        """
+        Computes the instantaneous pressure tensor of a box.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        pressureTensor: numpy array
+        3x3 pressure tensor, kinetic plus pair virial contributions.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The virial tensor of the last full evaluation of the force field
+        manager is used.
+
+        """
+        kinetic = np.dot(box.velocities.T, box.velocities)
+        return (kinetic + self.ffManager.virialTensor) / np.power(box.length, 3)
+
+    def sample(self, box):
+        """
+        Accumulates the current pressure tensor of a box.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        self.accumulate(self.getPressureTensor(box), np.power(box.length, 3))
+
+    def accumulate(self, pressureTensor, volume):
+        """
+        Accumulates one pressure tensor.
+
+        Parameters
+        ----------
+        pressureTensor: numpy array
+        3x3 pressure tensor.
+
+        volume: float
+        Box volume.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        self.volume = volume
+        self.correlator.add([pressureTensor[0, 1], pressureTensor[0, 2],
+                pressureTensor[1, 2]])
+
+    def getTimes(self):
+        """
+        Returns the time of every lag.
+        """
+        return np.arange(0, self.correlator.maxLag + 1) \
+                * self.timeStep * self.sampleFreq
+
+    def getStressACF(self):
+        """
+        Returns the stress autocorrelation function, averaged over the
+        three off-diagonal components and all time origins.
+        """
+        return self.correlator.getCorrelation() / 3.0
+
+    def getViscosity(self):
+        """
+        Computes the shear viscosity.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        viscosity: float
+        Green-Kubo estimate of the shear viscosity.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        times = self.getTimes()
+        acf = self.getStressACF()
+        valid = ~np.isnan(acf)
+        acf = acf[valid]
+        integral = np.sum(0.5 * (acf[1:] + acf[:-1]) * np.diff(times[valid]))
+        return self.volume / self.temperature * integral
@@ -0,0 +1,252 @@
+import os
+import multiprocessing
+import numpy as np
+from .Box import Box
+from .BoxManager import BoxManager
+from .ForceField import LennardJones
+from .ForceFieldManager import ForceFieldManager
+from .Integrators import VelocityVerlet
+from .Simulation import Simulation
+from .PropertyLogger import propertiesDtype
+
+
+ensembleDtype = np.dtype([("point", np.int64),
+    ("targetTemperature", np.float64), ("density", np.float64)]
+    + propertiesDtype.descr)
+
+
+def _runStatePoint(task):
+    """
+    Runs the simulation of a single state point. This is the function
+    executed by the worker processes of Ensemble.run.
+    """
+    ensemble, iPoint, seedSequence = task
+    temperature, density = ensemble.statePoints[iPoint]
+    np.random.seed(seedSequence.generate_state(4))
+
+    simulation = ensemble.buildSimulation(iPoint)
+    simulation.run()
+    properties = simulation.getProperties()
+
+    table = np.zeros(len(properties), dtype=ensembleDtype)
+    table["point"] = iPoint
+    table["targetTemperature"] = temperature
+    table["density"] = density
+    for name in propertiesDtype.names:
+        table[name] = properties[name]
+    return table
+
+
+class Ensemble(object):
+    """
+    Runs the same Lennard-Jones system at several state points, each one
+    with its own Box, BoxManager, ForceFieldManager and Simulation, over a
+    pool of worker processes.
+
+    Every state point draws its random numbers from an independent stream
+    spawned from a single numpy SeedSequence, so results are reproducible
+    for a given seed and do not depend on the number of workers or on the
+    order in which points are run. Every state point writes its trajectory
+    to its own file in outputDir.
+
+    Properties
+    ----------
+    statePoints : list of tuples
+        (reducedTemperature, reducedDensity) of every state point.
+    seed : integer
+        Entropy of the root SeedSequence. Pass it back as seed to
+        reproduce a run that used a random seed.
+    results : numpy structured array or None
+        Property table of the last run (see run).
+
+    Parameters
+    ----------
+    statePoints : list of tuples
+        (reducedTemperature, reducedDensity) of every state point.
+    method : str, optional, default="monteCarlo"
+        "monteCarlo" or "molecularDynamics".
+    numParticles : integer, optional, default=100
+        Number of particles, placed on a cubic lattice.
+    steps : integer, optional, default=10000
+        Number of steps of every simulation.
+    printProp : integer, optional, default=100
+        Frequency at which properties are recorded.
+    printXYZ : integer, optional, default=1000
+        Frequency at which frames are written.
+    cutoff : float, optional, default=None
+        Cutoff of the potential. Defaults to half of the smallest box
+        length of all the state points.
+    maxDisp : float, optional, default=0.1
+        Initial maximum displacement (Monte Carlo).
+    timeStep : float, optional, default=0.001
+        Time step (molecular dynamics).
+    scaleFreq : integer, optional, default=10
+        Velocity rescaling frequency (molecular dynamics).
+    mass : float, optional, default=39.0
+        Particle mass passed to BoxManager.addParticles.
+    seed : integer, optional, default=None
+        Seed of the root SeedSequence. If None, fresh entropy is used.
+    numWorkers : integer, optional, default=None
+        Number of worker processes. Defaults to the number of cores,
+        capped by the number of state points. With one worker the points
+        are run in the calling process.
+    outputDir : str, optional, default="ensemble"
+        Directory receiving the trajectory of every state point.
+    trajectoryFormat : str, optional, default="xyz"
+        "xyz" or "binary".
+    simulationOptions : dict, optional, default=None
+        Additional keyword arguments passed to every Simulation.
+    managerOptions : dict, optional, default=None
+        Additional keyword arguments passed to every ForceFieldManager.
+
+    """
+    def __init__(self, statePoints, method = "monteCarlo", numParticles = 100,
+            steps = 10000, printProp = 100, printXYZ = 1000, cutoff = None,
+            maxDisp = 0.1, timeStep = 0.001, scaleFreq = 10, mass = 39.0,
+            seed = None, numWorkers = None, outputDir = "ensemble",
+            trajectoryFormat = "xyz", simulationOptions = None,
+            managerOptions = None):
+        self.statePoints = [(float(temperature), float(density))
+                for temperature, density in statePoints]
+        self.method = method
+        self.numParticles = numParticles
+        self.steps = steps
+        self.printProp = printProp
+        self.printXYZ = printXYZ
+        if cutoff is None:
+            cutoff = 0.5 * min(self.getBoxLength(density)
+                    for temperature, density in self.statePoints)
+        self.cutoff = cutoff
+        self.maxDisp = maxDisp
+        self.timeStep = timeStep
+        self.scaleFreq = scaleFreq
+        self.mass = mass
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.numWorkers = numWorkers
+        self.outputDir = outputDir
+        self.trajectoryFormat = trajectoryFormat
+        self.simulationOptions = simulationOptions or {}
+        self.managerOptions = managerOptions or {}
+        self.results = None
+
+    def getBoxLength(self, density):
+        """
+        Returns the box length holding numParticles at a reduced density.
+        """
+        return np.cbrt(self.numParticles / density)
+
+    def getTrajectoryFile(self, iPoint):
+        """
+        Returns the location of the trajectory of a state point.
+        """
+        extension = "xyz" if self.trajectoryFormat == "xyz" else "bin"
+        return os.path.join(self.outputDir,
+                "point%03d.%s" % (iPoint, extension))
+
+    def buildSimulation(self, iPoint):
+        """
+        Builds the box and the simulation of a state point.
+
+        Parameters
+        ----------
+        iPoint: integer
+        Index of the state point.
+
+        Returns
+        ----------
+        simulation: Simulation
+        Simulation ready to run.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The global numpy random state is used for the initial velocities,
+        so it must be seeded beforehand.
+
+        """
+        temperature, density = self.statePoints[iPoint]
+        box = Box(length = self.getBoxLength(density))
+        boxManager = BoxManager(box)
+        boxManager.addParticles(n = self.numParticles, method = "lattice",
+                mass = self.mass)
+        ffManager = ForceFieldManager(LennardJones(cutoff = self.cutoff),
+                **self.managerOptions)
+
+        integrator = None
+        if self.method == "molecularDynamics":
+            boxManager.assignVelocities(temperature)
+            boxManager.scaleVelocities(temperature)
+            integrator = VelocityVerlet(timeStep = self.timeStep, box = box)
+
+        options = dict(maxDisp = self.maxDisp, integrator = integrator,
+                scaleFreq = self.scaleFreq,
+                trajectoryFormat = self.trajectoryFormat,
+                trajectoryFile = self.getTrajectoryFile(iPoint),
+                verbose = False)
+        options.update(self.simulationOptions)
+        return Simulation(method = self.method, temperature = temperature,
+                steps = self.steps, printProp = self.printProp,
+                printXYZ = self.printXYZ, ffManager = ffManager,
+                boxManager = boxManager, **options)
+
+    def run(self):
+        """
+        Runs every state point.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        results: numpy structured array
+        Property time series of all the state points, one row per record,
+        with the fields point, targetTemperature and density of the state
+        point followed by the recorded properties (step, energy, pressure,
+        temperature, acceptance and maxDisp, see
+        Simulation.getProperties).
+        Rows are sorted by state point and step.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Scripts calling run with several workers should guard their main
+        code with `if __name__ == "__main__":`.
+
+        """
+        os.makedirs(self.outputDir, exist_ok = True)
+        seedSequences = np.random.SeedSequence(self.seed).spawn(
+                len(self.statePoints))
+        tasks = [(self, iPoint, seedSequences[iPoint])
+                for iPoint in range(0, len(self.statePoints))]
+
+        numWorkers = self.numWorkers or os.cpu_count() or 1
+        numWorkers = min(numWorkers, len(tasks))
+        if numWorkers <= 1:
+            # Keep the random state of the calling process untouched
+            state = np.random.get_state()
+            try:
+                tables = [_runStatePoint(task) for task in tasks]
+            finally:
+                np.random.set_state(state)
+        else:
+            with multiprocessing.get_context().Pool(numWorkers) as pool:
+                tables = pool.map(_runStatePoint, tasks, chunksize = 1)
+
+        self.results = np.concatenate(tables) if tables \
+                else np.zeros(0, dtype=ensembleDtype)
+        return self.results
+
+    def getStatePoint(self, iPoint):
+        """
+        Returns the rows of the last results belonging to a state point.
+        """
+        return self.results[self.results["point"] == iPoint]
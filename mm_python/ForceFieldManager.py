@@ -1,9 +1,158 @@
 import numpy as np
+from .CellList import CellList
+from .NeighborList import VerletList
+from .Backends import getBackend
 
 
 class ForceFieldManager(object):
-    def __init__(self, ForceField):
+    """
+    Class to compute energies, virials and forces of a box with a given
+    force field.
+
+    Parameters
+    ----------
+    ForceField : ForceField
+        Force field used to evaluate the pair interactions.
+    useCellList : bool, optional, default=False
+        If True, a cell list is used so that only particles in
+        neighboring cells are visited.
+    skin : float, optional, default=None
+        If not `None`, a Verlet neighbor list with this skin distance is
+        used for full evaluations of the box (getTotalPairEnergyAndVirial).
+        The list is rebuilt only when a particle has moved more than half
+        the skin since the last build.
+    chunkSize : integer, optional, default=65536
+        Number of listed pairs evaluated at once with the neighbor list.
+    blockSize : integer, optional, default=256
+        Number of particles per tile in full all-pairs evaluations. A tile
+        holds blockSize x blockSize displacements.
+    computeVirialTensor : bool, optional, default=False
+        If True, every full evaluation of the box also accumulates the
+        3x3 pair virial tensor, sum over pairs of rij (x) fij, and stores
+        it in self.virialTensor. Its trace is the scalar virial.
+    backend : str or Backend, optional, default="numpy"
+        Compute backend evaluating the pair kernels, given by its
+        registered name ("python", "numpy", "numba") or as an instance.
+        See Backends.getBackend.
+
+    Notes
+    -----
+    If self.countPairs is set, the NumPy kernels count the pair distances
+    they compute in self.numPairDistances and the pairs found within the
+    cutoff in self.numPairsInCutoff (see Simulation's profile option).
+    The numba and parallel kernels do not update the counters.
+    Pair distances, energies, virials and forces are computed in the
+    precision of the box (see Box); energy and virial totals are always
+    accumulated in double precision.
+
+    """
+    def __init__(self, ForceField, useCellList = False, skin = None,
+            chunkSize = 65536, blockSize = 256, computeVirialTensor = False,
+            backend = "numpy"):
         self.ForceField = ForceField
+        self.backend = getBackend(backend)
+        self.useCellList = useCellList
+        self.cellList = None
+        self.chunkSize = chunkSize
+        self.blockSize = blockSize
+        self.computeVirialTensor = computeVirialTensor
+        self.virialTensor = None
+        self.countPairs = False
+        self.numPairDistances = 0
+        self.numPairsInCutoff = 0
+        if skin is not None:
+            self.neighborList = VerletList(ForceField.cutoff, skin)
+        else:
+            self.neighborList = None
+
+    def resetCounters(self):
+        """
+        Sets the pair counters to zero.
+        """
+        self.numPairDistances = 0
+        self.numPairsInCutoff = 0
+
+    def resetForces(self, box):
+        """
+        Sets box.forces to zero in place, allocating it only if it is
+        missing or its shape or precision do not match the box.
+        """
+        forces = getattr(box, "forces", None)
+        if forces is None or forces.shape != (box.numParticles, 3) \
+                or forces.dtype != box.coordinates.dtype:
+            box.forces = np.zeros((box.numParticles, 3),
+                    dtype=box.coordinates.dtype)
+        else:
+            forces.fill(0.0)
+
+    def getCellList(self, box, rebuild = False):
+        """
+        Returns the cell list of a box, building it if it does not exist,
+        if the box or the cutoff changed or if a rebuild is requested.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        rebuild: bool
+        Forces a full rebuild from the current coordinates.
+
+        Returns
+        ----------
+        cellList: CellList
+        Cell list of the box.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.cellList is None or rebuild \
+                or self.cellList.length != box.length \
+                or self.cellList.cutoff != self.ForceField.cutoff \
+                or len(self.cellList.particleCell) != box.numParticles:
+            self.cellList = CellList(box.length, self.ForceField.cutoff)
+            self.cellList.build(box.coordinates)
+        return self.cellList
+
+    def updateParticle(self, iParticle, box):
+        """
+        Notifies the manager that a single particle has moved, so that
+        the cell list stays consistent. Does nothing if no cell list is
+        used.
+
+        Parameters
+        ----------
+        iParticle: integer
+        Index of the particle
+
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.useCellList:
+            self.getCellList(box).updateParticle(iParticle,
+                    box.coordinates[iParticle])
 
     def getMolPairEnergyAndVirial(self, iParticle, box, populateForces = False):
         """
@@ -34,29 +183,302 @@ class ForceFieldManager(object):
         ----------
         If the option populateForces is True, the
         force vectors will be computed and filled out.
+        If a cell list is used, only the particles in the cells
+        surrounding iParticle are visited.
+        The kernel is provided by the compute backend.
 
         """
+        return self.backend.getMolPairEnergyAndVirial(self, iParticle, box,
+                populateForces)
 
-        iPosition = box.coordinates[iParticle]
-        eTotal = 0.0
-        wTotal = 0.0
-        for jParticle in range(0, box.numParticles):
-            if iParticle == jParticle: continue
-            jPosition = box.coordinates[jParticle]
-            rij = iPosition - jPosition
-            rij = rij - box.length * np.round(rij / box.length)
-            rij2 = np.sum(np.power(rij, 2))
-            if rij2 < self.ForceField.cutoff2:
-                ePair = self.ForceField.evaluate(rij2)
-                wPair = self.ForceField.getPairVirial(rij2)
+    def _getMolPairEnergyAndVirial(self, iParticle, box, populateForces = False):
+        """
+        NumPy implementation of getMolPairEnergyAndVirial.
+        """
 
-                eTotal += ePair
-                wTotal += wPair
-                if populateForces == True:
-                    box.forces[iParticle] += wPair * (rij / rij2)
+        jParticles, rij, rij2 = self.getMolPairDistances(iParticle, box)
+
+        ePairs, wPairs = self.ForceField.getPairEnergyAndVirial(rij2)
+        eTotal = np.sum(ePairs, dtype=np.float64)
+        wTotal = np.sum(wPairs, dtype=np.float64)
+        if populateForces == True:
+            box.forces[iParticle] += \
+                    np.sum((wPairs / rij2)[:, np.newaxis] * rij, axis=0)
 
         return eTotal, wTotal
 
+    def getMolPairDistances(self, iParticle, box, position = None,
+            candidates = None):
+        """
+        Finds the particles within the cutoff of a particle.
+
+        Parameters
+        ----------
+        iParticle: integer
+        Index of the particle
+
+        box: box
+        The box containing the particles.
+
+        position: numpy array, optional
+        Position at which iParticle is placed. Defaults to its current
+        position in the box.
+
+        candidates: numpy array, optional
+        Sorted indices of the particles to consider, iParticle excluded.
+        Defaults to the particles of the surrounding cells if a cell list
+        is used, and to all the particles otherwise.
+
+        Returns
+        ----------
+        jParticles: numpy array
+        Indices of the particles within the cutoff, in increasing order.
+
+        rij: numpy array
+        Minimum-image displacements from every jParticle to iParticle.
+
+        rij2: numpy array
+        Squared distances between iParticle and every jParticle.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The minimum-image displacements to all the candidate particles
+        are computed at once.
+
+        """
+        candidates, rij, rij2 = self.getCandidateDistances(iParticle, box,
+                position, candidates)
+        mask = rij2 < self.ForceField.cutoff2
+        if candidates is not None:
+            jParticles = candidates[mask]
+        else:
+            mask[iParticle] = False
+            jParticles = np.nonzero(mask)[0]
+        if self.countPairs:
+            self.numPairDistances += len(rij2)
+            self.numPairsInCutoff += len(jParticles)
+
+        return jParticles, rij[mask], rij2[mask]
+
+    def getCandidateDistances(self, iParticle, box, position = None,
+            candidates = None):
+        """
+        Computes the minimum-image displacements and squared distances
+        between a particle and its candidate neighbors, before the cutoff
+        is applied. See getMolPairDistances.
+
+        Returns candidates (None if all the particles are candidates, in
+        which case iParticle itself is included), rij and rij2.
+        """
+        if position is None:
+            position = box.coordinates[iParticle]
+        if candidates is None and self.useCellList:
+            candidates = self.getCellList(box).getNeighbors(position)
+            candidates = candidates[candidates != iParticle]
+        if candidates is not None:
+            rij = position - box.coordinates[candidates]
+        else:
+            rij = position - box.coordinates
+        rij = rij - box.length * np.round(rij / box.length)
+        rij2 = np.sum(rij * rij, axis=1)
+        return candidates, rij, rij2
+
+    def getMolPairTerms(self, iParticle, box, position = None,
+            candidates = None):
+        """
+        Computes the individual pair energies and virials between a
+        particle and all the particles within the cutoff.
+
+        Parameters
+        ----------
+        iParticle: integer
+        Index of the particle
+
+        box: box
+        The box containing the particles.
+
+        position: numpy array, optional
+        Position at which iParticle is placed. Defaults to its current
+        position in the box.
+
+        candidates: numpy array, optional
+        Sorted indices of the particles to consider, iParticle excluded
+        (see getMolPairDistances). They are evaluated with NumPy,
+        whatever the backend.
+
+        Returns
+        ----------
+        jParticles: numpy array
+        Indices of the interacting particles.
+
+        ePairs: numpy array
+        Pair energy with every jParticle.
+
+        wPairs: numpy array
+        Pair virial with every jParticle.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if candidates is not None:
+            return self._getMolPairTerms(iParticle, box, position, candidates)
+        return self.backend.getMolPairTerms(self, iParticle, box, position)
+
+    def _getMolPairTerms(self, iParticle, box, position = None,
+            candidates = None):
+        """
+        NumPy implementation of getMolPairTerms.
+        """
+        jParticles, rij, rij2 = \
+                self.getMolPairDistances(iParticle, box, position, candidates)
+        ePairs, wPairs = self.ForceField.getPairEnergyAndVirial(rij2)
+        return jParticles, ePairs, wPairs
+
+    def getMolPairMoveTerms(self, iParticle, box, oldPosition):
+        """
+        Computes the pair terms of a particle that has just been moved
+        (e.g. by a Monte Carlo trial) and finds the particles that may
+        have interacted with it at its old position.
+
+        Parameters
+        ----------
+        iParticle: integer
+        Index of the particle, at its new position in the box.
+
+        box: box
+        The box containing the particles.
+
+        oldPosition: numpy array
+        Position of iParticle before the move.
+
+        Returns
+        ----------
+        jParticles: numpy array
+        Indices of the interacting particles.
+
+        ePairs: numpy array
+        Pair energy with every jParticle.
+
+        wPairs: numpy array
+        Pair virial with every jParticle.
+
+        nearParticles: numpy array or None
+        Sorted indices of the candidate particles closer to the new
+        position than the cutoff plus the length of the move, which
+        include all the particles within the cutoff of oldPosition. None
+        if the backend does not provide them.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The pair terms at oldPosition are then
+        getMolPairTerms(iParticle, box, oldPosition, nearParticles),
+        which only visits the few nearParticles instead of searching the
+        neighbors again. With a cell list, the candidates are the
+        particles of the cells surrounding both positions, so that the
+        neighbors of oldPosition are never missed.
+
+        """
+        return self.backend.getMolPairMoveTerms(self, iParticle, box,
+                oldPosition)
+
+    def _getMolPairMoveTerms(self, iParticle, box, oldPosition):
+        """
+        NumPy implementation of getMolPairMoveTerms.
+        """
+        position = box.coordinates[iParticle]
+        candidates = None
+        if self.useCellList:
+            cellList = self.getCellList(box)
+            candidates = cellList.getNeighbors(position)
+            if cellList.getCellIndex(oldPosition) \
+                    != cellList.getCellIndex(position):
+                candidates = np.union1d(candidates,
+                        cellList.getNeighbors(oldPosition))
+            candidates = candidates[candidates != iParticle]
+        candidates, rij, rij2 = self.getCandidateDistances(iParticle, box,
+                candidates = candidates)
+        displacement = box.coordinates[iParticle] - oldPosition
+        displacement = displacement - box.length \
+                * np.round(displacement / box.length)
+        # Relative margin against the rounding of the distances
+        reach2 = (1.0 + 1e-6) * (self.ForceField.cutoff
+                + np.sqrt(np.sum(displacement * displacement)))**2
+        mask = rij2 < self.ForceField.cutoff2
+        near = rij2 < reach2
+        if candidates is not None:
+            jParticles = candidates[mask]
+            nearParticles = candidates[near]
+        else:
+            mask[iParticle] = False
+            near[iParticle] = False
+            jParticles = np.nonzero(mask)[0]
+            nearParticles = np.nonzero(near)[0]
+        if self.countPairs:
+            self.numPairDistances += len(rij2)
+            self.numPairsInCutoff += len(jParticles)
+
+        ePairs, wPairs = self.ForceField.getPairEnergyAndVirial(rij2[mask])
+        return jParticles, ePairs, wPairs, nearParticles
+
+    def getParticlePairEnergiesAndVirials(self, box):
+        """
+        Computes the inter-molecular energy and virial of every particle.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        particleEnergies: numpy array
+        Inter-molecular energy of every particle.
+
+        particleVirials: numpy array
+        Pair virial of every particle.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Every pair contributes to both of its particles, so the totals
+        of the box are half the sums of these arrays.
+
+        """
+        if self.useCellList:
+            tiles = self.getCellList(box, rebuild = True).getCellPairs()
+        else:
+            tiles = self.getTiles(box)
+
+        particleEnergies = np.zeros(box.numParticles)
+        particleVirials = np.zeros(box.numParticles)
+        for iParticles, jParticles, sameTile in tiles:
+            self.getTileEnergyAndVirial(iParticles, jParticles, sameTile, box,
+                    particleEnergies = particleEnergies,
+                    particleVirials = particleVirials)
+
+        return particleEnergies, particleVirials
+
     def getTotalPairEnergyAndVirial(self, box, populateForces = False):
         """
         Computes the inter-molecular energy of a box.
@@ -83,20 +505,230 @@ class ForceFieldManager(object):
         ----------
         If the option populateForces is True, the
         force vectors will be computed and filled out.
+        If a neighbor list is used, it is updated first and only the
+        listed pairs are evaluated. Otherwise the box is evaluated in tiles
+        (pairs of neighboring cells with a cell list, pairs of blocks of
+        blockSize particles without), visiting every unordered pair once.
+
+        """
+        return self.backend.getTotalPairEnergyAndVirial(self, box,
+                populateForces)
+
+    def _getTotalPairEnergyAndVirial(self, box, populateForces = False):
+        """
+        NumPy implementation of getTotalPairEnergyAndVirial.
+        """
+        if populateForces == True:
+            self.resetForces(box)
+
+        if self.computeVirialTensor:
+            self.virialTensor = np.zeros((3, 3))
+
+        if self.neighborList is not None:
+            self.neighborList.update(box)
+            return self.getNeighborListEnergyAndVirial(box, populateForces,
+                    self.virialTensor)
+
+        if self.useCellList:
+            tiles = self.getCellList(box, rebuild = True).getCellPairs()
+        else:
+            tiles = self.getTiles(box)
+
+        ePair = 0.0
+        wPair = 0.0
+        for iParticles, jParticles, sameTile in tiles:
+            eTile, wTile = self.getTileEnergyAndVirial(iParticles, jParticles,
+                    sameTile, box, populateForces,
+                    virialTensor = self.virialTensor)
+            ePair += eTile
+            wPair += wTile
+
+        return ePair, wPair
+
+    def getTiles(self, box):
+        """
+        Splits the particles of a box into blocks of blockSize particles
+        and iterates over every unordered pair of blocks once.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        tiles: generator
+        Yields (iParticles, jParticles, sameTile) tuples, where sameTile
+        is True when both blocks are the same.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        blocks = [np.arange(start, min(start + self.blockSize, box.numParticles))
+                for start in range(0, box.numParticles, self.blockSize)]
+        for iBlock in range(0, len(blocks)):
+            for jBlock in range(iBlock, len(blocks)):
+                yield blocks[iBlock], blocks[jBlock], iBlock == jBlock
+
+    def getTileEnergyAndVirial(self, iParticles, jParticles, sameTile, box,
+            populateForces = False, particleEnergies = None,
+            particleVirials = None, virialTensor = None):
+        """
+        Computes the energy, virial and forces of all the pairs formed
+        between two groups of particles. Every unordered pair is evaluated
+        once and its force is added to both particles.
+
+        Parameters
+        ----------
+        iParticles: numpy array
+        Indices of the first group of particles.
+
+        jParticles: numpy array
+        Indices of the second group of particles.
+
+        sameTile: bool
+        True if both groups are the same, in which case only the pairs
+        with iParticle < jParticle are evaluated.
+
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        eTile: float
+        Inter-molecular energy of the tile.
+
+        wTile: float
+        Virial of the tile.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        If the option populateForces is True, box.forces must already be
+        allocated; the pair forces are added to it. If particleEnergies
+        and particleVirials are given, the pair terms are added to both
+        particles of every pair. If virialTensor is given, the pair virial
+        tensor of the tile is added to it.
 
         """
+        rij = box.coordinates[iParticles][:, np.newaxis, :] \
+                - box.coordinates[jParticles][np.newaxis, :, :]
+        rij = rij - box.length * np.round(rij / box.length)
+        rij2 = np.sum(rij * rij, axis=2)
+        mask = rij2 < self.ForceField.cutoff2
+        if sameTile:
+            mask &= iParticles[:, np.newaxis] < jParticles[np.newaxis, :]
+        if self.countPairs:
+            self.numPairDistances += rij2.size
+        rij2 = rij2[mask]
+        if self.countPairs:
+            self.numPairsInCutoff += len(rij2)
+
+        ePairs, wPairs = self.ForceField.getPairEnergyAndVirial(rij2)
+
+        if populateForces == True or virialTensor is not None:
+            rij = rij[mask]
+            fij = (wPairs / rij2)[:, np.newaxis] * rij
+            if virialTensor is not None:
+                virialTensor += np.dot(rij.T, fij)
+
         if populateForces == True:
-            box.forces = np.zeros((box.numParticles,3))
+            iIndex, jIndex = np.nonzero(mask)
+            for dim in range(0, 3):
+                box.forces[iParticles, dim] += np.bincount(iIndex, fij[:, dim],
+                        minlength=len(iParticles))
+                box.forces[jParticles, dim] -= np.bincount(jIndex, fij[:, dim],
+                        minlength=len(jParticles))
+
+        if particleEnergies is not None:
+            iIndex, jIndex = np.nonzero(mask)
+            for particleTerms, pairTerms in ((particleEnergies, ePairs),
+                    (particleVirials, wPairs)):
+                particleTerms[iParticles] += np.bincount(iIndex, pairTerms,
+                        minlength=len(iParticles))
+                particleTerms[jParticles] += np.bincount(jIndex, pairTerms,
+                        minlength=len(jParticles))
 
+        return np.sum(ePairs, dtype=np.float64), \
+                np.sum(wPairs, dtype=np.float64)
+
+    def getNeighborListEnergyAndVirial(self, box, populateForces = False,
+            virialTensor = None):
+        """
+        Computes the inter-molecular energy of a box from the pairs stored
+        in the Verlet neighbor list. Every pair is evaluated once.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        ePair: float
+        Total inter-molecular energy of box.
+
+        wPair: float
+        Total virial of box.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The neighbor list must be up to date. If the option populateForces
+        is True, box.forces must already be allocated; the pair forces are
+        added to it. If virialTensor is given, the pair virial tensor is
+        added to it.
+
+        """
         ePair = 0.0
         wPair = 0.0
-        
-        for iParticle in range(0, box.numParticles):
-            eInter, wInter = self.getMolPairEnergyAndVirial \
-                (iParticle, box, populateForces)
-            wPair = wPair + wInter
-            ePair = ePair + eInter
-
-        wPair = wPair/2.0
-        ePair = ePair/2.0
+        iPairs = self.neighborList.iParticles
+        jPairs = self.neighborList.jParticles
+        for start in range(0, len(iPairs), self.chunkSize):
+            iParticles = iPairs[start:start + self.chunkSize]
+            jParticles = jPairs[start:start + self.chunkSize]
+            rij = box.coordinates[iParticles] - box.coordinates[jParticles]
+            rij = rij - box.length * np.round(rij / box.length)
+            rij2 = np.sum(rij * rij, axis=1)
+            mask = rij2 < self.ForceField.cutoff2
+            rij2 = rij2[mask]
+            if self.countPairs:
+                self.numPairDistances += len(mask)
+                self.numPairsInCutoff += len(rij2)
+
+            ePairs, wPairs = self.ForceField.getPairEnergyAndVirial(rij2)
+            ePair += np.sum(ePairs, dtype=np.float64)
+            wPair += np.sum(wPairs, dtype=np.float64)
+
+            if populateForces == True or virialTensor is not None:
+                rij = rij[mask]
+                fij = (wPairs / rij2)[:, np.newaxis] * rij
+                if virialTensor is not None:
+                    virialTensor += np.dot(rij.T, fij)
+
+            if populateForces == True:
+                iParticles = iParticles[mask]
+                jParticles = jParticles[mask]
+                for dim in range(0, 3):
+                    box.forces[:, dim] += \
+                        np.bincount(iParticles, fij[:, dim],
+                            minlength=box.numParticles) \
+                        - np.bincount(jParticles, fij[:, dim],
+                            minlength=box.numParticles)
+
         return ePair, wPair
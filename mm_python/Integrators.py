@@ -1,25 +1,52 @@
 import numpy as np
+from .Backends import getBackend
 
 class Integrators(object):
     """
+    Base class for integrators.
+
+    Parameters
+    ----------
+    integratorType : str
+        String specifying the integrator (e.g. "velocityVerlet")
+    timeStep : float
+        Integration time step.
+    box : Box
+        Box whose particles are integrated.
+    backend : str or Backend, optional, default="numpy"
+        Compute backend performing the updates. See Backends.getBackend.
+
     """
-    def __init__(self, integratorType, timeStep, box):
+    def __init__(self, integratorType, timeStep, box, backend = "numpy"):
 
 
         self.integratorType = integratorType
         self.timeStep = timeStep
         self.box = box
+        self.backend = getBackend(backend)
+        self.scratch = None
+
+    def getScratch(self, like):
+        """
+        Returns the scratch array of the integrator, with the shape and
+        dtype of like. It is reallocated only when they change, so the
+        updates of a run do not allocate memory.
+        """
+        if self.scratch is None or self.scratch.shape != like.shape \
+                or self.scratch.dtype != like.dtype:
+            self.scratch = np.empty_like(like)
+        return self.scratch
 
 
 class VelocityVerlet(Integrators):
     """
     This implements the integration routines for the velocity
     verlet method. Two functions are included, update positions
-    and update velocities. 
+    and update velocities. Both update the arrays of the box in place.
     """
 
-    def __init__(self, timeStep, box):
-        Integrators.__init__(self, "velocityVerlet", timeStep, box)
+    def __init__(self, timeStep, box, backend = "numpy"):
+        Integrators.__init__(self, "velocityVerlet", timeStep, box, backend)
 
     def updatePositions(self):
         """
@@ -45,13 +72,7 @@ class VelocityVerlet(Integrators):
 
         """
 
-        self.box.coordinates = self.box.coordinates \
-                + self.box.velocities * self.timeStep \
-                + 0.5 * self.box.forces * self.timeStep \
-                * self.timeStep 
-
-        self.box.coordinates = self.box.coordinates - self.box.length * \
-                np.round(self.box.coordinates / self.box.length)
+        self.backend.updatePositions(self)
 
     def updateVelocities(self):
         """
@@ -77,5 +98,4 @@ class VelocityVerlet(Integrators):
 
         """
 
-        self.box.velocities = self.box.velocities \
-                + 0.5 * self.box.forces * self.timeStep 
+        self.backend.updateVelocities(self)
@@ -0,0 +1,140 @@
+import numpy as np
+from .CellList import CellList
+
+
+class VerletList(object):
+    """
+    Verlet neighbor list. All the pairs closer than cutoff + skin are
+    stored, so the list stays valid until some particle has moved more
+    than half the skin since the last build. Builds use cell lists.
+
+    Properties
+    ----------
+    cutoff : float
+        Interaction cutoff.
+    skin : float
+        Extra distance added to the cutoff when the list is built.
+    iParticles : numpy array
+        First index of every listed pair.
+    jParticles : numpy array
+        Second index of every listed pair (iParticles < jParticles).
+    numBuilds : integer
+        Number of times the list has been (re)built.
+    numUpdates : integer
+        Number of times the list has been checked for a rebuild.
+
+    Parameters
+    ----------
+    cutoff : float
+        Interaction cutoff.
+    skin : float
+        Skin distance.
+
+    """
+    def __init__(self, cutoff, skin):
+        self.cutoff = cutoff
+        self.skin = skin
+        self.listCutoff = cutoff + skin
+        self.iParticles = None
+        self.jParticles = None
+        self.referenceCoordinates = None
+        self.length = None
+        self.numBuilds = 0
+        self.numUpdates = 0
+
+    def build(self, box):
+        """
+        Builds the list from the current coordinates of a box.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        cellList = CellList(box.length, self.listCutoff)
+        cellList.build(box.coordinates)
+        self.iParticles, self.jParticles = \
+                cellList.getPairs(box.coordinates, self.listCutoff)
+        self.referenceCoordinates = box.coordinates.copy()
+        self.length = box.length
+        self.numBuilds += 1
+
+    def needsRebuild(self, box):
+        """
+        Checks whether the maximum displacement since the last build
+        exceeds half the skin.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        rebuild: bool
+        True if the list must be rebuilt.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.referenceCoordinates is None \
+                or self.length != box.length \
+                or len(self.referenceCoordinates) != box.numParticles:
+            return True
+        displacement = box.coordinates - self.referenceCoordinates
+        displacement = displacement - box.length \
+                * np.round(displacement / box.length)
+        maxDisp2 = np.max(np.sum(displacement * displacement, axis=1))
+        return maxDisp2 > 0.25 * self.skin * self.skin
+
+    def update(self, box):
+        """
+        Rebuilds the list if needed.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        rebuilt: bool
+        True if the list was rebuilt.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        self.numUpdates += 1
+        if self.needsRebuild(box):
+            self.build(box)
+            return True
+        return False
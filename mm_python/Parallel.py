@@ -0,0 +1,430 @@
+import os
+import traceback
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from .Box import Box
+from .CellList import CellList
+from .ForceFieldManager import ForceFieldManager
+from .Backends import NumpyBackend, registerBackend
+
+
+def getForceFieldParameters(ForceField):
+    """
+    Returns the scalar attributes of a force field (cutoff, switch and
+    table settings, and those of child classes) as a sorted tuple of
+    (name, value) pairs. The tables themselves are determined by these
+    settings and are left out.
+    """
+    return tuple(sorted((name, value) for name, value
+            in vars(ForceField).items()
+            if value is None or isinstance(value, (bool, int, float, str))))
+
+
+def _parallelWorker(rank, numWorkers, tasks, results):
+    """
+    Main loop of a worker process of ParallelBackend. The worker attaches
+    to the shared coordinates, to its own slot of the shared forces and
+    to the shared grouping of the particles (cells or blocks), then
+    evaluates the slab of pairs of groups it is given every time it is
+    asked to.
+    """
+    sharedMemory = []
+    ffManager = None
+    box = None
+    order = None
+    groupStart = None
+    iGroups = None
+    jGroups = None
+    while True:
+        message = tasks.get()
+        try:
+            if message[0] == "close":
+                break
+
+            elif message[0] == "setup":
+                (command, names, numParticles, numGroups, dtype, ForceField,
+                        blockSize, iGroups, jGroups) = message
+                for buffer in sharedMemory:
+                    buffer.close()
+                sharedMemory = [shared_memory.SharedMemory(name=name)
+                        for name in names]
+                box = Box(0.0)
+                box.numParticles = numParticles
+                box.coordinates = np.ndarray((numParticles, 3), dtype=dtype,
+                        buffer=sharedMemory[0].buf)
+                box.forces = np.ndarray((numWorkers, numParticles, 3),
+                        dtype=dtype, buffer=sharedMemory[1].buf)[rank]
+                order = np.ndarray(numParticles, dtype=np.int64,
+                        buffer=sharedMemory[2].buf)
+                groupStart = np.ndarray(numGroups + 1, dtype=np.int64,
+                        buffer=sharedMemory[3].buf)
+                ffManager = ForceFieldManager(ForceField,
+                        blockSize = blockSize)
+                results.put((rank, None))
+
+            elif message[0] == "evaluate":
+                (command, length, populateForces, computeVirialTensor,
+                        first, last) = message
+                box.length = length
+                if populateForces:
+                    box.forces.fill(0.0)
+                virialTensor = np.zeros((3, 3)) if computeVirialTensor else None
+
+                ePair = 0.0
+                wPair = 0.0
+                for iGroup, jGroup in zip(iGroups[first:last],
+                        jGroups[first:last]):
+                    iParticles = order[groupStart[iGroup]:groupStart[iGroup + 1]]
+                    jParticles = order[groupStart[jGroup]:groupStart[jGroup + 1]]
+                    if len(iParticles) == 0 or len(jParticles) == 0: continue
+                    eTile, wTile = ffManager.getTileEnergyAndVirial(
+                            iParticles, jParticles, iGroup == jGroup, box,
+                            populateForces, virialTensor = virialTensor)
+                    ePair += eTile
+                    wPair += wTile
+                results.put((rank, (ePair, wPair, virialTensor)))
+
+        except Exception:
+            results.put((rank, traceback.format_exc()))
+
+    del box, order, groupStart
+    for buffer in sharedMemory:
+        buffer.close()
+
+
+class ParallelBackend(NumpyBackend):
+    """
+    Backend splitting full evaluations of the box over a pool of worker
+    processes. Workers are started once and persist across MD steps.
+    The coordinates live in shared memory, which every worker reads
+    without copies, and every worker accumulates its forces into its own
+    slot of a shared array, which the parent process reduces.
+
+    Full evaluations are split into tiles (pairs of blocks of blockSize
+    particles, or pairs of neighboring cells if the manager uses a cell
+    list). The parent builds the cell list once per evaluation and shares
+    the particles sorted by cell; every worker evaluates a contiguous slab
+    of the tiles, the slabs holding about the same number of particle
+    pairs. Single-particle evaluations (used by Monte Carlo) are too small
+    to be worth distributing and run in the parent process with NumPy.
+
+    Properties
+    ----------
+    numWorkers : integer
+        Number of worker processes.
+
+    Parameters
+    ----------
+    numWorkers : integer, optional, default=None
+        Number of worker processes. Defaults to the number of cores.
+
+    Notes
+    -----
+    After the first evaluation, box.coordinates is a view of the shared
+    memory and the integrator updates it in place. Call close() when done
+    to stop the workers; the box then gets a private copy of its
+    coordinates. The Verlet neighbor list of the manager is not used.
+    Scripts using this backend should guard their main code with
+    `if __name__ == "__main__":` so that worker processes can be started
+    on every platform.
+
+    """
+    name = "parallel"
+
+    def __init__(self, numWorkers = None):
+        if numWorkers is None:
+            numWorkers = os.cpu_count() or 1
+        self.numWorkers = numWorkers
+        self.workers = []
+        self.tasks = []
+        self.results = None
+        self.sharedMemory = []
+        self.coordinates = None
+        self.forces = None
+        self.order = None
+        self.groupStart = None
+        self.groupPairs = None
+        self.cellList = None
+        self.box = None
+        self.setupKey = None
+
+    def start(self):
+        """
+        Starts the worker processes, if they are not already running.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.workers:
+            return
+        if os.name == "posix":
+            # Workers must share the resource tracker of this process,
+            # otherwise their own trackers unlink the shared memory
+            # when they exit.
+            resource_tracker.ensure_running()
+        context = multiprocessing.get_context()
+        self.results = context.Queue()
+        for rank in range(0, self.numWorkers):
+            tasks = context.Queue()
+            worker = context.Process(target=_parallelWorker,
+                    args=(rank, self.numWorkers, tasks, self.results),
+                    daemon=True)
+            worker.start()
+            self.tasks.append(tasks)
+            self.workers.append(worker)
+
+    def gather(self):
+        """
+        Collects one result from every worker, ordered by rank.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        results: list
+        Result of every worker.
+
+        Raises
+        ----------
+        Exception if a worker failed.
+
+
+        Notes
+        ----------
+        None
+
+        """
+        results = [None] * self.numWorkers
+        for i in range(0, self.numWorkers):
+            rank, result = self.results.get()
+            results[rank] = result
+        for result in results:
+            if isinstance(result, str):
+                raise Exception("A parallel worker failed:\n" + result)
+        return results
+
+    def setup(self, ffManager, box):
+        """
+        Allocates the shared memory for a box and sends the force field
+        and the pairs of groups of particles (cells or blocks) to the
+        workers. Does nothing if none of them changed since the last call,
+        including the parameters of the force field.
+
+        Parameters
+        ----------
+        ffManager: ForceFieldManager
+        The manager whose force field is evaluated.
+
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        With a cell list the groups are the cells, otherwise they are
+        consecutive blocks of blockSize particles.
+
+        """
+        if ffManager.useCellList:
+            if self.cellList is None or self.cellList.length != box.length \
+                    or self.cellList.cutoff != ffManager.ForceField.cutoff:
+                self.cellList = CellList(box.length,
+                        ffManager.ForceField.cutoff)
+            numGroups = self.cellList.numCells
+        else:
+            numGroups = -(-box.numParticles // ffManager.blockSize)
+        key = (id(ffManager.ForceField),
+                getForceFieldParameters(ffManager.ForceField),
+                ffManager.useCellList, ffManager.blockSize, numGroups,
+                box.numParticles, box.coordinates.dtype)
+        if key == self.setupKey:
+            return
+
+        self.start()
+        self.releaseBox()
+        self.freeSharedMemory()
+        dtype = box.coordinates.dtype
+        itemSize = dtype.itemsize
+        sizes = [box.numParticles * 3 * itemSize,
+                self.numWorkers * box.numParticles * 3 * itemSize,
+                box.numParticles * 8, (numGroups + 1) * 8]
+        self.sharedMemory = [shared_memory.SharedMemory(create=True,
+            size=max(size, 1)) for size in sizes]
+        self.coordinates = np.ndarray((box.numParticles, 3), dtype=dtype,
+                buffer=self.sharedMemory[0].buf)
+        self.forces = np.ndarray((self.numWorkers, box.numParticles, 3),
+                dtype=dtype, buffer=self.sharedMemory[1].buf)
+        self.order = np.ndarray(box.numParticles, dtype=np.int64,
+                buffer=self.sharedMemory[2].buf)
+        self.groupStart = np.ndarray(numGroups + 1, dtype=np.int64,
+                buffer=self.sharedMemory[3].buf)
+
+        if ffManager.useCellList:
+            self.groupPairs = self.cellList.getCellPairIndices()
+        else:
+            # Blocks never change: the particles are in their own order
+            self.order[:] = np.arange(box.numParticles)
+            self.groupStart[:] = np.minimum(np.arange(numGroups + 1)
+                    * ffManager.blockSize, box.numParticles)
+            self.groupPairs = np.triu_indices(numGroups)
+
+        for tasks in self.tasks:
+            tasks.put(("setup", [buffer.name for buffer in self.sharedMemory],
+                    box.numParticles, numGroups, dtype, ffManager.ForceField,
+                    ffManager.blockSize) + tuple(self.groupPairs))
+        self.gather()
+        self.setupKey = key
+
+    def getSlabs(self):
+        """
+        Splits the pairs of groups into one contiguous slab per worker,
+        with about the same number of particle pairs in every slab.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        bounds: numpy array
+        Worker rank evaluates the pairs of groups bounds[rank] to
+        bounds[rank+1].
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        iGroups, jGroups = self.groupPairs
+        counts = np.diff(self.groupStart)
+        work = np.cumsum(counts[iGroups] * counts[jGroups])
+        targets = work[-1] * np.arange(1, self.numWorkers) / self.numWorkers
+        bounds = np.searchsorted(work, targets, side="right")
+        return np.concatenate(([0], bounds, [len(iGroups)]))
+
+    def getTotalPairEnergyAndVirial(self, ffManager, box,
+            populateForces = False):
+        self.setup(ffManager, box)
+        if box.coordinates is not self.coordinates:
+            self.releaseBox()
+            self.coordinates[:] = box.coordinates
+            box.coordinates = self.coordinates
+            self.box = box
+        if ffManager.useCellList:
+            # Built once here and shared, instead of once per worker
+            self.cellList.build(box.coordinates)
+            self.order[:] = self.cellList.order
+            self.groupStart[:] = self.cellList.cellStart
+
+        bounds = self.getSlabs()
+        for rank, tasks in enumerate(self.tasks):
+            tasks.put(("evaluate", box.length, populateForces == True,
+                    bool(ffManager.computeVirialTensor), int(bounds[rank]),
+                    int(bounds[rank + 1])))
+        results = self.gather()
+
+        ePair = 0.0
+        wPair = 0.0
+        for eWorker, wWorker, virialTensor in results:
+            ePair += eWorker
+            wPair += wWorker
+        if ffManager.computeVirialTensor:
+            ffManager.virialTensor = np.sum([virialTensor
+                    for eWorker, wWorker, virialTensor in results], axis=0)
+        if populateForces == True:
+            ffManager.resetForces(box)
+            np.sum(self.forces, axis=0, dtype=np.float64, out=box.forces)
+        return ePair, wPair
+
+    def releaseBox(self):
+        """
+        Gives the box attached to the shared coordinates a private copy
+        of its coordinates.
+        """
+        if self.box is not None and self.box.coordinates is self.coordinates:
+            self.box.coordinates = self.coordinates.copy()
+        self.box = None
+
+    def freeSharedMemory(self):
+        """
+        Releases the shared memory blocks.
+        """
+        self.coordinates = None
+        self.forces = None
+        self.order = None
+        self.groupStart = None
+        for buffer in self.sharedMemory:
+            buffer.close()
+            buffer.unlink()
+        self.sharedMemory = []
+        self.setupKey = None
+
+    def close(self):
+        """
+        Stops the workers and releases the shared memory.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The backend can still be used afterwards; the workers are then
+        started again.
+
+        """
+        for tasks in self.tasks:
+            tasks.put(("close",))
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.tasks = []
+        self.results = None
+        self.releaseBox()
+        self.freeSharedMemory()
+
+
+registerBackend("parallel", ParallelBackend)
@@ -0,0 +1,157 @@
+import time
+
+
+class _Phase(object):
+    """
+    Context manager adding the wall time of a block of code to a timer of
+    a Profiler. Re-entering a phase that is already running (e.g. in a
+    recursive call) is allowed; only the outermost block is timed.
+    """
+    __slots__ = ("profiler", "name", "starts")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.starts = []
+
+    def __enter__(self):
+        self.starts.append(time.perf_counter())
+        self.profiler.depth += 1
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.starts.pop()
+        profiler = self.profiler
+        profiler.depth -= 1
+        if not self.starts:
+            profiler.times[self.name] += elapsed
+        if profiler.depth == 0:
+            profiler.topLevelTime += elapsed
+
+
+class _NullPhase(object):
+    """
+    Context manager doing nothing, returned by a disabled Profiler.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_nullPhase = _NullPhase()
+
+
+class Profiler(object):
+    """
+    Accumulates the wall time spent in named phases of a run and named
+    event counters. A disabled profiler costs one method call per phase.
+
+    Usage:
+
+        with profiler.phase("force"):
+            ...
+        profiler.count("trials")
+
+    Properties
+    ----------
+    enabled : bool
+        Whether times and counts are accumulated.
+    times : dict
+        Seconds spent in every phase.
+    topLevelTime : float
+        Seconds spent in phases not nested in another phase, i.e. the
+        time covered by at least one phase.
+    depth : integer
+        Number of phases currently running.
+    counts : dict
+        Value of every counter.
+    wallTime : float
+        Seconds between start and stop (or now, if still running).
+
+    Parameters
+    ----------
+    enabled : bool, optional, default=True
+        Accumulate times and counts.
+
+    """
+    def __init__(self, enabled = True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all the timers and counters.
+        """
+        self.times = {}
+        self.counts = {}
+        self.phases = {}
+        self.topLevelTime = 0.0
+        self.depth = 0
+        self.startTime = None
+        self.stopTime = None
+
+    def start(self):
+        """
+        Clears the profiler and starts the wall clock of a run.
+        """
+        self.reset()
+        self.startTime = time.perf_counter()
+
+    def stop(self):
+        """
+        Stops the wall clock of a run.
+        """
+        if self.startTime is not None:
+            self.stopTime = time.perf_counter()
+
+    @property
+    def wallTime(self):
+        if self.startTime is None:
+            return 0.0
+        stopTime = self.stopTime if self.stopTime is not None \
+                else time.perf_counter()
+        return stopTime - self.startTime
+
+    def phase(self, name):
+        """
+        Returns a context manager timing a phase.
+
+        Parameters
+        ----------
+        name: str
+        Name of the phase.
+
+        Returns
+        ----------
+        phase: context manager
+        Adds the time spent in its block to times[name].
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Phases may be nested; the time of an inner phase is also counted
+        in the outer one, but only once in topLevelTime. A phase nested
+        in itself is only timed once, by its outermost block.
+
+        """
+        if not self.enabled:
+            return _nullPhase
+        phase = self.phases.get(name)
+        if phase is None:
+            self.times[name] = 0.0
+            phase = self.phases[name] = _Phase(self, name)
+        return phase
+
+    def count(self, name, increment = 1):
+        """
+        Adds increment to a counter.
+        """
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + increment
@@ -0,0 +1,280 @@
+import os
+import struct
+import numpy as np
+
+
+propertiesDtype = np.dtype([("step", np.int64), ("energy", np.float64),
+    ("pressure", np.float64), ("temperature", np.float64),
+    ("acceptance", np.float64), ("maxDisp", np.float64)])
+
+npyMagic = b"\x93NUMPY\x01\x00"
+npyHeaderSize = 256
+
+
+def _getNpyHeader(numRows):
+    """
+    Returns a .npy (version 1.0) header for numRows records, padded to a
+    fixed size so that it can be rewritten in place when rows are added.
+    """
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" \
+            % (np.lib.format.dtype_to_descr(propertiesDtype), numRows)
+    header = header.ljust(npyHeaderSize - len(npyMagic) - 2 - 1) + "\n"
+    return npyMagic + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class PropertyLogger(object):
+    """
+    Records the properties of a simulation (step, energy, pressure,
+    temperature, acceptance and maxDisp) into a preallocated columnar
+    buffer. Full buffers are flushed in one go to a file or kept in
+    memory, so recording is cheap enough to be done every step.
+
+    Properties
+    ----------
+    fileName : str or None
+        Location of the output file.
+    numRows : integer
+        Number of records written so far.
+
+    Parameters
+    ----------
+    fileName : str, optional, default=None
+        Location of the output file. The format is chosen by extension:
+        ".csv" (comma separated text with a header line) or ".npy"
+        (numpy structured array, readable with np.load). If None, the
+        records are only kept in memory.
+    chunkSize : integer, optional, default=1024
+        Number of records buffered between two writes to the file.
+    keepInMemory : bool, optional, default=None
+        Keep every record in memory. If False, only the records not
+        flushed yet are kept, and toArray reads the others back from the
+        file. If None, records are kept in memory only when there is no
+        file.
+    offset : integer, optional, default=None
+        If not `None`, the existing file is truncated to offset bytes
+        (as returned by tell) and new records are appended to it. The
+        records kept in memory are read back from the truncated file.
+        Used to resume a run from a checkpoint.
+    numRows : integer, optional, default=0
+        Number of records already in the file when offset is given.
+
+    """
+    def __init__(self, fileName = None, chunkSize = 1024, keepInMemory = None,
+            offset = None, numRows = 0):
+        self.fileName = fileName
+        self.chunkSize = chunkSize
+        self.keepInMemory = fileName is None if keepInMemory is None \
+                else keepInMemory
+        self.buffer = np.zeros(chunkSize, dtype=propertiesDtype)
+        self.numBuffered = 0
+        self.chunks = []
+        self.numRows = numRows if offset is not None else 0
+        self.file = None
+
+        if fileName is None:
+            self.fileFormat = None
+            return
+        extension = os.path.splitext(fileName)[1].lower()
+        if extension == ".csv":
+            self.fileFormat = "csv"
+        elif extension == ".npy":
+            self.fileFormat = "npy"
+        else:
+            raise Exception("Property files must end in '.csv' or '.npy'")
+
+        if offset is None:
+            self.file = open(fileName, "wb")
+            if self.fileFormat == "csv":
+                self.file.write((",".join(propertiesDtype.names) + "\n")
+                        .encode("ascii"))
+            else:
+                self.file.write(_getNpyHeader(0))
+        else:
+            if self.keepInMemory:
+                self.chunks = [self.readFile(offset)]
+            self.file = open(fileName, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            self.writeHeader()
+
+    def record(self, step, energy, pressure = np.nan, temperature = np.nan,
+            acceptance = np.nan, maxDisp = np.nan):
+        """
+        Adds a record.
+
+        Parameters
+        ----------
+        step: integer
+        Simulation step.
+
+        energy: float
+        Energy per particle.
+
+        pressure: float
+        Pressure.
+
+        temperature: float
+        Temperature.
+
+        acceptance: float
+        Acceptance rate of MC moves (%).
+
+        maxDisp: float
+        Maximum MC displacement.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Properties that do not apply are stored as NaN.
+
+        """
+        self.buffer[self.numBuffered] = (step, energy, pressure, temperature,
+                acceptance, maxDisp)
+        self.numBuffered += 1
+        if self.numBuffered == self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered records to the file, updates the header of
+        .npy files and empties the buffer.
+        """
+        if self.numBuffered == 0:
+            return
+        chunk = self.buffer[:self.numBuffered]
+        if self.file is not None:
+            if self.fileFormat == "csv":
+                lines = "".join("%d,%.17g,%.17g,%.17g,%.17g,%.17g\n"
+                        % tuple(row) for row in chunk.tolist())
+                self.file.write(lines.encode("ascii"))
+            else:
+                self.file.write(chunk.tobytes())
+        if self.keepInMemory:
+            self.chunks.append(chunk.copy())
+        self.numRows += self.numBuffered
+        self.numBuffered = 0
+        self.writeHeader()
+
+    def writeHeader(self):
+        """
+        Rewrites the header of a .npy file in place with the number of
+        records written so far, so that the file is readable with np.load
+        while the run continues and after a crash.
+        """
+        if self.file is None or self.fileFormat != "npy":
+            return
+        self.file.seek(0)
+        self.file.write(_getNpyHeader(self.numRows))
+        self.file.seek(0, os.SEEK_END)
+
+    def tell(self):
+        """
+        Flushes the buffer and returns the size of the file in bytes
+        (None if there is no file).
+        """
+        self.flush()
+        if self.file is None:
+            return None
+        self.file.flush()
+        return self.file.tell()
+
+    def toArray(self):
+        """
+        Returns the records as a numpy structured array.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        properties: numpy structured array
+        One row per record with the fields step, energy, pressure,
+        temperature, acceptance and maxDisp.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        If keepInMemory is False, the flushed records are read back from
+        the file. Without a file, only the records that were not flushed
+        yet are returned.
+
+        """
+        chunks = self.chunks
+        if not self.keepInMemory and self.fileName is not None:
+            if self.file is not None:
+                self.file.flush()
+            chunks = [self.readFile()]
+        return np.concatenate(chunks + [self.buffer[:self.numBuffered].copy()])
+
+    def readFile(self, offset = None):
+        """
+        Reads the records written to the file.
+
+        Parameters
+        ----------
+        offset: integer
+        Only the first offset bytes of the file are read (as returned by
+        tell). Defaults to the whole file.
+
+        Returns
+        ----------
+        properties: numpy structured array
+        Records found in the file.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The number of records of a .npy file is taken from the file size
+        rather than from its header, which is only rewritten after the
+        records of every flush. This also recovers the records of a file
+        whose last header update was interrupted.
+
+        """
+        with open(self.fileName, "rb") as propertyFile:
+            data = propertyFile.read() if offset is None \
+                    else propertyFile.read(offset)
+        if self.fileFormat == "npy":
+            return np.frombuffer(data[npyHeaderSize:],
+                    dtype=propertiesDtype).copy()
+        lines = data.decode("ascii").splitlines()[1:]
+        if not lines:
+            return np.zeros(0, dtype=propertiesDtype)
+        return np.loadtxt(lines, dtype=propertiesDtype, delimiter=",",
+                ndmin=1)
+
+    def load(self, properties):
+        """
+        Replaces the records kept in memory (e.g. when resuming from a
+        checkpoint). The file is not modified.
+        """
+        self.chunks = [np.asarray(properties, dtype=propertiesDtype).copy()] \
+                if self.keepInMemory else []
+        self.numBuffered = 0
+
+    def close(self):
+        """
+        Flushes the buffer and closes the file.
+        """
+        self.flush()
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
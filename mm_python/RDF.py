@@ -0,0 +1,201 @@
+import numpy as np
+from .CellList import CellList
+from .Trajectory import openTrajectory
+
+
+class RadialDistributionFunction(object):
+    """
+    Accumulates the radial distribution function g(r) of a system one
+    frame at a time. Only the histogram is stored, so memory does not
+    grow with the number of frames. Pair distances are found with a cell
+    list and evaluated in bounded tiles.
+
+    Properties
+    ----------
+    bins : integer
+        Number of histogram bins.
+    rMax : float or None
+        Largest distance in the histogram. If None, half the box length
+        of the first frame is used.
+    sampleFreq : integer
+        Frequency (in steps) at which Simulation samples the box.
+    histogram : numpy array
+        Accumulated number of pairs per bin.
+    numFrames : integer
+        Number of accumulated frames.
+
+    Parameters
+    ----------
+    bins : integer, optional, default=50
+        Number of histogram bins.
+    rMax : float, optional, default=None
+        Largest distance in the histogram.
+    sampleFreq : integer, optional, default=1
+        Sampling frequency when used inside Simulation.run.
+    blockSize : integer, optional, default=256
+        Maximum number of particles per side of a distance tile.
+
+    """
+    def __init__(self, bins = 50, rMax = None, sampleFreq = 1,
+            blockSize = 256):
+        self.bins = bins
+        self.rMax = rMax
+        self.sampleFreq = sampleFreq
+        self.blockSize = blockSize
+        self.histogram = np.zeros(bins)
+        self.normalization = 0.0
+        self.numFrames = 0
+
+    def sample(self, box):
+        """
+        Accumulates the current configuration of a box.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        self.accumulate(box.coordinates, box.length)
+
+    def accumulate(self, coordinates, length):
+        """
+        Adds the pair distances of one configuration to the histogram.
+
+        Parameters
+        ----------
+        coordinates: numpy array
+        Particle coordinates (numParticles,3).
+
+        length: float
+        Box length.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if rMax is larger than half the box length.
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.rMax is None:
+            self.rMax = 0.5 * length
+        if self.rMax > 0.5 * length:
+            raise Exception("'rMax' must not exceed half the box length")
+
+        numParticles = len(coordinates)
+        binWidth = self.rMax / self.bins
+        rMax2 = self.rMax * self.rMax
+
+        cellList = CellList(length, self.rMax)
+        cellList.build(coordinates)
+        for iCellParticles, jCellParticles, sameCell in cellList.getCellPairs():
+            for iStart in range(0, len(iCellParticles), self.blockSize):
+                iParticles = iCellParticles[iStart:iStart + self.blockSize]
+                for jStart in range(0, len(jCellParticles), self.blockSize):
+                    jParticles = jCellParticles[jStart:jStart + self.blockSize]
+                    rij = coordinates[iParticles][:, np.newaxis, :] \
+                            - coordinates[jParticles][np.newaxis, :, :]
+                    rij = rij - length * np.round(rij / length)
+                    rij2 = np.sum(rij * rij, axis=2)
+                    mask = rij2 < rMax2
+                    if sameCell:
+                        mask &= iParticles[:, np.newaxis] \
+                                < jParticles[np.newaxis, :]
+                    binIndex = (np.sqrt(rij2[mask]) / binWidth).astype(int)
+                    self.histogram += np.bincount(binIndex,
+                            minlength=self.bins)[:self.bins]
+
+        self.normalization += 0.5 * numParticles * (numParticles - 1) \
+                / np.power(length, 3)
+        self.numFrames += 1
+
+    def accumulateTrajectory(self, fileName, length = None):
+        """
+        Streams all the frames of a trajectory into the histogram.
+
+        Parameters
+        ----------
+        fileName: string
+        Location of a binary or xyz trajectory.
+
+        length: float
+        Box length. Required for xyz trajectories; binary trajectories
+        store it in their header, which takes precedence.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if the box length is unknown.
+
+
+        Notes
+        ----------
+        Only one frame is held in memory at a time.
+
+        """
+        trajectory = openTrajectory(fileName)
+        length = getattr(trajectory, "length", None) or length
+        if length is None:
+            raise Exception("The box length of %s is unknown" % fileName)
+        for coordinates in trajectory:
+            self.accumulate(coordinates, length)
+
+    def getRDF(self):
+        """
+        Normalizes the accumulated histogram.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        r: numpy array
+        Center of every bin.
+
+        gr: numpy array
+        Radial distribution function at every bin center.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        g(r) is the number of pairs found in each spherical shell divided
+        by the number expected for N(N-1)/2 pairs of an ideal gas in the
+        same volume, so that it tends to 1 at large distances.
+
+        """
+        edges = np.linspace(0.0, self.rMax, self.bins + 1)
+        r = 0.5 * (edges[1:] + edges[:-1])
+        shellVolumes = 4.0 / 3.0 * np.pi * (edges[1:]**3 - edges[:-1]**3)
+        gr = self.histogram / (self.normalization * shellVolumes)
+        return r, gr
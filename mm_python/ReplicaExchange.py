@@ -0,0 +1,412 @@
+import copy
+import os
+import traceback
+import multiprocessing
+import numpy as np
+
+
+def _replicaCommand(simulation, message):
+    """
+    Executes a command of the replica exchange driver on one replica and
+    returns its result.
+    """
+    if message[0] == "setup":
+        command, seedSequence = message
+        np.random.seed(seedSequence.generate_state(4))
+        simulation.setup()
+        return simulation.totalPairEnergy
+
+    elif message[0] == "run":
+        command, numSteps = message
+        simulation.runSteps(numSteps)
+        return simulation.totalPairEnergy, simulation.maxDisp, \
+                simulation.nAccept
+
+    elif message[0] == "set":
+        command, temperature, maxDisp, nAccept = message
+        simulation.setTemperature(temperature)
+        simulation.maxDisp = maxDisp
+        simulation.nAccept = nAccept
+        return None
+
+    elif message[0] == "finish":
+        simulation.finish()
+        return (simulation.getProperties(), simulation.maxDisp,
+                simulation.boxManager.box.coordinates)
+
+    raise Exception("Unknown replica command '%s'" % message[0])
+
+
+def _replicaWorker(simulation, tasks, results):
+    """
+    Main loop of a replica worker process. The replica lives in the
+    worker for the whole run; only commands and energies are exchanged
+    with the driver.
+    """
+    while True:
+        message = tasks.get()
+        if message[0] == "close":
+            break
+        try:
+            results.put(_replicaCommand(simulation, message))
+        except Exception:
+            results.put(Exception(traceback.format_exc()))
+
+
+class _LocalReplica(object):
+    """
+    Replica run in the driver process. Every replica keeps its own state
+    of the global random number generator, so that results are the same
+    as with worker processes.
+    """
+    def __init__(self, simulation):
+        self.simulation = simulation
+        self.randomState = None
+        self.result = None
+
+    def send(self, message):
+        if self.randomState is not None:
+            np.random.set_state(self.randomState)
+        self.result = _replicaCommand(self.simulation, message)
+        self.randomState = np.random.get_state()
+
+    def receive(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class _ProcessReplica(object):
+    """
+    Replica run in its own worker process.
+    """
+    def __init__(self, simulation, context):
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=_replicaWorker,
+                args=(simulation, self.tasks, self.results), daemon=True)
+        self.process.start()
+
+    def send(self, message):
+        self.tasks.put(message)
+
+    def receive(self):
+        result = self.results.get()
+        if isinstance(result, Exception):
+            raise Exception("A replica failed:\n%s" % result)
+        return result
+
+    def close(self):
+        self.tasks.put(("close",))
+        self.process.join()
+
+
+class ReplicaExchange(object):
+    """
+    Replica exchange (parallel tempering) Monte Carlo. M copies of a
+    Monte Carlo simulation are run at a ladder of temperatures, each one
+    in its own worker process. Every swapFreq steps, swaps between
+    replicas at neighboring temperatures are attempted with the Metropolis
+    criterion
+
+        pAcc = min(1, exp[(1/T_i - 1/T_j) (E_i - E_j)])
+
+    using the running totalPairEnergy of both replicas. A swap exchanges
+    the temperatures of the two replicas, together with the adapted
+    maximum displacements and the acceptance counters, so only a few
+    numbers per replica travel between processes.
+
+    Properties
+    ----------
+    temperatures : numpy array
+        Temperature ladder, in increasing order.
+    replicaTemperature : numpy array
+        Index of the temperature currently held by every replica.
+    swapAttempts : numpy array
+        Number of attempted swaps between temperatures k and k+1.
+    swapAccepts : numpy array
+        Number of accepted swaps between temperatures k and k+1.
+    energies : numpy array
+        Total pair energy at every temperature (columns) after every
+        exchange interval (rows).
+    replicaIndices : numpy array
+        Replica holding every temperature (columns) after every exchange
+        interval (rows).
+    properties : list of numpy structured arrays
+        Properties recorded by every replica, at mixed temperatures.
+    temperatureProperties : list of numpy structured arrays
+        Properties recorded at every temperature, by whichever replica
+        held it, sorted by step.
+
+    Parameters
+    ----------
+    simulation : Simulation
+        Template Monte Carlo simulation. Every replica is a deep copy of
+        it (box included) set to one of the temperatures. Its steps are
+        the number of steps of every replica.
+    temperatures : list of floats
+        Temperature ladder.
+    swapFreq : integer
+        Number of MC steps between swap attempts.
+    seed : integer, optional, default=None
+        Seed of the SeedSequence used for the replicas and for the swap
+        decisions.
+    useProcesses : bool, optional, default=True
+        Run every replica in its own worker process. If False, replicas
+        are run one after the other in the calling process.
+
+    Notes
+    -----
+    Replica i writes its trajectory to "replica<i>.<ext>" next to the
+    trajectory file of the template (or in the working directory). Swaps
+    alternate between even (0-1, 2-3, ...) and odd (1-2, 3-4, ...) pairs
+    so that every attempt in a round is independent.
+    All the replicas run the same number of steps, so the acceptance
+    counter that travels with a temperature counts the moves accepted at
+    that temperature, and the acceptance rate that adapts its maximum
+    displacement is not mixed with the other temperatures.
+
+    """
+    def __init__(self, simulation, temperatures, swapFreq, seed = None,
+            useProcesses = True):
+        if simulation.method != "monteCarlo":
+            raise Exception("Replica exchange requires a 'monteCarlo' "
+                    "simulation")
+        self.simulation = simulation
+        self.temperatures = np.sort(np.asarray(temperatures, dtype=float))
+        self.numReplicas = len(self.temperatures)
+        self.swapFreq = swapFreq
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.useProcesses = useProcesses
+        self.replicaTemperature = np.arange(self.numReplicas)
+        self.swapAttempts = np.zeros(max(self.numReplicas - 1, 0), dtype=int)
+        self.swapAccepts = np.zeros(max(self.numReplicas - 1, 0), dtype=int)
+        self.energies = None
+        self.replicaIndices = None
+        self.properties = None
+        self.temperatureProperties = None
+        self.coordinates = None
+
+    def getTrajectoryFile(self, iReplica):
+        """
+        Returns the location of the trajectory of a replica.
+        """
+        extension = "xyz" if self.simulation.trajectoryFormat == "xyz" \
+                else "bin"
+        directory = os.path.dirname(self.simulation.trajectoryFile or "")
+        return os.path.join(directory, "replica%d.%s" % (iReplica, extension))
+
+    def buildReplica(self, iReplica):
+        """
+        Builds the simulation of a replica from the template.
+        """
+        replica = copy.deepcopy(self.simulation)
+        replica.setTemperature(self.temperatures[iReplica])
+        replica.trajectoryFile = self.getTrajectoryFile(iReplica)
+        replica.verbose = False
+        return replica
+
+    def attemptSwaps(self, energies, rng, odd):
+        """
+        Attempts swaps between neighboring temperatures.
+
+        Parameters
+        ----------
+        energies: numpy array
+        Total pair energy of every replica.
+
+        rng: numpy RandomState
+        Random number generator of the driver.
+
+        odd: bool
+        Attempt the pairs starting at odd temperature indices.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        temperatureReplica = np.argsort(self.replicaTemperature)
+        for k in range(int(odd), self.numReplicas - 1, 2):
+            iReplica = temperatureReplica[k]
+            jReplica = temperatureReplica[k + 1]
+            delta = (1.0/self.temperatures[k] - 1.0/self.temperatures[k + 1]) \
+                    * (energies[iReplica] - energies[jReplica])
+            self.swapAttempts[k] += 1
+            if delta >= 0.0 or rng.rand() < np.exp(delta):
+                self.swapAccepts[k] += 1
+                self.replicaTemperature[iReplica] = k + 1
+                self.replicaTemperature[jReplica] = k
+
+    def run(self):
+        """
+        Runs all the replicas for the number of steps of the template.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if a replica fails.
+
+
+        Notes
+        ----------
+        After the run, self.properties holds the recorded properties of
+        every replica, self.temperatureProperties those recorded at every
+        temperature and self.coordinates the final configuration of every
+        replica.
+
+        """
+        seedSequences = np.random.SeedSequence(self.seed).spawn(
+                self.numReplicas + 1)
+        rng = np.random.RandomState(seedSequences[-1].generate_state(4))
+
+        replicas = []
+        context = multiprocessing.get_context()
+        for iReplica in range(0, self.numReplicas):
+            simulation = self.buildReplica(iReplica)
+            if self.useProcesses:
+                replicas.append(_ProcessReplica(simulation, context))
+            else:
+                replicas.append(_LocalReplica(simulation))
+
+        state = np.random.get_state()
+        try:
+            for iReplica, replica in enumerate(replicas):
+                replica.send(("setup", seedSequences[iReplica]))
+            energies = np.array([replica.receive() for replica in replicas])
+
+            energyRows = []
+            indexRows = []
+            step = 0
+            numIntervals = 0
+            while step < self.simulation.steps:
+                numSteps = min(self.swapFreq, self.simulation.steps - step)
+                for replica in replicas:
+                    replica.send(("run", numSteps))
+                energies, maxDisps, nAccepts = (np.array(values) for values
+                        in zip(*[replica.receive() for replica in replicas]))
+                step += numSteps
+
+                oldTemperature = self.replicaTemperature.copy()
+                self.attemptSwaps(energies, rng, odd = numIntervals % 2 == 1)
+                numIntervals += 1
+
+                # Swap the maximum displacements and the acceptance
+                # counters along with the temperatures
+                temperatureMaxDisp = np.zeros(self.numReplicas)
+                temperatureMaxDisp[oldTemperature] = maxDisps
+                temperatureAccept = np.zeros(self.numReplicas, dtype=int)
+                temperatureAccept[oldTemperature] = nAccepts
+                for iReplica, replica in enumerate(replicas):
+                    if self.replicaTemperature[iReplica] \
+                            == oldTemperature[iReplica]:
+                        continue
+                    k = self.replicaTemperature[iReplica]
+                    replica.send(("set", self.temperatures[k],
+                        temperatureMaxDisp[k], int(temperatureAccept[k])))
+                    replica.receive()
+
+                temperatureReplica = np.argsort(self.replicaTemperature)
+                energyRows.append(energies[temperatureReplica])
+                indexRows.append(temperatureReplica)
+
+            for replica in replicas:
+                replica.send(("finish",))
+            results = [replica.receive() for replica in replicas]
+        finally:
+            for replica in replicas:
+                replica.close()
+            if not self.useProcesses:
+                np.random.set_state(state)
+
+        self.properties = [properties for properties, maxDisp, coordinates
+                in results]
+        self.coordinates = [coordinates for properties, maxDisp, coordinates
+                in results]
+        self.temperatureProperties = self.getTemperatureProperties()
+        self.energies = np.array(energyRows).reshape(-1, self.numReplicas)
+        self.replicaIndices = np.array(indexRows, dtype=int).reshape(-1,
+                self.numReplicas)
+
+    def getTemperatureProperties(self):
+        """
+        Sorts the properties recorded by the replicas by temperature.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        temperatureProperties: list of numpy structured arrays
+        Properties recorded at every temperature of the ladder, sorted by
+        step.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Every record holds the temperature of the replica when it was
+        recorded, which identifies the temperature it belongs to.
+
+        """
+        properties = np.concatenate(self.properties)
+        temperatureProperties = []
+        for temperature in self.temperatures:
+            records = properties[properties["temperature"] == temperature]
+            temperatureProperties.append(records[np.argsort(records["step"],
+                kind="stable")])
+        return temperatureProperties
+
+    def getSwapAcceptance(self):
+        """
+        Returns the fraction of accepted swaps between every pair of
+        neighboring temperatures.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        acceptance: numpy array
+        Acceptance of the swaps between temperatures k and k+1 (NaN if
+        no swap was attempted).
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        acceptance = np.full(len(self.swapAttempts), np.nan)
+        attempted = self.swapAttempts > 0
+        acceptance[attempted] = self.swapAccepts[attempted] \
+                / self.swapAttempts[attempted]
+        return acceptance
@@ -1,4 +1,16 @@
+import os
+import time
 import numpy as np
+from .Box import Box
+from .Trajectory import XYZTrajectoryWriter, BinaryTrajectoryWriter
+from .RDF import RadialDistributionFunction
+from .AsyncWriter import AsyncWriter
+from .PropertyLogger import PropertyLogger, propertiesDtype
+from .Statistics import PropertyStatistics
+from .Profiler import Profiler
+
+
+checkpointVersion = 1
 
 
 class Simulation(object):
@@ -8,7 +20,15 @@ class Simulation(object):
     """
     def __init__(self, method, temperature, steps, printProp, printXYZ,
             ffManager, boxManager, maxDisp = 0.0,
-            integrator = None, scaleFreq = 0):
+            integrator = None, scaleFreq = 0, energyRefreshFreq = 0,
+            trajectoryFormat = "xyz", trajectoryFile = None,
+            trajectoryPrecision = "double", writeVelocities = False,
+            writeForces = False, analyzers = None, verbose = True,
+            checkpointFile = None, checkpointFreq = 0,
+            checkpointInterval = None, asyncOutput = False,
+            outputQueueSize = 16, propertyFile = None, propertyFreq = None,
+            propertyChunkSize = 1024, accumulateStatistics = True,
+            profile = False, timeUnit = None):
         """
         Constructor of a simulation object.
 
@@ -48,6 +68,85 @@ class Simulation(object):
         Frequency at which atomic velocities will be rescaled to get consistency
         with the target temperature. Relevant only for MD simulations.
 
+        energyRefreshFreq: integer
+        Frequency at which the cached per-particle energies and virials
+        are recomputed from scratch to bound round-off drift. Zero means
+        never. Relevant only for MC simulations.
+
+        trajectoryFormat: string
+        Format of the trajectory, "xyz" (text) or "binary" (fixed stride
+        frames, see BinaryTrajectoryWriter).
+
+        trajectoryFile: string
+        Location of the trajectory. Defaults to "trajectory.xyz" or
+        "trajectory.bin" depending on trajectoryFormat.
+
+        trajectoryPrecision: string
+        "single" or "double" floating point frames. Relevant only for
+        binary trajectories.
+
+        writeVelocities: bool
+        Store velocities in every frame. Relevant only for binary
+        trajectories.
+
+        writeForces: bool
+        Store forces in every frame. Relevant only for binary
+        trajectories.
+
+        analyzers: list
+        On-the-fly analysis objects (e.g. RadialDistributionFunction).
+        Every analyzer's sample(box) method is called each
+        analyzer.sampleFreq steps.
+
+        verbose: bool
+        Print the properties every printProp steps.
+
+        checkpointFile: string
+        Location of the checkpoint file (see writeCheckpoint). If None,
+        no checkpoints are written.
+
+        checkpointFreq: integer
+        Frequency (in steps) at which checkpoints are written. Zero means
+        never.
+
+        checkpointInterval: float
+        Wall time in seconds between checkpoints. None means never. Can
+        be combined with checkpointFreq.
+
+        asyncOutput: bool
+        Format and write frames and printed properties in a background
+        thread (see AsyncWriter), so the step loop does not wait for the
+        disk or the terminal.
+
+        outputQueueSize: integer
+        Maximum number of pending output tasks when asyncOutput is True.
+
+        propertyFile: string
+        Location of the property log, ".csv" or ".npy" (see
+        PropertyLogger). If None, properties are only kept in memory,
+        unless checkpoints are written (see getPropertyFile).
+
+        propertyFreq: integer
+        Frequency at which properties are recorded. Defaults to
+        printProp; 1 records every step.
+
+        propertyChunkSize: integer
+        Number of records buffered between two writes to propertyFile.
+
+        accumulateStatistics: bool
+        Accumulate the mean and the blocking error of the properties at
+        every step (see getAverages).
+
+        profile: bool
+        Time the phases of every step and count pair evaluations, MC
+        trials and neighbor list rebuilds (see getPerformance). The report
+        is printed at the end of the run.
+
+        timeUnit: float
+        Length of the time unit of the integrator in ns (e.g. 2.156e-3
+        for argon in reduced units), used to report ns/day. Relevant only
+        for MD simulations.
+
         Returns
         ----------
         None
@@ -62,6 +161,10 @@ class Simulation(object):
         Output energy will be printed in reduced units.
         Maximum displacement will be adjusted to achieve 40% acceptance rate
         in MC simulations.
+        MC simulations keep the energy and virial of every particle in
+        self.particleEnergies and self.particleVirials, so the old energy
+        of a trial move is never recomputed. When a move is accepted only
+        the moved particle and its neighbors are updated.
 
         """
 
@@ -77,114 +180,1007 @@ class Simulation(object):
         self.beta = 1.0 / (self.temperature)
         self.integrator = integrator
         self.scaleFreq = scaleFreq
+        self.energyRefreshFreq = energyRefreshFreq
+        self.trajectoryFormat = trajectoryFormat
+        self.trajectoryFile = trajectoryFile
+        self.trajectoryPrecision = trajectoryPrecision
+        self.writeVelocities = writeVelocities
+        self.writeForces = writeForces
+        self.analyzers = analyzers or []
+        self.particleEnergies = None
+        self.particleVirials = None
+        self.verbose = verbose
+        self.propertyFile = propertyFile
+        self.propertyFreq = propertyFreq or printProp
+        self.propertyChunkSize = propertyChunkSize
+        self.logger = PropertyLogger(chunkSize = propertyChunkSize)
+        self.accumulateStatistics = accumulateStatistics
+        self.statistics = None
+        self.profiler = Profiler(enabled = profile)
+        self.timeUnit = timeUnit
+        self.neighborBuilds = 0
+        self.resumeOffsets = None
+        self.trajectory = None
+        self.totalPairEnergy = None
+        self.totalPairVirial = None
+        self.currentStep = 0
+        self.nAccept = 0
+        self.checkpointFile = checkpointFile
+        self.checkpointFreq = checkpointFreq
+        self.checkpointInterval = checkpointInterval
+        self.lastCheckpointTime = None
+        self.asyncOutput = asyncOutput
+        self.outputQueueSize = outputQueueSize
+
+    def openTrajectory(self, box, offset = None):
+        """
+        Opens the trajectory writer selected at construction.
+
+        Parameters
+        ----------
+        box: box
+        The box whose frames will be written.
+
+        offset: integer
+        If not None, the existing trajectory is truncated to offset bytes
+        and new frames are appended to it.
+
+        Returns
+        ----------
+        trajectory: XYZTrajectoryWriter or BinaryTrajectoryWriter
+        Writer with write(box, step) and close() methods.
+
+        Raises
+        ----------
+        Exception if trajectoryFormat is not supported.
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if self.trajectoryFormat == "xyz":
+            fileName = self.trajectoryFile or "trajectory.xyz"
+            return XYZTrajectoryWriter(fileName, self.boxManager, offset)
+        elif self.trajectoryFormat == "binary":
+            fileName = self.trajectoryFile or "trajectory.bin"
+            return BinaryTrajectoryWriter(fileName, box,
+                    precision = self.trajectoryPrecision,
+                    velocities = self.writeVelocities,
+                    forces = self.writeForces, offset = offset)
+        else:
+            raise Exception("'trajectoryFormat' must be 'xyz' or 'binary'")
+
+    def openOutput(self, box, offset = None):
+        """
+        Opens the trajectory and, if asyncOutput is set, wraps it in a
+        background writer.
+
+        Parameters
+        ----------
+        box: box
+        The box whose frames will be written.
+
+        offset: integer
+        See openTrajectory.
+
+        Returns
+        ----------
+        trajectory: writer
+        Object with write(box, step), tell() and close() methods.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        trajectory = self.openTrajectory(box, offset)
+        if self.asyncOutput:
+            trajectory = AsyncWriter(trajectory, self.outputQueueSize)
+        return trajectory
+
+    def printProperties(self, *values):
+        """
+        Prints a line of properties, in the output thread if asyncOutput
+        is set.
+        """
+        if self.asyncOutput:
+            self.trajectory.submit(print, *values)
+        else:
+            print(*values)
+
+    def sampleAnalyzers(self, box, iStep):
+        """
+        Calls the analyzers that are due at a given step.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        iStep: integer
+        Index of the step that was just completed.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        for analyzer in self.analyzers:
+            if np.mod(iStep + 1, analyzer.sampleFreq) == 0:
+                analyzer.sample(box)
+
+    def getRDF(self, trajectory = "trajectory.xyz", bins = 50, rMax = None):
+        """
+        Computes the radial distribution function of a trajectory,
+        streaming one frame at a time.
+
+        Parameters
+        ----------
+        trajectory: string
+        Location of a binary or xyz trajectory.
+
+        bins: integer
+        Number of histogram bins.
+
+        rMax: float
+        Largest distance in the histogram. Defaults to half the box
+        length.
+
+        Returns
+        ----------
+        r: numpy array
+        Center of every bin.
+
+        gr: numpy array
+        Radial distribution function at every bin center.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Binary trajectories use the box length stored in their header;
+        xyz files, which do not store it, use the length of the
+        simulation box.
+
+        """
+        rdf = RadialDistributionFunction(bins = bins, rMax = rMax)
+        rdf.accumulateTrajectory(trajectory, self.boxManager.box.length)
+        return rdf.getRDF()
+
+    def getProperties(self):
+        """
+        Returns the properties recorded every propertyFreq steps.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        properties: numpy structured array
+        One row per record with the fields step, energy (potential
+        energy per particle, tail correction included), pressure,
+        temperature, acceptance (%) and maxDisp. Fields that the method
+        does not compute are NaN.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        With a property file (see getPropertyFile), the records are not
+        kept in memory and are read back from the file.
+
+        """
+        return self.logger.toArray()
+
+    def getPropertyFile(self):
+        """
+        Returns the location of the property log.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        fileName: string or None
+        propertyFile if it is given. Otherwise, if checkpoints are
+        written, the ".npy" file named after checkpointFile (e.g.
+        "run_properties.npy" for "run.npz"), and None if they are not.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Checkpoints only store the size of the property log, so a run
+        with checkpoints always logs its properties to a file.
+
+        """
+        if self.propertyFile is not None:
+            return self.propertyFile
+        if self.checkpointFile is not None:
+            return os.path.splitext(self.checkpointFile)[0] \
+                    + "_properties.npy"
+        return None
+
+    def getStatisticsNames(self):
+        """
+        Returns the names of the properties accumulated at every step:
+        energy, pressure and acceptance (%) for MC, energy, pressure and
+        temperature for MD.
+        """
+        if self.method == "monteCarlo":
+            return ["energy", "pressure", "acceptance"]
+        return ["energy", "pressure", "temperature"]
+
+    def getAverages(self):
+        """
+        Returns the averages of the properties accumulated at every step.
+        Can be called during (e.g. between calls to runSteps) and after a
+        run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        averages: dict
+        (mean, error) of every property of getStatisticsNames, where error
+        is the standard error of the mean estimated by blocking analysis
+        (see BlockAverage.getError).
+
+        Raises
+        ----------
+        Exception if accumulateStatistics is False or the run was not set
+        up.
+
+
+        Notes
+        ----------
+        The accumulators use O(log steps) memory, so averages over every
+        step cost no more than averages over the recorded properties.
+
+        """
+        if self.statistics is None:
+            raise Exception("Statistics are not accumulated; set up a run "
+                    "with 'accumulateStatistics' enabled")
+        return self.statistics.getAverages()
+
+    def startProfiler(self):
+        """
+        Clears the timers and counters and starts the wall clock of the
+        profiler (if enabled).
+        """
+        if not self.profiler.enabled:
+            return
+        self.profiler.start()
+        self.ffManager.countPairs = True
+        self.ffManager.resetCounters()
+        neighborList = self.ffManager.neighborList
+        self.neighborBuilds = neighborList.numBuilds \
+                if neighborList is not None else 0
+
+    def getPerformance(self):
+        """
+        Returns the performance of the run so far. Can be called during
+        and after a run.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        performance: dict
+        wallTime (s), steps, stepsPerSecond, pairDistances (pair
+        distances computed), pairsInCutoff (pairs evaluated within the
+        cutoff), pairDistancesPerSecond, pairsPerSecond, neighborBuilds,
+        phases (seconds spent in every phase of the steps) and, for MC,
+        trials and accepts, or, for MD, timePerDay (time units simulated
+        per day) and nsPerDay (if timeUnit is set).
+
+        Raises
+        ----------
+        Exception if the simulation is not profiled.
+
+
+        Notes
+        ----------
+        Phases are "energy", "cacheUpdate" and "properties" for MC,
+        "integrator", "force", "velocityScaling" and "properties" for MD,
+        plus "output", "analysis" and "checkpoint". Nested phases are
+        also counted in the phases that contain them, so the phases may
+        add up to more than wallTime. Time not spent in any phase (e.g.
+        setup) is reported as "other". Pair counters are only updated by
+        the NumPy kernels.
+
+        """
+        if not self.profiler.enabled:
+            raise Exception("The simulation is not profiled; construct it "
+                    "with 'profile' enabled")
+        wallTime = self.profiler.wallTime
+        rate = lambda value: value / wallTime if wallTime > 0.0 else np.nan
+        steps = self.profiler.counts.get("steps", 0)
+        neighborList = self.ffManager.neighborList
+        phases = dict(self.profiler.times)
+        phases["other"] = wallTime - self.profiler.topLevelTime
+        performance = dict(wallTime = wallTime, steps = steps,
+                stepsPerSecond = rate(steps),
+                pairDistances = self.ffManager.numPairDistances,
+                pairsInCutoff = self.ffManager.numPairsInCutoff,
+                pairDistancesPerSecond = rate(self.ffManager.numPairDistances),
+                pairsPerSecond = rate(self.ffManager.numPairsInCutoff),
+                neighborBuilds = neighborList.numBuilds - self.neighborBuilds
+                    if neighborList is not None else 0,
+                phases = phases)
+        if self.method == "monteCarlo":
+            performance["trials"] = self.profiler.counts.get("trials", 0)
+            performance["accepts"] = self.profiler.counts.get("accepts", 0)
+        else:
+            performance["timePerDay"] = \
+                    rate(steps * self.integrator.timeStep) * 86400.0
+            if self.timeUnit is not None:
+                performance["nsPerDay"] = \
+                        performance["timePerDay"] * self.timeUnit
+        return performance
+
+    def printPerformance(self):
+        """
+        Prints the performance report of getPerformance.
+        """
+        performance = self.getPerformance()
+        lines = ["Performance: %d steps in %.3f s" % (performance["steps"],
+            performance["wallTime"])]
+        for label, name in (("steps/s", "stepsPerSecond"),
+                ("pair distances/s", "pairDistancesPerSecond"),
+                ("pairs in cutoff/s", "pairsPerSecond"),
+                ("time units/day", "timePerDay"),
+                ("ns/day", "nsPerDay")):
+            if name in performance:
+                lines.append("  %-20s %.6g" % (label, performance[name]))
+        for label, name in (("MC trials", "trials"),
+                ("MC accepts", "accepts"),
+                ("neighbor rebuilds", "neighborBuilds")):
+            if name in performance:
+                lines.append("  %-20s %d" % (label, performance[name]))
+        for name, seconds in sorted(performance["phases"].items(),
+                key = lambda item: -item[1]):
+            fraction = seconds / performance["wallTime"] * 100.0 \
+                    if performance["wallTime"] > 0.0 else 0.0
+            lines.append("  %-20s %.3f s (%.1f%%)" % (name, seconds,
+                fraction))
+        self.printProperties("\n".join(lines))
+
+    def refreshEnergies(self, box):
+        """
+        Recomputes the per-particle energy and virial cache from scratch.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        Returns
+        ----------
+        totalPairEnergy: float
+        Total inter-molecular energy of box.
+
+        totalPairVirial: float
+        Total virial of box.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
 
-    def run(self):
         """
-        Main driver to perform a Metropolis Monte Carlo simulation of the
-        Lennard Jones fuid.
+        self.particleEnergies, self.particleVirials = \
+                self.ffManager.getParticlePairEnergiesAndVirials(box)
+        totalPairEnergy = 0.5 * np.sum(self.particleEnergies)
+        totalPairVirial = 0.5 * np.sum(self.particleVirials)
+        return totalPairEnergy, totalPairVirial
+
+    def setup(self):
+        """
+        Prepares a run: opens the trajectory, writes the initial frame and
+        computes the initial energies (and forces, for MD).
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        Exception if the method is not supported.
+
+
+        Notes
+        ----------
+        run() is equivalent to setup(), runSteps(steps) and finish().
+        Drivers that need to act between steps (e.g. replica exchange)
+        call runSteps repeatedly instead. The running totals are kept in
+        self.totalPairEnergy and self.totalPairVirial, the number of
+        completed steps in self.currentStep and the number of accepted
+        MC moves in self.nAccept.
+
         """
+        if self.method not in ("monteCarlo", "molecularDynamics"):
+            raise Exception("'method' must be 'monteCarlo' or "
+                    "'molecularDynamics'")
+
+        box = self.boxManager.box
+        self.startProfiler()
+        self.trajectory = self.openOutput(box)
+        self.logger = PropertyLogger(self.getPropertyFile(),
+                chunkSize = self.propertyChunkSize)
+        self.trajectory.write(box, 0)
+        self.tailCorrection = self.ffManager.ForceField.getTailCorrection(box)
+        self.pressureCorrection = \
+                self.ffManager.ForceField.getPressureCorrection(box)
+        self.currentStep = 0
+        self.nAccept = 0
+        self.lastCheckpointTime = time.time()
+        self.statistics = PropertyStatistics(self.getStatisticsNames()) \
+                if self.accumulateStatistics else None
+
         if self.method == "monteCarlo":
-            trajectory = open('trajectory.xyz', 'w')
-            self.boxManager.printXYZ(trajectory)
-            box = self.boxManager.box
-            totalPairEnergy, totalPairVirial = \
-                    self.ffManager.getTotalPairEnergyAndVirial(box)
-            tailCorrection = self.ffManager.ForceField.getTailCorrection(box)
-            pressureCorrection = \
-                    self.ffManager.ForceField.getPressureCorrection(box)
-            nAccept = 0
-            for iStep in range(0, self.steps):
-                iParticle = np.random.randint(box.numParticles)
-                randomDisplacement = (2.0 * np.random.rand(3) - 1.0)  \
-                        * self.maxDisp
-
-                oldPosition = box.coordinates[iParticle].copy()
-                oldEnergy, oldVirial = \
-                        self.ffManager.getMolPairEnergyAndVirial(iParticle,box)
-
-                box.coordinates[iParticle] += randomDisplacement
-                box.coordinates[iParticle] = \
-                    box.coordinates[iParticle] - box.length * \
-                    np.round(box.coordinates[iParticle]/box.length)
-
-                newEnergy, newVirial = \
-                        self.ffManager.getMolPairEnergyAndVirial(iParticle, box)
-
-                dE = newEnergy - oldEnergy
-                accept = False
-                if dE <= 0.0:
-                    accept = True
-                else:
-                    randomNumber = np.random.rand(1)[0]
-                    factor = self.beta * dE
-                    pAcc = np.exp(-factor)
-                    if randomNumber < pAcc:
-                        accept = True
-                if accept:
-                    nAccept = nAccept + 1
-                    totalPairEnergy = totalPairEnergy + dE
-                    totalPairVirial = totalPairVirial + (newVirial - oldVirial)
-                else:
-                    box.coordinates[iParticle] = oldPosition.copy()
-
-                if np.mod(iStep + 1, self.printProp) == 0:
-                    accRate = float(nAccept)/(float(iStep)+1) * 100
-                    pressure = totalPairVirial
-                    pressure += 3.0*box.numParticles/self.beta
-                    pressure /= 3.0*np.power(box.length,3)
-                    pressure += pressureCorrection
-
-                    totalEnergy = (totalPairEnergy + tailCorrection) \
-                            / box.numParticles
-                    print(iStep+1, totalEnergy, pressure, accRate, self.maxDisp)
-
-                    if accRate < 38.0:
-                        self.maxDisp = self.maxDisp*0.8
-                    elif accRate > 42.0:
-                        self.maxDisp = self.maxDisp*1.2
-
-                if np.mod(iStep + 1, self.printXYZ) == 0:
-                    self.boxManager.printXYZ(trajectory)
-
-            trajectory.close()
-
-        if self.method == "molecularDynamics":
-
-            box = self.boxManager.box
-
-            trajectory = open('trajectory.xyz', 'w')
-            self.boxManager.printXYZ(trajectory)
-
-            tailCorrection = self.ffManager.ForceField.getTailCorrection(box)
-            pressureCorrection = \
-                    self.ffManager.ForceField.getPressureCorrection(box)
-
-            totalPairEnergy, totalPairVirial = \
+            self.totalPairEnergy, self.totalPairVirial = \
+                    self.refreshEnergies(box)
+        else:
+            self.totalPairEnergy, self.totalPairVirial = \
                     self.ffManager.getTotalPairEnergyAndVirial(box, \
                     populateForces = True)
 
-            totalEnergy = \
-                    (totalPairEnergy + tailCorrection)/ \
-                    box.numParticles
+    def runSteps(self, numSteps):
+        """
+        Advances the simulation by a number of MC or MD steps.
+
+        Parameters
+        ----------
+        numSteps: integer
+        Number of steps to perform.
 
-            for iStep in range(0,self.steps):
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        setup() must have been called. Output and adaptation frequencies
+        are counted from the beginning of the run, so calling runSteps
+        several times gives the same result as a single call.
+
+        """
+        box = self.boxManager.box
+        profiler = self.profiler
+        for iStep in range(self.currentStep, self.currentStep + numSteps):
+            if self.method == "monteCarlo":
+                self.monteCarloStep(box, iStep)
+            else:
+                self.molecularDynamicsStep(box, iStep)
+
+            if np.mod(iStep + 1, self.printXYZ) == 0:
+                with profiler.phase("output"):
+                    self.trajectory.write(box, iStep + 1)
+
+            if self.analyzers:
+                with profiler.phase("analysis"):
+                    self.sampleAnalyzers(box, iStep)
+            self.currentStep = iStep + 1
+            profiler.count("steps")
+
+            if self.checkpointDue():
+                with profiler.phase("checkpoint"):
+                    self.writeCheckpoint()
+
+    def finish(self):
+        """
+        Closes the trajectory of a run, writing a last checkpoint if
+        checkpoints are enabled.
+        """
+        if self.checkpointFile is not None:
+            self.writeCheckpoint()
+        self.profiler.stop()
+        if self.verbose and self.statistics is not None:
+            for name, (mean, error) in self.getAverages().items():
+                self.printProperties("<%s> = %.6f +/- %.6f"
+                        % (name, mean, error))
+        if self.profiler.enabled:
+            self.printPerformance()
+        self.trajectory.close()
+        self.logger.close()
+
+    def checkpointDue(self):
+        """
+        Returns True if a checkpoint must be written after the current
+        step.
+        """
+        if self.checkpointFile is None:
+            return False
+        if self.checkpointFreq > 0 \
+                and np.mod(self.currentStep, self.checkpointFreq) == 0:
+            return True
+        if self.checkpointInterval is not None and \
+                time.time() - self.lastCheckpointTime >= self.checkpointInterval:
+            return True
+        return False
+
+    def writeCheckpoint(self, fileName = None):
+        """
+        Writes the full state of the simulation to a binary checkpoint.
+
+        Parameters
+        ----------
+        fileName: string
+        Location of the checkpoint. Defaults to self.checkpointFile.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The checkpoint is an uncompressed numpy .npz archive holding the
+        box (length, coordinates, velocities, forces), the step, the
+        running totals, the acceptance counter, the adapted maxDisp, the
+        per-particle energy cache, the state of the global numpy random
+        number generator, the reference configuration of the Verlet list,
+        the statistics accumulators and the sizes of the trajectory and of
+        the property file.
+        Recorded properties are flushed to the property file (see
+        getPropertyFile) rather than stored, and only its size is saved,
+        so the size of a checkpoint does not grow with the number of
+        steps. Only a simulation without checkpointFile and propertyFile
+        keeps its properties in memory; a checkpoint written by such a
+        simulation (with an explicit fileName) stores all of them.
+        It is written to a temporary file, synced, and renamed over the
+        previous checkpoint, so a checkpoint on disk is always complete.
+        The state of analyzers is not saved.
+
+        """
+        fileName = fileName or self.checkpointFile
+        box = self.boxManager.box
+        randomState = np.random.get_state()
+        state = dict(version = checkpointVersion,
+                method = self.method,
+                step = self.currentStep,
+                temperature = self.temperature,
+                maxDisp = self.maxDisp,
+                nAccept = self.nAccept,
+                totalPairEnergy = self.totalPairEnergy,
+                totalPairVirial = self.totalPairVirial,
+                length = box.length,
+                coordinates = box.coordinates,
+                randomKeys = randomState[1],
+                randomPosition = randomState[2],
+                randomHasGauss = randomState[3],
+                randomGauss = randomState[4])
+        if self.trajectory is not None:
+            state["trajectoryOffset"] = self.trajectory.tell()
+        propertyOffset = self.logger.tell()
+        if propertyOffset is not None:
+            state["propertyOffset"] = propertyOffset
+        else:
+            state["properties"] = self.getProperties()
+        state["propertyRows"] = self.logger.numRows
+        for name in ("velocities", "forces", "mass"):
+            value = getattr(box, name, None)
+            if value is not None:
+                state[name] = value
+        if self.particleEnergies is not None:
+            state["particleEnergies"] = self.particleEnergies
+            state["particleVirials"] = self.particleVirials
+        neighborList = self.ffManager.neighborList
+        if neighborList is not None and \
+                neighborList.referenceCoordinates is not None:
+            state["neighborReference"] = neighborList.referenceCoordinates
+            state["neighborLength"] = neighborList.length
+        if self.statistics is not None:
+            for name, value in self.statistics.getState().items():
+                state["statistics_" + name] = value
+
+        temporaryFile = fileName + ".tmp"
+        with open(temporaryFile, "wb") as checkpoint:
+            np.savez(checkpoint, **state)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temporaryFile, fileName)
+        self.lastCheckpointTime = time.time()
+
+    def loadCheckpoint(self, fileName = None):
+        """
+        Restores the state of the simulation and of its box from a
+        checkpoint written by writeCheckpoint.
+
+        Parameters
+        ----------
+        fileName: string
+        Location of the checkpoint. Defaults to self.checkpointFile.
+
+        Returns
+        ----------
+        trajectoryOffset: integer or None
+        Size of the trajectory when the checkpoint was written.
+
+        Raises
+        ----------
+        Exception if the checkpoint was written by another method or by
+        an unsupported version.
+
+
+        Notes
+        ----------
+        The global numpy random number generator is restored as well.
+
+        """
+        fileName = fileName or self.checkpointFile
+        with np.load(fileName) as checkpoint:
+            state = dict(checkpoint)
 
-                self.integrator.updatePositions()
-                self.integrator.updateVelocities()
-                pairEnergy, pairVirial = \
-                        self.ffManager.getTotalPairEnergyAndVirial(box, \
-                        populateForces = True)
-                self.integrator.updateVelocities()
+        if int(state["version"]) != checkpointVersion:
+            raise Exception("Unsupported checkpoint version %d"
+                    % int(state["version"]))
+        if str(state["method"]) != self.method:
+            raise Exception("The checkpoint %s was written by a '%s' "
+                    "simulation" % (fileName, str(state["method"])))
 
-                if np.mod(iStep + 1, self.scaleFreq) == 0:
-                    self.boxManager.scaleVelocities(self.temperature)
+        box = self.boxManager.box
+        box.length = float(state["length"])
+        box.coordinates = state["coordinates"].astype(box.dtype, copy=False)
+        box.numParticles = len(box.coordinates)
+        for name in ("velocities", "forces"):
+            if name in state:
+                setattr(box, name, state[name].astype(box.dtype, copy=False))
+        if "mass" in state:
+            box.mass = float(state["mass"])
 
-                if np.mod(iStep + 1, self.printProp) == 0:
-                    totalEnergy = (pairEnergy + tailCorrection) \
-                            / box.numParticles
-                    print(totalEnergy)
+        self.setTemperature(float(state["temperature"]))
+        self.currentStep = int(state["step"])
+        self.maxDisp = float(state["maxDisp"])
+        self.nAccept = int(state["nAccept"])
+        self.totalPairEnergy = float(state["totalPairEnergy"])
+        self.totalPairVirial = float(state["totalPairVirial"])
+        self.logger = PropertyLogger(chunkSize = self.propertyChunkSize)
+        if "properties" in state:
+            self.logger.load(state["properties"])
+        self.particleEnergies = state.get("particleEnergies")
+        self.particleVirials = state.get("particleVirials")
+        self.statistics = None
+        if any(name.startswith("statistics_") for name in state):
+            self.statistics = PropertyStatistics(self.getStatisticsNames())
+            self.statistics.setState(dict((name[len("statistics_"):], value)
+                for name, value in state.items()
+                if name.startswith("statistics_")))
+        np.random.set_state(("MT19937", state["randomKeys"],
+            int(state["randomPosition"]), int(state["randomHasGauss"]),
+            float(state["randomGauss"])))
 
-                if np.mod(iStep + 1, self.printXYZ) == 0:
-                    self.boxManager.printXYZ(trajectory)
+        self.ffManager.cellList = None
+        neighborList = self.ffManager.neighborList
+        if neighborList is not None and "neighborReference" in state:
+            reference = Box(float(state["neighborLength"]))
+            reference.coordinates = state["neighborReference"]
+            reference.numParticles = len(reference.coordinates)
+            neighborList.build(reference)
 
-            trajectory.close()
+        self.resumeOffsets = {}
+        for name in ("trajectoryOffset", "propertyOffset", "propertyRows"):
+            if name in state:
+                self.resumeOffsets[name] = int(state[name])
+        return self.resumeOffsets.get("trajectoryOffset")
+
+    def resume(self, fileName = None):
+        """
+        Continues a run from a checkpoint until self.steps steps are
+        completed.
+
+        Parameters
+        ----------
+        fileName: string
+        Location of the checkpoint. Defaults to self.checkpointFile.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The simulation must be constructed with the same parameters as
+        the interrupted one. Frames and properties written after the
+        checkpoint are discarded, and the run continues bit-identically
+        to an uninterrupted one.
+
+        """
+        offset = self.loadCheckpoint(fileName)
+        box = self.boxManager.box
+        self.startProfiler()
+        self.trajectory = self.openOutput(box, offset)
+        if self.getPropertyFile() is not None:
+            self.logger = PropertyLogger(self.getPropertyFile(),
+                    chunkSize = self.propertyChunkSize,
+                    offset = self.resumeOffsets.get("propertyOffset"),
+                    numRows = self.resumeOffsets.get("propertyRows", 0))
+        self.tailCorrection = self.ffManager.ForceField.getTailCorrection(box)
+        self.pressureCorrection = \
+                self.ffManager.ForceField.getPressureCorrection(box)
+        self.lastCheckpointTime = time.time()
+        self.runUntilEnd()
+
+    def monteCarloStep(self, box, iStep):
+        """
+        Performs a single particle displacement trial move.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        iStep: integer
+        Index of the step.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The energy of the particle before the move is taken from the
+        per-particle cache; only the new position is fully evaluated. If
+        the move is accepted, the old pair terms, needed to update the
+        cache of the old neighbors, are computed only for the few
+        particles near the move found by that evaluation
+        (ForceFieldManager.getMolPairMoveTerms).
+
+        """
+        iParticle = np.random.randint(box.numParticles)
+        randomDisplacement = (2.0 * np.random.rand(3) - 1.0)  \
+                * self.maxDisp
+
+        oldPosition = box.coordinates[iParticle].copy()
+        oldEnergy = self.particleEnergies[iParticle]
+        oldVirial = self.particleVirials[iParticle]
+
+        box.coordinates[iParticle] += randomDisplacement
+        box.coordinates[iParticle] = \
+            box.coordinates[iParticle] - box.length * \
+            np.round(box.coordinates[iParticle]/box.length)
+
+        profiler = self.profiler
+        with profiler.phase("energy"):
+            jParticles, ePairs, wPairs, nearParticles = \
+                    self.ffManager.getMolPairMoveTerms(iParticle, box,
+                    oldPosition)
+        newEnergy = np.sum(ePairs, dtype=np.float64)
+        newVirial = np.sum(wPairs, dtype=np.float64)
+
+        dE = newEnergy - oldEnergy
+        accept = False
+        if dE <= 0.0:
+            accept = True
+        else:
+            randomNumber = np.random.rand(1)[0]
+            factor = self.beta * dE
+            pAcc = np.exp(-factor)
+            if randomNumber < pAcc:
+                accept = True
+        profiler.count("trials")
+        if accept:
+            profiler.count("accepts")
+            self.nAccept = self.nAccept + 1
+            self.totalPairEnergy = self.totalPairEnergy + dE
+            self.totalPairVirial = self.totalPairVirial \
+                    + (newVirial - oldVirial)
+
+            with profiler.phase("cacheUpdate"):
+                oldParticles, oldEPairs, oldWPairs = \
+                        self.ffManager.getMolPairTerms(iParticle, box,
+                        position = oldPosition, candidates = nearParticles)
+                self.particleEnergies[oldParticles] -= oldEPairs
+                self.particleVirials[oldParticles] -= oldWPairs
+                self.particleEnergies[jParticles] += ePairs
+                self.particleVirials[jParticles] += wPairs
+                self.particleEnergies[iParticle] = newEnergy
+                self.particleVirials[iParticle] = newVirial
+                self.ffManager.updateParticle(iParticle, box)
+        else:
+            box.coordinates[iParticle] = oldPosition.copy()
+
+        if self.energyRefreshFreq > 0 and \
+                np.mod(iStep + 1, self.energyRefreshFreq) == 0:
+            with profiler.phase("energy"):
+                self.totalPairEnergy, self.totalPairVirial = \
+                        self.refreshEnergies(box)
+
+        with profiler.phase("properties"):
+            self.monteCarloProperties(box, iStep, accept)
+
+    def monteCarloProperties(self, box, iStep, accept):
+        """
+        Accumulates, records and prints the properties after a MC step and
+        adapts the maximum displacement.
+        """
+        recordDue = np.mod(iStep + 1, self.propertyFreq) == 0
+        printDue = np.mod(iStep + 1, self.printProp) == 0
+        if recordDue or printDue or self.statistics is not None:
+            accRate = float(self.nAccept)/(float(iStep)+1) * 100
+            pressure = self.totalPairVirial
+            pressure += 3.0*box.numParticles/self.beta
+            pressure /= 3.0*np.power(box.length,3)
+            pressure += self.pressureCorrection
+
+            totalEnergy = (self.totalPairEnergy + self.tailCorrection) \
+                    / box.numParticles
+            if self.statistics is not None:
+                self.statistics.add(totalEnergy, pressure, 100.0 * accept)
+            if recordDue:
+                self.logger.record(iStep + 1, totalEnergy, pressure,
+                        self.temperature, accRate, self.maxDisp)
+
+        if printDue:
+            if self.verbose:
+                self.printProperties(iStep+1, totalEnergy, pressure,
+                        accRate, self.maxDisp)
+
+            if accRate < 38.0:
+                self.maxDisp = self.maxDisp*0.8
+            elif accRate > 42.0:
+                self.maxDisp = self.maxDisp*1.2
+
+    def molecularDynamicsStep(self, box, iStep):
+        """
+        Performs a single Velocity Verlet time step.
+
+        Parameters
+        ----------
+        box: box
+        The box containing the particles.
+
+        iStep: integer
+        Index of the step.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        profiler = self.profiler
+        with profiler.phase("integrator"):
+            self.integrator.updatePositions()
+            self.integrator.updateVelocities()
+        with profiler.phase("force"):
+            self.totalPairEnergy, self.totalPairVirial = \
+                    self.ffManager.getTotalPairEnergyAndVirial(box, \
+                    populateForces = True)
+        with profiler.phase("integrator"):
+            self.integrator.updateVelocities()
+
+        if self.scaleFreq > 0 and np.mod(iStep + 1, self.scaleFreq) == 0:
+            with profiler.phase("velocityScaling"):
+                self.boxManager.scaleVelocities(self.temperature)
+
+        with profiler.phase("properties"):
+            self.molecularDynamicsProperties(box, iStep)
+
+    def molecularDynamicsProperties(self, box, iStep):
+        """
+        Accumulates, records and prints the properties after a MD step.
+        """
+        recordDue = np.mod(iStep + 1, self.propertyFreq) == 0
+        printDue = np.mod(iStep + 1, self.printProp) == 0
+        if recordDue or printDue or self.statistics is not None:
+            totalEnergy = (self.totalPairEnergy + self.tailCorrection) \
+                    / box.numParticles
+
+        if recordDue or self.statistics is not None:
+            # Unit mass, kB = 1
+            kineticEnergy = self.boxManager.getKineticEnergy()
+            temperature = kineticEnergy / (1.5 * box.numParticles)
+            pressure = (self.totalPairVirial + 2.0 * kineticEnergy) \
+                    / (3.0 * np.power(box.length, 3)) + self.pressureCorrection
+            if self.statistics is not None:
+                self.statistics.add(totalEnergy, pressure, temperature)
+
+        if recordDue:
+            self.logger.record(iStep + 1, totalEnergy, pressure, temperature)
+
+        if printDue and self.verbose:
+            self.printProperties(totalEnergy)
+
+    def setTemperature(self, temperature):
+        """
+        Changes the target temperature of the simulation.
+        """
+        self.temperature = temperature
+        self.beta = 1.0 / (self.temperature)
+
+    def run(self):
+        """
+        Main driver to perform a Metropolis Monte Carlo or a Molecular
+        Dynamics simulation of the Lennard Jones fluid.
+        """
+        self.setup()
+        self.runUntilEnd()
+
+    def runUntilEnd(self):
+        """
+        Runs the remaining steps and finishes the run. If a step fails,
+        the pending output is still written and the trajectory closed
+        before the exception propagates.
+        """
+        try:
+            self.runSteps(self.steps - self.currentStep)
+        except BaseException:
+            self.trajectory.close()
+            self.logger.close()
+            raise
+        self.finish()
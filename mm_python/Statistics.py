@@ -0,0 +1,311 @@
+import numpy as np
+
+
+class RunningAverage(object):
+    """
+    Running mean and variance of a series, updated one value at a time
+    with Welford's algorithm (numerically stable, constant memory).
+
+    Properties
+    ----------
+    count : integer
+        Number of values.
+    mean : float
+        Mean of the values.
+    m2 : float
+        Sum of the squared deviations from the mean.
+
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        """
+        Adds a value to the series.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def getVariance(self):
+        """
+        Returns the (population) variance of the values, NaN if empty.
+        """
+        if self.count == 0:
+            return np.nan
+        return self.m2 / self.count
+
+
+class BlockAverage(object):
+    """
+    Online Flyvbjerg-Petersen blocking analysis of a correlated series.
+    Level k holds the running mean and variance of the averages of
+    consecutive blocks of 2^k values, so the standard error of the mean
+    can be estimated for every block size without storing the series.
+    Memory grows as O(log T) with the number of values T.
+
+    Properties
+    ----------
+    levels : list of RunningAverage
+        Statistics of the block averages of every level. Level 0 holds
+        the statistics of the values themselves.
+    pending : list of floats
+        For every level, the first half of the next block average, or
+        NaN if there is none.
+
+    Parameters
+    ----------
+    minBlocks : integer, optional, default=16
+        Smallest number of blocks a level needs to be used by getError.
+
+    """
+    def __init__(self, minBlocks = 16):
+        self.minBlocks = minBlocks
+        self.levels = []
+        self.pending = []
+
+    def add(self, value):
+        """
+        Adds a value to the series.
+
+        Parameters
+        ----------
+        value: float
+        New value.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The cost is O(1) amortized: a value is propagated to level k
+        every 2^k additions.
+
+        """
+        level = 0
+        while True:
+            if level == len(self.levels):
+                self.levels.append(RunningAverage())
+                self.pending.append(np.nan)
+            self.levels[level].add(value)
+            if np.isnan(self.pending[level]):
+                self.pending[level] = value
+                return
+            value = 0.5 * (self.pending[level] + value)
+            self.pending[level] = np.nan
+            level += 1
+
+    def getCount(self):
+        """
+        Returns the number of values.
+        """
+        return self.levels[0].count if self.levels else 0
+
+    def getMean(self):
+        """
+        Returns the mean of the values, NaN if empty.
+        """
+        return self.levels[0].mean if self.levels else np.nan
+
+    def getVariance(self):
+        """
+        Returns the variance of the values, NaN if empty.
+        """
+        return self.levels[0].getVariance() if self.levels else np.nan
+
+    def getBlockErrors(self):
+        """
+        Returns the standard error of the mean estimated at every level.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        blockSizes: numpy array
+        Number of values per block (2^k).
+
+        errors: numpy array
+        Standard error of the mean estimated from the block averages,
+        sqrt(variance / (numBlocks - 1)). NaN for levels with fewer than
+        two blocks.
+
+        errorsOfErrors: numpy array
+        Statistical uncertainty of every error, error / sqrt(2 (numBlocks - 1)).
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        For correlated data the errors grow with the block size until the
+        blocks are longer than the correlation time, and then stay on a
+        plateau, which is the true error of the mean.
+
+        """
+        numLevels = len(self.levels)
+        blockSizes = 2**np.arange(numLevels)
+        errors = np.full(numLevels, np.nan)
+        errorsOfErrors = np.full(numLevels, np.nan)
+        for level, statistics in enumerate(self.levels):
+            if statistics.count < 2:
+                continue
+            errors[level] = np.sqrt(statistics.getVariance()
+                    / (statistics.count - 1))
+            errorsOfErrors[level] = errors[level] \
+                    / np.sqrt(2.0 * (statistics.count - 1))
+        return blockSizes, errors, errorsOfErrors
+
+    def getError(self):
+        """
+        Returns an estimate of the standard error of the mean.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        error: float
+        Largest blocking error among the levels with at least minBlocks
+        blocks (the naive error if no level has that many), NaN with
+        fewer than two values.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Taking the largest error among the well sampled levels is a
+        conservative estimate of the plateau.
+
+        """
+        blockSizes, errors, errorsOfErrors = self.getBlockErrors()
+        if len(errors) == 0 or np.isnan(errors[0]):
+            return np.nan
+        counts = np.array([statistics.count for statistics in self.levels])
+        wellSampled = (counts >= self.minBlocks) & ~np.isnan(errors)
+        if not np.any(wellSampled):
+            return errors[0]
+        return np.max(errors[wellSampled])
+
+    def getState(self):
+        """
+        Returns the state of the accumulator as a dictionary of arrays
+        (e.g. to store it in a checkpoint).
+        """
+        return dict(counts = np.array([statistics.count
+                    for statistics in self.levels], dtype=np.int64),
+                means = np.array([statistics.mean
+                    for statistics in self.levels], dtype=float),
+                m2s = np.array([statistics.m2
+                    for statistics in self.levels], dtype=float),
+                pending = np.array(self.pending, dtype=float))
+
+    def setState(self, state):
+        """
+        Restores a state returned by getState.
+        """
+        self.levels = []
+        for count, mean, m2 in zip(state["counts"], state["means"],
+                state["m2s"]):
+            statistics = RunningAverage()
+            statistics.count = int(count)
+            statistics.mean = float(mean)
+            statistics.m2 = float(m2)
+            self.levels.append(statistics)
+        self.pending = [float(value) for value in state["pending"]]
+
+
+class PropertyStatistics(object):
+    """
+    Blocking accumulators for a set of named properties, updated together
+    (e.g. every simulation step).
+
+    Properties
+    ----------
+    names : list of str
+        Names of the properties.
+    accumulators : dict
+        BlockAverage of every property.
+
+    Parameters
+    ----------
+    names : list of str
+        Names of the properties.
+    minBlocks : integer, optional, default=16
+        See BlockAverage.
+
+    """
+    def __init__(self, names, minBlocks = 16):
+        self.names = list(names)
+        self.accumulators = dict((name, BlockAverage(minBlocks))
+                for name in self.names)
+
+    def add(self, *values):
+        """
+        Adds one value of every property, in the order of names.
+        """
+        for name, value in zip(self.names, values):
+            self.accumulators[name].add(value)
+
+    def getAverages(self):
+        """
+        Returns the mean and the standard error of every property.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        averages: dict
+        (mean, error) of every property, keyed by name.
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        None
+
+        """
+        return dict((name, (self.accumulators[name].getMean(),
+            self.accumulators[name].getError())) for name in self.names)
+
+    def getState(self):
+        """
+        Returns the state of all the accumulators as a flat dictionary of
+        arrays, with keys "<name>_<field>".
+        """
+        state = {}
+        for name in self.names:
+            for field, value in self.accumulators[name].getState().items():
+                state["%s_%s" % (name, field)] = value
+        return state
+
+    def setState(self, state):
+        """
+        Restores a state returned by getState.
+        """
+        for name in self.names:
+            self.accumulators[name].setState(dict((field,
+                state["%s_%s" % (name, field)])
+                for field in ("counts", "means", "m2s", "pending")))
@@ -0,0 +1,555 @@
+import io
+import itertools
+import os
+import numpy as np
+from .Box import precisions
+
+# Binary trajectory layout: a fixed 64 byte header followed by frames of
+# constant size, so frame k starts at headerSize + k * frameDtype.itemsize.
+# Header fields are magic, version, numParticles, itemsize of the floating
+# point data (4 or 8), content flags and box length.
+binaryMagic = b"MMPYTRAJ"
+binaryVersion = 1
+headerDtype = np.dtype([("magic", "S8"), ("version", "<i4"),
+        ("numParticles", "<i8"), ("itemSize", "<i4"), ("flags", "<i4"),
+        ("length", "<f8"), ("padding", "V28")])
+headerSize = headerDtype.itemsize
+velocitiesFlag = 1
+forcesFlag = 2
+xyzLineFormat = "%4d   %20.15f   %20.15f   %20.15f   \n"
+
+
+def formatXYZFrame(coordinates):
+    """
+    Formats a configuration as an xyz frame.
+
+    Parameters
+    ----------
+    coordinates: numpy array
+    Particle coordinates (numParticles,3).
+
+    Returns
+    ----------
+    frame: string
+    The particle count, an empty comment line and one indexed line per
+    particle.
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    The whole frame is built with a single string formatting operation.
+
+    """
+    numParticles = len(coordinates)
+    values = np.empty((numParticles, 4))
+    values[:, 0] = np.arange(1, numParticles + 1)
+    values[:, 1:] = coordinates
+    return str(numParticles) + "\n\n" \
+            + (xyzLineFormat * numParticles) % tuple(values.ravel().tolist())
+
+
+def readXYZFrame(xyzFile):
+    """
+    Reads the next frame of an open xyz file.
+
+    Parameters
+    ----------
+    xyzFile: file
+    Text file positioned at the start of a frame (or at the blank lines
+    preceding it).
+
+    Returns
+    ----------
+    coordinates: numpy array or None
+    Particle coordinates (numParticles,3), ordered by the index found in
+    the first column. None at the end of the file.
+
+    Raises
+    ----------
+    Exception if the file ends in the middle of a frame.
+
+
+    Notes
+    ----------
+    The atom block of the frame is parsed in one vectorized call.
+
+    """
+    line = xyzFile.readline()
+    while line and not line.strip():
+        line = xyzFile.readline()
+    if not line:
+        return None
+    numParticles = int(line.split()[0])
+    xyzFile.readline()
+
+    lines = list(itertools.islice(xyzFile, numParticles))
+    if len(lines) < numParticles:
+        raise Exception("Incomplete xyz frame")
+    block = np.loadtxt(lines, ndmin=2)
+
+    coordinates = np.zeros((numParticles, 3))
+    coordinates[block[:, 0].astype(int) - 1] = block[:, 1:4]
+    return coordinates
+
+
+def readXYZFrames(fileName):
+    """
+    Streams the frames of a (multi-frame) xyz trajectory one at a time,
+    without loading the whole file.
+
+    Parameters
+    ----------
+    fileName: string
+    Location of the xyz file.
+
+    Returns
+    ----------
+    frames: generator
+    Yields the coordinates (numParticles,3) of every frame.
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    None
+
+    """
+    with open(fileName, "r") as xyzFile:
+        coordinates = readXYZFrame(xyzFile)
+        while coordinates is not None:
+            yield coordinates
+            coordinates = readXYZFrame(xyzFile)
+
+
+def getFrameDtype(numParticles, itemSize, velocities = False, forces = False):
+    """
+    Builds the record type of one binary trajectory frame.
+
+    Parameters
+    ----------
+    numParticles: integer
+    Number of particles per frame.
+
+    itemSize: integer
+    Size in bytes of the floating point data (4 or 8).
+
+    velocities: bool
+    Whether frames hold velocities.
+
+    forces: bool
+    Whether frames hold forces.
+
+    Returns
+    ----------
+    frameDtype: numpy dtype
+    Structured type with a step field followed by (numParticles,3)
+    coordinates and, optionally, velocities and forces.
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    None
+
+    """
+    floatType = "<f%d" % itemSize
+    fields = [("step", "<i8"),
+            ("coordinates", floatType, (numParticles, 3))]
+    if velocities:
+        fields.append(("velocities", floatType, (numParticles, 3)))
+    if forces:
+        fields.append(("forces", floatType, (numParticles, 3)))
+    return np.dtype(fields)
+
+
+class XYZTrajectoryWriter(object):
+    """
+    Writes frames to a text xyz trajectory in the format of
+    BoxManager.printXYZ.
+
+    Parameters
+    ----------
+    fileName : str
+        Location of the trajectory file. Existing files are overwritten.
+    boxManager : BoxManager
+        Box manager of the simulation.
+    offset : integer, optional, default=None
+        If not `None`, the existing file is truncated to offset bytes
+        (as returned by tell) and new frames are appended to it. Used to
+        resume a run from a checkpoint.
+
+    """
+    def __init__(self, fileName, boxManager, offset = None):
+        self.fileName = fileName
+        self.boxManager = boxManager
+        if offset is None:
+            self.trajectory = open(fileName, "w")
+        else:
+            self.trajectory = open(fileName, "a")
+            self.trajectory.truncate(offset)
+
+    def write(self, box, step):
+        """
+        Appends the current configuration of a box to the trajectory.
+
+        Parameters
+        ----------
+        box: box
+        The box to be written.
+
+        step: integer
+        Current step. Not stored in xyz files.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        The frame is formatted like BoxManager.printXYZ, from the given
+        box, which may be a snapshot of the simulation box.
+
+        """
+        self.trajectory.write(formatXYZFrame(box.coordinates))
+
+    def tell(self):
+        """
+        Flushes the trajectory and returns its size in bytes.
+        """
+        self.trajectory.flush()
+        return self.trajectory.tell()
+
+    def close(self):
+        """
+        Closes the trajectory file.
+        """
+        self.trajectory.close()
+
+
+class BinaryTrajectoryWriter(object):
+    """
+    Writes frames to a binary trajectory with a small header and fixed
+    stride frames. Each frame holds the step, the coordinates and,
+    optionally, the velocities and forces of the box.
+
+    Parameters
+    ----------
+    fileName : str
+        Location of the trajectory file. Existing files are overwritten.
+    box : Box
+        Box whose frames will be written.
+    precision : str, optional, default="double"
+        "single" stores float32 frames, "double" stores float64 frames.
+    velocities : bool, optional, default=False
+        If True, velocities are stored in every frame.
+    forces : bool, optional, default=False
+        If True, forces are stored in every frame.
+    offset : integer, optional, default=None
+        If not `None`, the existing file is truncated to offset bytes
+        (as returned by tell) and new frames are appended to it. Used to
+        resume a run from a checkpoint.
+
+    """
+    def __init__(self, fileName, box, precision = "double",
+            velocities = False, forces = False, offset = None):
+        if precision not in precisions:
+            raise Exception("'precision' must be 'single' or 'double'")
+
+        self.fileName = fileName
+        self.velocities = velocities
+        self.forces = forces
+        itemSize = np.dtype(precisions[precision]).itemsize
+        self.frame = np.zeros(1, dtype=getFrameDtype(box.numParticles,
+                itemSize, velocities, forces))
+
+        header = np.zeros(1, dtype=headerDtype)
+        header["magic"] = binaryMagic
+        header["version"] = binaryVersion
+        header["numParticles"] = box.numParticles
+        header["itemSize"] = itemSize
+        header["flags"] = velocitiesFlag * velocities + forcesFlag * forces
+        header["length"] = box.length
+
+        if offset is None:
+            self.trajectory = open(fileName, "wb")
+            self.trajectory.write(header.tobytes())
+        else:
+            self.trajectory = open(fileName, "ab")
+            self.trajectory.truncate(offset)
+
+    def write(self, box, step):
+        """
+        Appends the current state of a box to the trajectory.
+
+        Parameters
+        ----------
+        box: box
+        The box to be written.
+
+        step: integer
+        Current step.
+
+        Returns
+        ----------
+        None
+
+
+        Raises
+        ----------
+        None
+
+
+        Notes
+        ----------
+        Velocities or forces that the box does not hold (e.g. in Monte
+        Carlo simulations) are stored as zeros.
+
+        """
+        self.frame["step"] = step
+        self.frame["coordinates"] = box.coordinates
+        if self.velocities:
+            velocities = getattr(box, "velocities", None)
+            self.frame["velocities"] = 0.0 if velocities is None else velocities
+        if self.forces:
+            forces = getattr(box, "forces", None)
+            self.frame["forces"] = 0.0 if forces is None else forces
+        self.trajectory.write(self.frame.tobytes())
+
+    def tell(self):
+        """
+        Flushes the trajectory and returns its size in bytes.
+        """
+        self.trajectory.flush()
+        return self.trajectory.tell()
+
+    def close(self):
+        """
+        Closes the trajectory file.
+        """
+        self.trajectory.close()
+
+
+class BinaryTrajectoryReader(object):
+    """
+    Random-access reader for binary trajectories. The file is memory
+    mapped, so frames are zero-copy views and files larger than the
+    available memory can be analyzed.
+
+    Properties
+    ----------
+    numParticles : integer
+        Number of particles per frame.
+    length : float
+        Box length stored in the header.
+    numFrames : integer
+        Number of complete frames in the file.
+    steps : numpy array
+        Step of every frame.
+    coordinates : numpy array
+        (numFrames,numParticles,3) view of all the coordinates.
+    velocities : numpy array or None
+        (numFrames,numParticles,3) view of all the velocities, if stored.
+    forces : numpy array or None
+        (numFrames,numParticles,3) view of all the forces, if stored.
+
+    Parameters
+    ----------
+    fileName : str
+        Location of a trajectory written by BinaryTrajectoryWriter.
+
+    Notes
+    ----------
+    Indexing the reader returns coordinates: reader[k] is one
+    (numParticles,3) frame and reader[start:stop:stride] is a
+    (numFrames,numParticles,3) view.
+
+    """
+    def __init__(self, fileName):
+        header = np.fromfile(fileName, dtype=headerDtype, count=1)
+        if len(header) == 0 or header["magic"][0] != binaryMagic:
+            raise Exception("%s is not a binary trajectory" % fileName)
+        header = header[0]
+
+        self.fileName = fileName
+        self.numParticles = int(header["numParticles"])
+        self.length = float(header["length"])
+        self.frameDtype = getFrameDtype(self.numParticles,
+                int(header["itemSize"]),
+                bool(header["flags"] & velocitiesFlag),
+                bool(header["flags"] & forcesFlag))
+        self.numFrames = (os.path.getsize(fileName) - headerSize) \
+                // self.frameDtype.itemsize
+
+        if self.numFrames > 0:
+            self.frames = np.memmap(fileName, dtype=self.frameDtype,
+                    mode="r", offset=headerSize, shape=(self.numFrames,))
+        else:
+            self.frames = np.zeros(0, dtype=self.frameDtype)
+
+        self.steps = self.frames["step"]
+        self.coordinates = self.frames["coordinates"]
+        if "velocities" in self.frameDtype.names:
+            self.velocities = self.frames["velocities"]
+        else:
+            self.velocities = None
+        if "forces" in self.frameDtype.names:
+            self.forces = self.frames["forces"]
+        else:
+            self.forces = None
+
+    def __len__(self):
+        return self.numFrames
+
+    def __getitem__(self, index):
+        return self.coordinates[index]
+
+    def __iter__(self):
+        for iFrame in range(0, self.numFrames):
+            yield self.coordinates[iFrame]
+
+
+class XYZTrajectoryReader(object):
+    """
+    Random-access reader for text xyz trajectories. The byte offset of
+    every frame is indexed once when the reader is created, so any frame
+    can then be read with a single seek.
+
+    Properties
+    ----------
+    offsets : numpy array
+        Byte offset of the start of every frame.
+    numFrames : integer
+        Number of frames in the file.
+
+    Parameters
+    ----------
+    fileName : str
+        Location of the xyz trajectory.
+
+    Notes
+    ----------
+    reader[k] parses frame k and returns its (numParticles,3)
+    coordinates; reader[start:stop:stride] returns a
+    (numFrames,numParticles,3) array.
+
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.offsets = self._buildIndex()
+        self.numFrames = len(self.offsets)
+        self.fileSize = os.path.getsize(fileName)
+
+    def _buildIndex(self):
+        """
+        Scans the file once and records the offset of every frame.
+        """
+        offsets = []
+        with open(self.fileName, "rb") as xyzFile:
+            offset = 0
+            line = xyzFile.readline()
+            while line:
+                if line.strip():
+                    offsets.append(offset)
+                    numParticles = int(line.split()[0])
+                    for iLine in range(0, numParticles + 1):
+                        xyzFile.readline()
+                offset = xyzFile.tell()
+                line = xyzFile.readline()
+        return np.array(offsets, dtype=np.int64)
+
+    def __len__(self):
+        return self.numFrames
+
+    def getFrame(self, iFrame):
+        """
+        Reads a single frame.
+
+        Parameters
+        ----------
+        iFrame: integer
+        Index of the frame. Negative values count from the end.
+
+        Returns
+        ----------
+        coordinates: numpy array
+        Coordinates (numParticles,3) of the frame.
+
+        Raises
+        ----------
+        IndexError if the frame does not exist.
+
+
+        Notes
+        ----------
+        None
+
+        """
+        if iFrame < 0:
+            iFrame += self.numFrames
+        if iFrame < 0 or iFrame >= self.numFrames:
+            raise IndexError("Frame index out of range")
+        if iFrame + 1 < self.numFrames:
+            end = self.offsets[iFrame + 1]
+        else:
+            end = self.fileSize
+        with open(self.fileName, "rb") as xyzFile:
+            xyzFile.seek(self.offsets[iFrame])
+            text = xyzFile.read(end - self.offsets[iFrame]).decode()
+        return readXYZFrame(io.StringIO(text))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return np.array([self.getFrame(iFrame)
+                    for iFrame in range(*index.indices(self.numFrames))])
+        return self.getFrame(index)
+
+    def __iter__(self):
+        for iFrame in range(0, self.numFrames):
+            yield self.getFrame(iFrame)
+
+
+def openTrajectory(fileName):
+    """
+    Opens a trajectory for random access, detecting its format.
+
+    Parameters
+    ----------
+    fileName: string
+    Location of a binary or xyz trajectory.
+
+    Returns
+    ----------
+    reader: BinaryTrajectoryReader or XYZTrajectoryReader
+    Reader for the trajectory.
+
+    Raises
+    ----------
+    None
+
+
+    Notes
+    ----------
+    None
+
+    """
+    with open(fileName, "rb") as trajectory:
+        magic = trajectory.read(len(binaryMagic))
+    if magic == binaryMagic:
+        return BinaryTrajectoryReader(fileName)
+    return XYZTrajectoryReader(fileName)
@@ -5,6 +5,23 @@ Base __init__ for the mm_python library
 from .Box import Box
 from .BoxManager import BoxManager
 from .ForceFieldManager import ForceFieldManager
+from .CellList import CellList
+from .NeighborList import VerletList
 from .ForceField import LennardJones
 from .Simulation import Simulation
 from .Integrators import VelocityVerlet
+from .Backends import Backend, NumpyBackend, PythonBackend, NumbaBackend, \
+        registerBackend, getBackend, availableBackends
+from .Parallel import ParallelBackend
+from .Ensemble import Ensemble
+from .ReplicaExchange import ReplicaExchange
+from .Trajectory import XYZTrajectoryWriter, BinaryTrajectoryWriter, \
+        readXYZFrames, BinaryTrajectoryReader, XYZTrajectoryReader, \
+        openTrajectory
+from .AsyncWriter import AsyncWriter
+from .PropertyLogger import PropertyLogger
+from .Statistics import RunningAverage, BlockAverage, PropertyStatistics
+from .Profiler import Profiler
+from .RDF import RadialDistributionFunction
+from .Correlation import BlockCorrelator, DiffusionCalculator, \
+        ViscosityCalculator
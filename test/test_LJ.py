@@ -37,3 +37,77 @@ def test_switch():
     assert lj_ff.computeSwitchDerivative(switch**2) == 0.0
     assert lj_ff.computeSwitchDerivative(((switch+cutoff)/2.0)**2) != 0.0
     assert lj_ff.computeSwitchDerivative(cutoff**2) == 0.0
+
+@pytest.mark.parametrize("interpolation, tolerance",
+        [("linear", 2e-3), ("cubic", 1e-5)])
+def test_tabulate(interpolation, tolerance):
+    """
+    Test that tabulated energies and virials match the direct evaluation,
+    with the switch applied.
+
+    """
+
+    cutoff = 2.5
+    rij2 = np.linspace(0.5, cutoff - 1e-6, 5000)**2
+
+    lj_ff = mmpy.LennardJones(cutoff)
+    lj_ff.tabulate(numPoints=4096, rMin=0.8, interpolation=interpolation)
+    energy, virial = lj_ff.getPairEnergyAndVirial(rij2)
+
+    assert np.allclose(energy, lj_ff.evaluate(rij2), rtol=0, atol=tolerance)
+    assert np.allclose(virial, lj_ff.getPairVirial(rij2), rtol=0,
+            atol=10 * tolerance)
+
+    lj_sw = mmpy.LennardJones(cutoff, switch=2.0)
+    lj_sw.tabulate(numPoints=4096, rMin=0.8, interpolation=interpolation)
+    energy, virial = lj_sw.getPairEnergyAndVirial(rij2)
+
+    S = np.array([lj_sw.computeSwitch(r2) for r2 in rij2])
+    dS_dr = np.array([lj_sw.computeSwitchDerivative(r2) for r2 in rij2])
+    bench_energy = lj_sw.evaluate(rij2) * S
+    bench_virial = lj_sw.getPairVirial(rij2) * S \
+            - lj_sw.evaluate(rij2) * np.sqrt(rij2) * dS_dr
+
+    assert np.allclose(energy, bench_energy, rtol=0, atol=tolerance)
+    assert np.allclose(virial, bench_virial, rtol=0, atol=10 * tolerance)
+
+def test_switchedForces():
+    """
+    Test that the switched pair virials used by ForceFieldManager are
+    consistent with the switched energies (forces = -dE/dx), and that the
+    array switch matches the scalar one.
+
+    """
+
+    switch = 2.0
+    cutoff = 2.5
+
+    lj_ff = mmpy.LennardJones(cutoff, switch=switch)
+
+    rij2 = np.linspace(1.5, 2.6, 50)**2
+    S = lj_ff.computeSwitch(rij2)
+    dS_dr = lj_ff.computeSwitchDerivative(rij2)
+    assert np.allclose(S, [lj_ff.computeSwitch(r2) for r2 in rij2])
+    assert np.allclose(dS_dr, [lj_ff.computeSwitchDerivative(r2) for r2 in rij2])
+
+    energy, virial = lj_ff.getPairEnergyAndVirial(rij2)
+    assert np.allclose(energy, lj_ff.evaluate(rij2) * S)
+
+    np.random.seed(1)
+    myBox = mmpy.Box(length=6.0)
+    myBox.numParticles = 60
+    myBox.coordinates = (0.5 - np.random.rand(60, 3)) * 6.0
+    ffManager = mmpy.ForceFieldManager(lj_ff)
+    ffManager.getTotalPairEnergyAndVirial(myBox, populateForces=True)
+    forces = myBox.forces.copy()
+
+    h = 1e-6
+    for iParticle, dim in ((0, 0), (7, 1), (31, 2)):
+        myBox.coordinates[iParticle, dim] += h
+        ePlus = ffManager.getTotalPairEnergyAndVirial(myBox)[0]
+        myBox.coordinates[iParticle, dim] -= 2.0 * h
+        eMinus = ffManager.getTotalPairEnergyAndVirial(myBox)[0]
+        myBox.coordinates[iParticle, dim] += h
+
+        assert np.allclose(forces[iParticle, dim], -(ePlus - eMinus) / (2.0 * h),
+                rtol=1e-4, atol=1e-4)
@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+import mm_python.Backends
+
+
+def _loadBox(numParticles = 200):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+    # The python backend is slow, keep a subset of the particles
+    myBox.coordinates = myBox.coordinates[:numParticles].copy()
+    myBox.numParticles = numParticles
+    myBox.velocities = np.random.RandomState(7).normal(0.0, 1.0,
+            (numParticles, 3))
+    myBox.forces = np.zeros((numParticles, 3))
+    return myBox
+
+
+@pytest.fixture(params = mmpy.availableBackends())
+def backend(request):
+
+    # One instance shared by the managers and integrators of a test; the
+    # workers of the parallel backend are stopped on teardown
+    backend = mmpy.getBackend(request.param)
+    yield backend
+    if hasattr(backend, "close"):
+        backend.close()
+
+
+@pytest.mark.parametrize("switch", [None, 2.5])
+def test_backendConsistency(backend, switch):
+
+    myBox = _loadBox()
+    myForceField = mmpy.LennardJones(cutoff = 3.0, switch = switch)
+    benchManager = mmpy.ForceFieldManager(myForceField,
+            computeVirialTensor = True)
+    ffManager = mmpy.ForceFieldManager(myForceField,
+            computeVirialTensor = True, backend = backend)
+
+    bench_e, bench_w = benchManager.getTotalPairEnergyAndVirial(myBox,
+            populateForces = True)
+    bench_f = myBox.forces.copy()
+    e, w = ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+    assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+    assert np.allclose(myBox.forces, bench_f, rtol=1e-10, atol=1e-10)
+    assert np.allclose(ffManager.virialTensor, benchManager.virialTensor,
+            rtol=1e-10, atol=1e-10)
+
+    for iParticle in (0, 57, 199):
+        myBox.forces = np.zeros((myBox.numParticles, 3))
+        bench_e, bench_w = benchManager.getMolPairEnergyAndVirial(iParticle,
+                myBox, populateForces = True)
+        bench_f = myBox.forces[iParticle].copy()
+        myBox.forces = np.zeros((myBox.numParticles, 3))
+        e, w = ffManager.getMolPairEnergyAndVirial(iParticle, myBox,
+                populateForces = True)
+        assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+        assert np.allclose(myBox.forces[iParticle], bench_f, rtol=1e-10)
+
+        position = myBox.coordinates[iParticle] + 0.1
+        bench_terms = benchManager.getMolPairTerms(iParticle, myBox, position)
+        terms = ffManager.getMolPairTerms(iParticle, myBox, position)
+        assert np.array_equal(terms[0], bench_terms[0])
+        assert np.allclose(terms[1], bench_terms[1], rtol=1e-12)
+        assert np.allclose(terms[2], bench_terms[2], rtol=1e-12)
+
+    benchBox = _loadBox()
+    benchIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = benchBox)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox,
+            backend = backend)
+    myBox.forces = benchBox.forces = np.ones((myBox.numParticles, 3))
+    for integrator in (benchIntegrator, myIntegrator):
+        integrator.updatePositions()
+        integrator.updateVelocities()
+    assert np.allclose(myBox.coordinates, benchBox.coordinates, rtol=1e-14)
+    assert np.allclose(myBox.velocities, benchBox.velocities, rtol=1e-14)
+
+
+def test_backendFallback(monkeypatch):
+
+    monkeypatch.setattr(mm_python.Backends.NumbaBackend, "isAvailable",
+            classmethod(lambda cls: False))
+    assert "numba" not in mmpy.availableBackends()
+    with pytest.warns(UserWarning):
+        backend = mmpy.getBackend("numba")
+    assert isinstance(backend, mmpy.NumpyBackend)
+
+    with pytest.raises(Exception):
+        mmpy.getBackend("fortran")
+
+
+def test_inPlaceIntegration():
+
+    import tracemalloc
+
+    myBox = _loadBox()
+    myBoxManager = mmpy.BoxManager(myBox)
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff = 3.0))
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox)
+    ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+    arrays = (myBox.coordinates, myBox.velocities, myBox.forces)
+
+    # Same result, bit for bit, as the out-of-place expressions
+    dt = 0.001
+    coordinates = myBox.coordinates + myBox.velocities * dt \
+            + 0.5 * myBox.forces * dt * dt
+    coordinates = coordinates - myBox.length \
+            * np.round(coordinates / myBox.length)
+    velocities = myBox.velocities + 0.5 * myBox.forces * dt
+    myIntegrator.updatePositions()
+    myIntegrator.updateVelocities()
+    assert np.array_equal(myBox.coordinates, coordinates)
+    assert np.array_equal(myBox.velocities, velocities)
+
+    # The steady-state updates neither replace nor allocate arrays
+    myBoxManager.scaleVelocities(0.9)
+    ffManager.resetForces(myBox)
+    tracemalloc.start()
+    for iStep in range(0, 5):
+        myIntegrator.updatePositions()
+        myIntegrator.updateVelocities()
+        ffManager.resetForces(myBox)
+        myIntegrator.updateVelocities()
+        myBoxManager.scaleVelocities(0.9)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < myBox.coordinates.nbytes // 2
+    for array, name in zip(arrays, ("coordinates", "velocities", "forces")):
+        assert getattr(myBox, name) is array
+    assert np.isclose(myBoxManager.getKineticEnergy(),
+            1.5 * myBox.numParticles * 0.9)
+
+
+@pytest.mark.skipif(not mmpy.NumbaBackend.isAvailable(),
+        reason = "numba is not installed")
+@pytest.mark.parametrize("useCellList, skin", [(True, None), (False, 0.3),
+    (True, 0.3)])
+def test_numbaBackendOptions(useCellList, skin):
+
+    myBox = _loadBox(800)
+    myForceField = mmpy.LennardJones(cutoff = 2.5, switch = 2.0)
+    benchManager = mmpy.ForceFieldManager(myForceField,
+            computeVirialTensor = True)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList = useCellList,
+            skin = skin, computeVirialTensor = True, backend = "numba")
+
+    bench_e, bench_w = benchManager.getTotalPairEnergyAndVirial(myBox,
+            populateForces = True)
+    bench_f = myBox.forces.copy()
+    e, w = ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+    assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+    assert np.allclose(myBox.forces, bench_f, rtol=1e-10, atol=1e-10)
+    assert np.allclose(ffManager.virialTensor, benchManager.virialTensor,
+            rtol=1e-10, atol=1e-10)
+
+
+@pytest.mark.skipif(not mmpy.NumbaBackend.isAvailable(),
+        reason = "numba is not installed")
+def test_numbaBackendTabulated():
+
+    myBox = _loadBox()
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    myForceField.tabulate()
+    ffManager = mmpy.ForceFieldManager(myForceField, backend = "numba")
+    with pytest.raises(Exception):
+        ffManager.getTotalPairEnergyAndVirial(myBox)
+    with pytest.raises(Exception):
+        ffManager.getMolPairEnergyAndVirial(0, myBox)
+
+
+def test_backendAbstract():
+
+    class IncompleteBackend(mmpy.Backend):
+        def getMolPairTerms(self, ffManager, iParticle, box, position = None):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
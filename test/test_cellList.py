@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def _randomBox(numParticles, length, seed):
+
+    np.random.seed(seed)
+    myBox = mmpy.Box(length=length)
+    myBox.numParticles = numParticles
+    myBox.coordinates = (0.5 - np.random.rand(numParticles, 3)) * length
+    return myBox
+
+
+def test_cellListNeighbors():
+
+    length = 10.0
+    cutoff = 2.5
+    myBox = _randomBox(200, length, 7)
+
+    cellList = mmpy.CellList(length, cutoff)
+    cellList.build(myBox.coordinates)
+
+    assert cellList.numCellsPerSide == 4
+
+    for iParticle in range(0, myBox.numParticles):
+        rij = myBox.coordinates - myBox.coordinates[iParticle]
+        rij = rij - length * np.round(rij / length)
+        rij2 = np.sum(rij * rij, axis=1)
+        inside = np.nonzero(rij2 < cutoff**2)[0]
+
+        neighbors = cellList.getNeighbors(myBox.coordinates[iParticle])
+        assert np.all(np.isin(inside, neighbors))
+
+
+def test_cellListEnergy():
+
+    length = 10.0
+    myBox = _randomBox(200, length, 11)
+    myForceField = mmpy.LennardJones(cutoff=2.5)
+
+    bench_energy = mmpy.ForceFieldManager(myForceField)\
+            .getTotalPairEnergyAndVirial(myBox)
+
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList=True)
+    energy = ffManager.getTotalPairEnergyAndVirial(myBox)
+
+    assert np.allclose(energy, bench_energy)
+
+    # Move one particle and keep the cell list up to date
+    myBox.coordinates[5] = np.array([4.9, -4.9, 0.1])
+    ffManager.updateParticle(5, myBox)
+
+    for iParticle in (5, 17):
+        bench_mol = mmpy.ForceFieldManager(myForceField)\
+                .getMolPairEnergyAndVirial(iParticle, myBox)
+        mol = ffManager.getMolPairEnergyAndVirial(iParticle, myBox)
+        assert np.allclose(mol, bench_mol)
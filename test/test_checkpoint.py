@@ -0,0 +1,141 @@
+import os
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+def _simulation(method, trajectoryFile, checkpointFile, asyncOutput = False):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+
+    if method == "monteCarlo":
+        ffManager = mmpy.ForceFieldManager(myForceField, useCellList = True)
+        return mmpy.Simulation(method = method, temperature = 0.9,
+                steps = 600, printProp = 100, printXYZ = 100, maxDisp = 0.1,
+                ffManager = ffManager, boxManager = myBoxManager,
+                trajectoryFile = trajectoryFile, verbose = False,
+                checkpointFile = checkpointFile, checkpointFreq = 250,
+                asyncOutput = asyncOutput, propertyFile = trajectoryFile + ".csv", propertyFreq = 10,
+                propertyChunkSize = 7)
+
+    np.random.seed(8)
+    myBoxManager.assignVelocities(0.9)
+    ffManager = mmpy.ForceFieldManager(myForceField, skin = 0.3)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.002, box = myBox)
+    return mmpy.Simulation(method = method, temperature = 0.9, steps = 30,
+            printProp = 5, printXYZ = 5, ffManager = ffManager,
+            boxManager = myBoxManager, integrator = myIntegrator,
+            scaleFreq = 10, trajectoryFormat = "binary",
+            trajectoryFile = trajectoryFile, writeVelocities = True,
+            verbose = False, checkpointFile = checkpointFile,
+            checkpointFreq = 12, asyncOutput = asyncOutput,
+            propertyFile = trajectoryFile + ".npy", propertyChunkSize = 4)
+
+
+@pytest.mark.parametrize("asyncOutput", [False, True])
+@pytest.mark.parametrize("method", ["monteCarlo", "molecularDynamics"])
+def test_checkpointRestart(method, asyncOutput, tmp_path):
+
+    # Uninterrupted run
+    np.random.seed(3)
+    reference = _simulation(method, str(tmp_path / "reference.traj"),
+            str(tmp_path / "reference.npz"), asyncOutput)
+    reference.run()
+
+    # Interrupted run: stops without closing after the first checkpoint
+    np.random.seed(3)
+    interrupted = _simulation(method, str(tmp_path / "run.traj"),
+            str(tmp_path / "run.npz"), asyncOutput)
+    interrupted.setup()
+    interrupted.runSteps(reference.steps // 2 + 7)
+    interrupted.trajectory.close()
+    interrupted.logger.close()
+    assert not os.path.exists(str(tmp_path / "run.npz.tmp"))
+
+    # New process state: different random numbers, fresh objects
+    np.random.seed(12345)
+    resumed = _simulation(method, str(tmp_path / "run.traj"),
+            str(tmp_path / "run.npz"), asyncOutput)
+    resumed.resume()
+
+    box = resumed.boxManager.box
+    referenceBox = reference.boxManager.box
+    assert resumed.currentStep == reference.steps
+    assert np.array_equal(box.coordinates, referenceBox.coordinates)
+    assert resumed.getProperties().tobytes() \
+            == reference.getProperties().tobytes()
+    assert resumed.totalPairEnergy == reference.totalPairEnergy
+    assert resumed.maxDisp == reference.maxDisp
+    assert resumed.getAverages() == reference.getAverages()
+    if method == "molecularDynamics":
+        assert np.array_equal(box.velocities, referenceBox.velocities)
+        assert np.array_equal(box.forces, referenceBox.forces)
+    else:
+        assert np.array_equal(resumed.particleEnergies,
+                reference.particleEnergies)
+
+    for extension in ("", ".csv" if method == "monteCarlo" else ".npy"):
+        with open(str(tmp_path / "reference.traj") + extension, "rb") \
+                as referenceFile, \
+                open(str(tmp_path / "run.traj") + extension, "rb") \
+                as resumedFile:
+            assert referenceFile.read() == resumedFile.read()
+
+
+def test_checkpointMethod(tmp_path):
+
+    np.random.seed(3)
+    simulation = _simulation("monteCarlo", str(tmp_path / "mc.xyz"),
+            str(tmp_path / "mc.npz"))
+    simulation.run()
+
+    other = _simulation("molecularDynamics", str(tmp_path / "md.bin"),
+            str(tmp_path / "mc.npz"))
+    with pytest.raises(Exception):
+        other.loadCheckpoint()
+
+
+@pytest.mark.parametrize("propertyFile", [True, False])
+def test_checkpointSize(propertyFile, tmp_path):
+
+    # Recorded properties go to the property file, not to the checkpoint;
+    # without a propertyFile, to the file named after the checkpoint
+    np.random.seed(3)
+    simulation = _simulation("monteCarlo", str(tmp_path / "run.traj"),
+            str(tmp_path / "run.npz"))
+    if not propertyFile:
+        simulation.propertyFile = None
+    simulation.checkpointFreq = 0
+    # The blocking accumulators grow as O(log steps)
+    simulation.accumulateStatistics = False
+    simulation.setup()
+    sizes = []
+    for numSteps in (50, 500):
+        simulation.runSteps(numSteps)
+        simulation.writeCheckpoint()
+        sizes.append(os.path.getsize(str(tmp_path / "run.npz")))
+    simulation.finish()
+    properties = simulation.getProperties()
+    assert len(properties) == 55
+    assert sizes[0] == sizes[1]
+    if not propertyFile:
+        assert simulation.getPropertyFile() \
+                == str(tmp_path / "run_properties.npy")
+        assert np.load(simulation.getPropertyFile()).tobytes() \
+                == properties.tobytes()
+
+    # The properties recorded before the checkpoint survive a restart
+    resumed = _simulation("monteCarlo", str(tmp_path / "run.traj"),
+            str(tmp_path / "run.npz"))
+    if not propertyFile:
+        resumed.propertyFile = None
+    resumed.accumulateStatistics = False
+    resumed.resume()
+    assert resumed.getProperties()[:55].tobytes() == properties.tobytes()
+    assert len(resumed.getProperties()) == 60
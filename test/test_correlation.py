@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def _directCorrelation(x, maxLag, msd=False):
+
+    x = x.reshape(len(x), -1)
+    correlation = np.zeros(maxLag + 1)
+    for lag in range(0, maxLag + 1):
+        if lag >= len(x):
+            correlation[lag] = np.nan
+        elif msd:
+            d = x[lag:] - x[:len(x) - lag]
+            correlation[lag] = np.mean(np.sum(d * d, axis=1))
+        else:
+            correlation[lag] = np.mean(np.sum(x[lag:] * x[:len(x) - lag], axis=1))
+    return correlation
+
+
+@pytest.mark.parametrize("msd", [False, True])
+def test_blockCorrelator(msd):
+
+    np.random.seed(12)
+    x = np.cumsum(np.random.normal(size=(103, 4, 3)), axis=0)
+
+    # Small blocks, so that most pairs of samples cross a block boundary
+    correlator = mmpy.BlockCorrelator(maxLag=15, blockLength=7, msd=msd)
+    for sample in x:
+        correlator.add(sample)
+
+    assert np.allclose(correlator.getCorrelation(),
+            _directCorrelation(x, 15, msd))
+
+
+@pytest.mark.parametrize("msd", [False, True])
+@pytest.mark.parametrize("numSamples, maxLag, blockLength",
+        [(3, 40, None), (10, 100, None), (50, 20, 7), (50, 63, 1)])
+def test_blockCorrelatorShort(numSamples, maxLag, blockLength, msd):
+
+    # Fewer samples, or shorter blocks, than half the largest lag
+    np.random.seed(14)
+    x = np.cumsum(np.random.normal(size=(numSamples, 2, 3)), axis=0)
+
+    correlator = mmpy.BlockCorrelator(maxLag=maxLag, blockLength=blockLength,
+            msd=msd)
+    for sample in x:
+        correlator.add(sample)
+
+    assert np.allclose(correlator.getCorrelation(),
+            _directCorrelation(x, maxLag, msd), equal_nan=True)
+
+    calculator = mmpy.DiffusionCalculator(0.001, maxLag=maxLag,
+            blockLength=blockLength)
+    for frame in x:
+        calculator.accumulate(np.zeros_like(frame), frame, 100.0)
+    assert np.allclose(calculator.getVACF(),
+            _directCorrelation(x, maxLag) / 2.0, equal_nan=True)
+
+
+def test_diffusionRandomWalk():
+
+    np.random.seed(13)
+    timeStep = 0.01
+    sigma = 0.05
+    length = 5.0
+    steps = np.random.normal(scale=sigma, size=(4000, 200, 3))
+    positions = np.cumsum(steps, axis=0)
+
+    calculator = mmpy.DiffusionCalculator(timeStep, maxLag=20)
+    for frame in positions:
+        wrapped = frame - length * np.round(frame / length)
+        calculator.accumulate(wrapped, None, length)
+
+    dGreenKubo, dEinstein = calculator.getDiffusionCoefficient()
+
+    assert np.isnan(dGreenKubo)
+    assert np.allclose(dEinstein, sigma**2 / (2.0 * timeStep), rtol=0.05)
+
+
+@pytest.mark.parametrize("skin", [None, 0.3])
+def test_virialTensor(skin):
+
+    np.random.seed(14)
+    length = 8.0
+    myBox = mmpy.Box(length=length)
+    myBox.numParticles = 300
+    myBox.coordinates = (0.5 - np.random.rand(300, 3)) * length
+    myBox.velocities = np.random.normal(size=(300, 3))
+
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff=2.5),
+            skin=skin, computeVirialTensor=True)
+    ePair, wPair = ffManager.getTotalPairEnergyAndVirial(myBox,
+            populateForces=True)
+
+    assert np.allclose(np.trace(ffManager.virialTensor), wPair)
+    assert np.allclose(ffManager.virialTensor, ffManager.virialTensor.T)
+
+    calculator = mmpy.ViscosityCalculator(ffManager, temperature=1.0,
+            timeStep=0.005, maxLag=4)
+    pressureTensor = calculator.getPressureTensor(myBox)
+    bench_pressure = (np.sum(myBox.velocities**2) + wPair) / (3.0 * length**3)
+    assert np.allclose(np.trace(pressureTensor) / 3.0, bench_pressure)
+
+    for iSample in range(0, 10):
+        calculator.sample(myBox)
+    acf = calculator.getStressACF()
+    offDiagonal = pressureTensor[np.triu_indices(3, k=1)]
+    assert np.allclose(acf, np.mean(offDiagonal**2))
+    assert np.allclose(calculator.getViscosity(),
+            length**3 * np.mean(offDiagonal**2) * 4 * 0.005)
+
+
+@pytest.mark.parametrize("numSamples, maxLag", [(3, 40), (10, 100)])
+def test_viscosityShort(numSamples, maxLag):
+
+    # Fewer samples than half the largest lag
+    np.random.seed(15)
+    pressureTensors = np.random.normal(size=(numSamples, 3, 3))
+    volume = 125.0
+    timeStep = 0.005
+
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff=2.5),
+            computeVirialTensor=True)
+    calculator = mmpy.ViscosityCalculator(ffManager, temperature=1.5,
+            timeStep=timeStep, maxLag=maxLag)
+    for pressureTensor in pressureTensors:
+        calculator.accumulate(pressureTensor, volume)
+
+    offDiagonal = pressureTensors[:, [0, 0, 1], [1, 2, 2]]
+    bench_acf = _directCorrelation(offDiagonal, maxLag) / 3.0
+    acf = calculator.getStressACF()
+    assert np.allclose(acf, bench_acf, equal_nan=True)
+
+    valid = bench_acf[:numSamples]
+    bench_viscosity = volume / 1.5 * np.sum(0.5 * (valid[1:] + valid[:-1])) \
+            * timeStep
+    assert np.allclose(calculator.getViscosity(), bench_viscosity)
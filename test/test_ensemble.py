@@ -0,0 +1,35 @@
+import os
+import numpy as np
+import mm_python as mmpy
+
+
+def test_ensemble(tmp_path):
+
+    statePoints = [(0.9, 0.9), (2.0, 0.5), (1.2, 0.7)]
+    tables = []
+    for numWorkers in (1, 2):
+        ensemble = mmpy.Ensemble(statePoints, numParticles = 64, steps = 400,
+                printProp = 100, printXYZ = 200, seed = 2024,
+                numWorkers = numWorkers,
+                outputDir = str(tmp_path / ("run%d" % numWorkers)))
+        tables.append(ensemble.run())
+
+    # Reproducible and independent of the number of workers
+    assert np.array_equal(tables[0], tables[1])
+
+    results = tables[0]
+    assert len(results) == 3 * 4
+    assert np.array_equal(results["point"], np.repeat([0, 1, 2], 4))
+    assert np.array_equal(ensemble.getStatePoint(1)["step"],
+            [100, 200, 300, 400])
+    assert np.all(ensemble.getStatePoint(2)["targetTemperature"] == 1.2)
+    assert np.all(np.isfinite(results["energy"]))
+
+    # Every state point draws different random numbers
+    assert len(np.unique(results["acceptance"][results["step"] == 100])) > 1
+
+    # Every state point writes its own trajectory
+    for iPoint in range(0, 3):
+        fileName = ensemble.getTrajectoryFile(iPoint)
+        assert os.path.exists(fileName)
+        assert len(mmpy.XYZTrajectoryReader(fileName)) == 3
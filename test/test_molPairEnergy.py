@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def _referenceMolPairEnergyAndVirial(iParticle, box, ForceField):
+
+    eTotal = 0.0
+    wTotal = 0.0
+    force = np.zeros(3)
+    for jParticle in range(0, box.numParticles):
+        if iParticle == jParticle: continue
+        rij = box.coordinates[iParticle] - box.coordinates[jParticle]
+        rij = rij - box.length * np.round(rij / box.length)
+        rij2 = np.sum(np.power(rij, 2))
+        if rij2 < ForceField.cutoff2:
+            wPair = ForceField.getPairVirial(rij2)
+            eTotal += ForceField.evaluate(rij2)
+            wTotal += wPair
+            force += wPair * (rij / rij2)
+    return eTotal, wTotal, force
+
+
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_molPairEnergy(useCellList):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList=useCellList)
+    myBox.forces = np.zeros((myBox.numParticles, 3))
+
+    for iParticle in (0, 123, 799):
+        bench_e, bench_w, bench_f = \
+            _referenceMolPairEnergyAndVirial(iParticle, myBox, myForceField)
+        e, w = ffManager.getMolPairEnergyAndVirial(iParticle, myBox,
+                populateForces=True)
+
+        assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+        assert np.allclose(myBox.forces[iParticle], bench_f, rtol=1e-12)
+
+
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_totalPairEnergy(useCellList):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    benchManager = mmpy.ForceFieldManager(myForceField)
+    myBox.forces = np.zeros((myBox.numParticles, 3))
+
+    bench_e = 0.0
+    bench_w = 0.0
+    for iParticle in range(0, myBox.numParticles):
+        e, w = benchManager.getMolPairEnergyAndVirial(iParticle, myBox,
+                populateForces=True)
+        bench_e += e / 2.0
+        bench_w += w / 2.0
+    bench_forces = myBox.forces.copy()
+
+    # A block size that does not divide the number of particles
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList=useCellList,
+            blockSize=96)
+    e, w = ffManager.getTotalPairEnergyAndVirial(myBox, populateForces=True)
+
+    assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+    assert np.allclose(myBox.forces, bench_forces)
+
+
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_molPairMoveTerms(useCellList):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff = 2.5),
+            useCellList=useCellList)
+
+    rng = np.random.RandomState(4)
+    for iParticle in (0, 123, 799):
+        oldPosition = myBox.coordinates[iParticle].copy()
+        # Moves across the periodic boundary and between cells as well
+        newPosition = oldPosition + rng.uniform(-1.2, 1.2, 3)
+        myBox.coordinates[iParticle] = newPosition - myBox.length \
+                * np.round(newPosition / myBox.length)
+
+        terms = ffManager.getMolPairMoveTerms(iParticle, myBox, oldPosition)
+        bench_terms = ffManager.getMolPairTerms(iParticle, myBox)
+        for value, bench in zip(terms[:3], bench_terms):
+            assert np.array_equal(value, bench)
+
+        # The old terms from the nearby particles only, bit for bit
+        nearParticles = terms[3]
+        assert len(nearParticles) < myBox.numParticles // 2
+        oldTerms = ffManager.getMolPairTerms(iParticle, myBox, oldPosition,
+                nearParticles)
+        bench_terms = ffManager.getMolPairTerms(iParticle, myBox, oldPosition)
+        for value, bench in zip(oldTerms, bench_terms):
+            assert np.array_equal(value, bench)
+        myBox.coordinates[iParticle] = oldPosition
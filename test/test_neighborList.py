@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def test_verletList():
+
+    np.random.seed(3)
+    length = 10.0
+    numParticles = 150
+
+    myBox = mmpy.Box(length=length)
+    myBox.numParticles = numParticles
+    myBox.coordinates = (0.5 - np.random.rand(numParticles, 3)) * length
+
+    myForceField = mmpy.LennardJones(cutoff=2.5)
+    benchManager = mmpy.ForceFieldManager(myForceField)
+    ffManager = mmpy.ForceFieldManager(myForceField, skin=0.4)
+
+    for displacement in (0.0, 0.05, 0.5):
+        myBox.coordinates += displacement * (0.5 - np.random.rand(numParticles, 3))
+
+        bench_energy = benchManager.getTotalPairEnergyAndVirial(myBox,
+                populateForces=True)
+        bench_forces = myBox.forces.copy()
+
+        energy = ffManager.getTotalPairEnergyAndVirial(myBox,
+                populateForces=True)
+
+        assert np.allclose(energy, bench_energy)
+        assert np.allclose(myBox.forces, bench_forces)
+
+    # Built once, kept for the small move, rebuilt after the large one
+    assert ffManager.neighborList.numUpdates == 3
+    assert ffManager.neighborList.numBuilds == 2
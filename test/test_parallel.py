@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_parallelBackend(useCellList):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+    myBox.velocities = np.random.RandomState(3).normal(0.0, 1.0,
+            (myBox.numParticles, 3))
+
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    benchManager = mmpy.ForceFieldManager(myForceField,
+            computeVirialTensor = True)
+    backend = mmpy.ParallelBackend(numWorkers = 3)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList = useCellList,
+            blockSize = 100, computeVirialTensor = True, backend = backend)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox,
+            backend = backend)
+
+    try:
+        for step in range(0, 3):
+            bench_e, bench_w = benchManager.getTotalPairEnergyAndVirial(
+                    myBox, populateForces = True)
+            bench_f = myBox.forces.copy()
+            bench_tensor = benchManager.virialTensor.copy()
+
+            e, w = ffManager.getTotalPairEnergyAndVirial(myBox,
+                    populateForces = True)
+            assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+            assert np.allclose(myBox.forces, bench_f, rtol=1e-10, atol=1e-10)
+            assert np.allclose(ffManager.virialTensor, bench_tensor,
+                    rtol=1e-10, atol=1e-10)
+
+            myIntegrator.updatePositions()
+            myIntegrator.updateVelocities()
+    finally:
+        backend.close()
+
+    # The box keeps valid coordinates after the shared memory is released
+    coordinates = myBox.coordinates.copy()
+    assert np.array_equal(myBox.coordinates, coordinates)
+    assert np.all(np.abs(myBox.coordinates) <= 0.5 * myBox.length)
+
+
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_parallelParameterChange(useCellList):
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile\
+            (restartFile = "test/lj_sample_config_periodic1.txt")
+
+    backend = mmpy.ParallelBackend(numWorkers = 2)
+    myForceField = mmpy.LennardJones(cutoff = 2.5)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList = useCellList,
+            blockSize = 100, backend = backend)
+
+    def change(ForceField):
+        ForceField.cutoff = 3.0
+        ForceField.cutoff2 = 9.0
+
+    # The same force field object is modified between evaluations, and
+    # the workers must pick up the new parameters
+    try:
+        for update in (None, change, lambda ForceField: ForceField.tabulate(),
+                lambda ForceField: ForceField.__init__(3.0, switch = 2.0)):
+            if update is not None:
+                update(myForceField)
+            benchManager = mmpy.ForceFieldManager(myForceField)
+            bench_e, bench_w = benchManager.getTotalPairEnergyAndVirial(
+                    myBox, populateForces = True)
+            bench_f = myBox.forces.copy()
+
+            e, w = ffManager.getTotalPairEnergyAndVirial(myBox,
+                    populateForces = True)
+            assert np.allclose((e, w), (bench_e, bench_w), rtol=1e-12)
+            assert np.allclose(myBox.forces, bench_f, rtol=1e-10, atol=1e-10)
+    finally:
+        backend.close()
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+def _runNVE(precision, numSteps):
+
+    myBox = mmpy.Box(length = 10.0, precision = precision)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    velocities = np.random.RandomState(3).normal(0.0, np.sqrt(0.9),
+            (myBox.numParticles, 3))
+    myBox.velocities = (velocities - velocities.mean(axis=0)) \
+            .astype(myBox.dtype)
+
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff = 3.0),
+            skin = 0.3)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.002, box = myBox)
+    ffManager.getTotalPairEnergyAndVirial(myBox, populateForces = True)
+    energies = []
+    for iStep in range(0, numSteps):
+        myIntegrator.updatePositions()
+        myIntegrator.updateVelocities()
+        ePair, wPair = ffManager.getTotalPairEnergyAndVirial(myBox,
+                populateForces = True)
+        myIntegrator.updateVelocities()
+        kineticEnergy = 0.5 * np.sum(myBox.velocities * myBox.velocities,
+                dtype=np.float64)
+        energies.append((ePair + kineticEnergy) / myBox.numParticles)
+    return myBox, np.array(energies)
+
+
+def test_singlePrecisionDrift():
+
+    doubleBox, doubleEnergies = _runNVE("double", 200)
+    singleBox, singleEnergies = _runNVE("single", 200)
+
+    for name in ("coordinates", "velocities", "forces"):
+        assert getattr(singleBox, name).dtype == np.float32
+        assert getattr(singleBox, name).nbytes \
+                == getattr(doubleBox, name).nbytes // 2
+    assert singleEnergies.dtype == np.float64
+
+    # Total energy per particle follows the double precision path and
+    # drifts by the same amount
+    assert np.max(np.abs(singleEnergies - doubleEnergies)) < 1e-4
+    doubleDrift = doubleEnergies[-1] - doubleEnergies[0]
+    singleDrift = singleEnergies[-1] - singleEnergies[0]
+    assert abs(singleDrift - doubleDrift) < 5e-5
+    assert np.allclose(singleBox.coordinates, doubleBox.coordinates,
+            atol = 1e-3)
+
+
+def test_singlePrecisionMonteCarlo(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(4)
+    myBox = mmpy.Box(length = 10.0, precision = "single")
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff = 3.0),
+            useCellList = True)
+    mySimulation = mmpy.Simulation(method = "monteCarlo", temperature = 0.9,
+            steps = 300, printProp = 100, printXYZ = 300, maxDisp = 0.1,
+            ffManager = ffManager, boxManager = myBoxManager,
+            verbose = False)
+    mySimulation.run()
+
+    assert myBox.coordinates.dtype == np.float32
+    totalPairEnergy, totalPairVirial = mySimulation.refreshEnergies(myBox)
+    assert np.isclose(mySimulation.totalPairEnergy, totalPairEnergy,
+            rtol = 1e-5)
+    assert np.isclose(mySimulation.totalPairVirial, totalPairVirial,
+            rtol = 1e-5)
+
+    with pytest.raises(Exception):
+        mmpy.Box(length = 10.0, precision = "half")
@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+import mm_python as mmpy
+from mm_python.PropertyLogger import PropertyLogger, propertiesDtype
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+@pytest.mark.parametrize("extension", ["csv", "npy"])
+def test_propertyLogger(extension, tmp_path):
+
+    fileName = str(tmp_path / ("properties." + extension))
+    logger = PropertyLogger(fileName, chunkSize = 4)
+    rows = [(step, -5.0 + 0.01*step, 0.1*step, 0.9, 40.0 + step, 0.1)
+            for step in range(1, 12)]
+    for row in rows:
+        logger.record(*row)
+    logger.record(12, -4.0)
+    logger.close()
+
+    bench = np.array(rows + [(12, -4.0, np.nan, np.nan, np.nan, np.nan)],
+            dtype=propertiesDtype)
+    if extension == "csv":
+        data = np.genfromtxt(fileName, delimiter = ",", names = True)
+    else:
+        data = np.load(fileName)
+    for name in propertiesDtype.names:
+        assert np.array_equal(data[name], bench[name], equal_nan = True)
+    # Records written to a file are read back instead of kept in memory
+    assert logger.chunks == []
+    assert logger.toArray().tobytes() == bench.tobytes()
+    assert PropertyLogger(chunkSize = 4).keepInMemory
+
+
+def test_mdProperties(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(2)
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    myBoxManager.assignVelocities(0.9)
+    myBoxManager.scaleVelocities(0.9)
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    ffManager = mmpy.ForceFieldManager(myForceField)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox)
+    mySimulation = mmpy.Simulation(method = "molecularDynamics",
+            temperature = 0.9, steps = 20, printProp = 10, printXYZ = 10,
+            ffManager = ffManager, boxManager = myBoxManager,
+            integrator = myIntegrator, scaleFreq = 5, verbose = False,
+            propertyFile = "properties.npy", propertyFreq = 1,
+            propertyChunkSize = 8)
+    mySimulation.run()
+
+    properties = np.load("properties.npy")
+    assert np.array_equal(properties["step"], np.arange(1, 21))
+    assert properties.tobytes() == mySimulation.getProperties().tobytes()
+
+    # Rescaled every 5 steps to the target temperature
+    assert np.allclose(properties["temperature"][4::5], 0.9)
+    kineticEnergy = 0.5 * np.sum(myBox.velocities**2)
+    virial = ffManager.getTotalPairEnergyAndVirial(myBox)[1]
+    pressure = (virial + 2.0 * kineticEnergy) / (3.0 * 1000.0) \
+            + myForceField.getPressureCorrection(myBox)
+    assert np.isclose(properties["pressure"][-1], pressure, rtol=1e-10)
+    assert np.all(np.isnan(properties["acceptance"]))
+
+
+def test_npyHeaderOnFlush(tmp_path):
+
+    # The .npy file is readable before the logger is closed
+    fileName = str(tmp_path / "properties.npy")
+    logger = PropertyLogger(fileName, chunkSize = 4)
+    for step in range(1, 12):
+        logger.record(step, -5.0 + 0.01*step)
+    assert len(logger.toArray()) == 11
+    data = np.load(fileName)
+    assert np.array_equal(data["step"], np.arange(1, 9))
+
+    # Truncating to an earlier offset, as on resume, rewrites the header
+    offset = logger.tell()
+    assert len(np.load(fileName)) == 11
+    logger.file.close()
+    resumed = PropertyLogger(fileName, chunkSize = 4,
+            offset = offset - 3 * propertiesDtype.itemsize, numRows = 8)
+    assert np.array_equal(np.load(fileName)["step"], np.arange(1, 9))
+    resumed.file.close()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def test_rdfHistogram():
+
+    np.random.seed(8)
+    length = 8.0
+    coordinates = (0.5 - np.random.rand(300, 3)) * length
+
+    rdf = mmpy.RadialDistributionFunction(bins=20, rMax=3.0, blockSize=50)
+    rdf.accumulate(coordinates, length)
+
+    rij = coordinates[:, np.newaxis, :] - coordinates[np.newaxis, :, :]
+    rij = rij - length * np.round(rij / length)
+    r = np.sqrt(np.sum(rij * rij, axis=2))[np.triu_indices(300, k=1)]
+    bench_histogram = np.histogram(r, bins=20, range=(0.0, 3.0))[0]
+
+    assert np.array_equal(rdf.histogram, bench_histogram)
+
+
+def test_rdfIdealGas(tmp_path):
+
+    np.random.seed(9)
+    length = 10.0
+    myBox = mmpy.Box(length=length)
+    myBox.numParticles = 1000
+    myBoxManager = mmpy.BoxManager(myBox)
+
+    rdf = mmpy.RadialDistributionFunction(bins=10)
+    fileName = str(tmp_path / "ideal.xyz")
+    with open(fileName, "w") as trajectory:
+        for iFrame in range(0, 3):
+            myBox.coordinates = (0.5 - np.random.rand(1000, 3)) * length
+            myBoxManager.printXYZ(trajectory)
+            rdf.sample(myBox)
+
+    r, gr = rdf.getRDF()
+    assert rdf.numFrames == 3
+    assert np.allclose(r[-1], 4.75)
+    assert np.allclose(gr[2:], 1.0, atol=0.1)
+
+    streamed = mmpy.RadialDistributionFunction(bins=10)
+    streamed.accumulateTrajectory(fileName, length)
+    assert np.allclose(streamed.getRDF()[1], gr)
+
+    # Binary trajectories use the length of their header
+    fileName = str(tmp_path / "ideal.bin")
+    writer = mmpy.BinaryTrajectoryWriter(fileName, myBox)
+    writer.write(myBox, 0)
+    writer.close()
+    fromHeader = mmpy.RadialDistributionFunction(bins=10)
+    fromHeader.accumulateTrajectory(fileName, 2.0 * length)
+    assert fromHeader.rMax == 0.5 * length
+
+
+def test_rdfNormalization():
+
+    # Two particles at 1.3: each one has exactly one neighbor within rMax,
+    # which is rho' * sum(g(r) * shellVolume) with rho' = (N - 1) / V
+    rdf = mmpy.RadialDistributionFunction(bins=4, rMax=2.0)
+    rdf.accumulate(np.array([[0.0, 0.0, 0.0], [1.3, 0.0, 0.0]]), 5.0)
+    r, gr = rdf.getRDF()
+    edges = np.linspace(0.0, 2.0, 5)
+    shellVolumes = 4.0 / 3.0 * np.pi * (edges[1:]**3 - edges[:-1]**3)
+    assert np.isclose(np.sum(gr * shellVolumes) / 5.0**3, 1.0)
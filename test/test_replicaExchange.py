@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+
+def _mcSimulation(trajectoryFile, steps = 2000):
+
+    myBox = mmpy.Box(length = np.cbrt(64 / 0.8))
+    myBoxManager = mmpy.BoxManager(myBox)
+    np.random.seed(5)
+    myBoxManager.addParticles(n = 64, method = "lattice", mass = 39.0)
+    myForceField = mmpy.LennardJones(cutoff = 0.5 * myBox.length)
+    ffManager = mmpy.ForceFieldManager(myForceField)
+    return mmpy.Simulation(method = "monteCarlo", temperature = 1.0,
+            steps = steps, printProp = 100, printXYZ = 1000,
+            ffManager = ffManager, boxManager = myBoxManager, maxDisp = 0.1,
+            trajectoryFile = trajectoryFile, verbose = False)
+
+
+def test_runSteps(tmp_path):
+
+    np.random.seed(11)
+    simulation = _mcSimulation(str(tmp_path / "a.xyz"))
+    simulation.run()
+
+    np.random.seed(11)
+    stepped = _mcSimulation(str(tmp_path / "b.xyz"))
+    stepped.setup()
+    for numSteps in (150, 350, 1500):
+        stepped.runSteps(numSteps)
+    stepped.finish()
+
+    assert stepped.currentStep == 2000
+    assert np.array_equal(stepped.getProperties(), simulation.getProperties())
+    assert stepped.totalPairEnergy == simulation.totalPairEnergy
+
+
+def test_replicaExchange(tmp_path):
+
+    temperatures = [0.8, 1.0, 1.25, 1.6]
+    runs = []
+    for useProcesses in (True, False):
+        replicaExchange = mmpy.ReplicaExchange(
+                _mcSimulation(str(tmp_path / "trajectory.xyz")),
+                temperatures, swapFreq = 100, seed = 99,
+                useProcesses = useProcesses)
+        replicaExchange.run()
+        runs.append(replicaExchange)
+
+    # Worker processes and in-process replicas give the same results
+    assert np.array_equal(runs[0].energies, runs[1].energies)
+    assert np.array_equal(runs[0].swapAccepts, runs[1].swapAccepts)
+
+    replicaExchange = runs[0]
+    assert replicaExchange.energies.shape == (20, 4)
+    # Even and odd pairs are attempted in alternate rounds
+    assert np.array_equal(replicaExchange.swapAttempts, [10, 10, 10])
+    assert np.any(replicaExchange.swapAccepts > 0)
+    acceptance = replicaExchange.getSwapAcceptance()
+    assert np.all((acceptance >= 0.0) & (acceptance <= 1.0))
+
+    # Every row is a permutation of the replicas
+    for row in replicaExchange.replicaIndices:
+        assert np.array_equal(np.sort(row), np.arange(4))
+    assert (tmp_path / "replica3.xyz").exists()
+
+    # One series per temperature, whichever replica held it
+    for k, records in enumerate(replicaExchange.temperatureProperties):
+        assert np.array_equal(records["step"], np.arange(100, 2001, 100))
+        assert np.all(records["temperature"] == temperatures[k])
+
+    # Energies at the final swap are consistent with the final
+    # configurations held at each temperature
+    myForceField = mmpy.LennardJones(cutoff = 0.5 * np.cbrt(64 / 0.8))
+    ffManager = mmpy.ForceFieldManager(myForceField)
+    for k, iReplica in enumerate(replicaExchange.replicaIndices[-1]):
+        myBox = mmpy.Box(length = np.cbrt(64 / 0.8))
+        myBox.coordinates = replicaExchange.coordinates[iReplica]
+        myBox.numParticles = 64
+        e, w = ffManager.getTotalPairEnergyAndVirial(myBox)
+        assert np.isclose(e, replicaExchange.energies[-1, k], rtol=1e-8)
+
+
+def test_replicaExchangeMethod():
+
+    simulation = _mcSimulation(None)
+    simulation.method = "molecularDynamics"
+    with pytest.raises(Exception):
+        mmpy.ReplicaExchange(simulation, [1.0, 2.0], swapFreq = 10)
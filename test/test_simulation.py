@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+@pytest.mark.parametrize("maxDisp", [0.1, 1.2])
+@pytest.mark.parametrize("useCellList", [False, True])
+def test_mcEnergyCache(useCellList, maxDisp, tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(5)
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile)
+    # A dilute system, where large moves are accepted
+    myBox.coordinates = myBox.coordinates[:300].copy()
+    myBox.numParticles = 300
+
+    # 4 cells per side: the cells around a particle are not the whole box,
+    # and large moves take particles out of the cells of their neighbors
+    myForceField = mmpy.LennardJones(cutoff = 2.5)
+    ffManager = mmpy.ForceFieldManager(myForceField, useCellList=useCellList)
+    if useCellList:
+        assert ffManager.getCellList(myBox).numCellsPerSide == 4
+
+    # printProp = steps: maxDisp is not adapted during the run
+    mySimulation = mmpy.Simulation(
+        method="monteCarlo",
+        temperature=2.0,
+        steps=4000,
+        printProp=4000,
+        printXYZ=4000,
+        maxDisp=maxDisp,
+        ffManager=ffManager,
+        boxManager=myBoxManager,
+        verbose=False)
+    mySimulation.run()
+    assert mySimulation.nAccept > 400
+
+    cachedEnergies = mySimulation.particleEnergies.copy()
+    cachedVirials = mySimulation.particleVirials.copy()
+    totalPairEnergy = mySimulation.totalPairEnergy
+    mySimulation.refreshEnergies(myBox)
+
+    assert np.allclose(cachedEnergies, mySimulation.particleEnergies,
+            rtol=1e-10, atol=1e-10)
+    assert np.allclose(cachedVirials, mySimulation.particleVirials,
+            rtol=1e-10, atol=1e-10)
+    assert np.isclose(totalPairEnergy,
+            0.5 * np.sum(mySimulation.particleEnergies), rtol=1e-10)
+
+
+@pytest.mark.parametrize("method", ["monteCarlo", "molecularDynamics"])
+def test_profile(method, tmp_path, monkeypatch, capsys):
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(6)
+
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+
+    if method == "monteCarlo":
+        ffManager = mmpy.ForceFieldManager(myForceField)
+        mySimulation = mmpy.Simulation(method = method, temperature = 0.9,
+                steps = 200, printProp = 100, printXYZ = 100, maxDisp = 0.1,
+                ffManager = ffManager, boxManager = myBoxManager,
+                verbose = False, profile = True)
+    else:
+        myBoxManager.assignVelocities(0.9)
+        ffManager = mmpy.ForceFieldManager(myForceField, skin = 0.3)
+        myIntegrator = mmpy.VelocityVerlet(timeStep = 0.002, box = myBox)
+        mySimulation = mmpy.Simulation(method = method, temperature = 0.9,
+                steps = 20, printProp = 10, printXYZ = 10,
+                ffManager = ffManager, boxManager = myBoxManager,
+                integrator = myIntegrator, scaleFreq = 5, verbose = False,
+                profile = True, timeUnit = 2.156e-3)
+    mySimulation.run()
+    performance = mySimulation.getPerformance()
+
+    assert performance["steps"] == mySimulation.steps
+    assert performance["pairsInCutoff"] > 0
+    assert performance["pairDistances"] >= performance["pairsInCutoff"]
+    assert performance["stepsPerSecond"] > 0.0
+    assert np.isclose(sum(performance["phases"].values()),
+            performance["wallTime"])
+    if method == "monteCarlo":
+        assert performance["trials"] == mySimulation.steps
+        assert performance["accepts"] == mySimulation.nAccept
+        assert "energy" in performance["phases"]
+    else:
+        # One build at setup, then only when particles moved half the skin
+        assert 1 <= performance["neighborBuilds"] <= mySimulation.steps + 1
+        assert np.isclose(performance["nsPerDay"],
+                performance["timePerDay"] * 2.156e-3)
+        assert "force" in performance["phases"]
+    assert "steps/s" in capsys.readouterr().out
+
+    # A simulation that is not profiled does not count pairs
+    unprofiled = mmpy.Simulation(method = "monteCarlo", temperature = 0.9,
+            steps = 10, printProp = 10, printXYZ = 10, maxDisp = 0.1,
+            ffManager = mmpy.ForceFieldManager(myForceField),
+            boxManager = myBoxManager, verbose = False)
+    unprofiled.run()
+    assert unprofiled.ffManager.numPairDistances == 0
+    with pytest.raises(Exception):
+        unprofiled.getPerformance()
+
+
+def test_profilerNesting():
+
+    import time
+
+    profiler = mmpy.Profiler()
+    profiler.start()
+    with profiler.phase("outer"):
+        with profiler.phase("inner"):
+            # The same phase re-entered is only timed once
+            with profiler.phase("inner"):
+                time.sleep(0.02)
+        time.sleep(0.01)
+    profiler.stop()
+
+    assert profiler.depth == 0
+    assert 0.02 <= profiler.times["inner"] < profiler.times["outer"]
+    # Nested time is not counted twice at the top level
+    assert profiler.topLevelTime == profiler.times["outer"]
+    assert profiler.topLevelTime <= profiler.wallTime
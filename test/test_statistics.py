@@ -0,0 +1,82 @@
+import os
+import numpy as np
+import mm_python as mmpy
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+def test_runningAverage():
+
+    values = np.random.RandomState(1).normal(3.0, 2.0, 1000)
+    blocks = mmpy.BlockAverage()
+    for value in values:
+        blocks.add(value)
+
+    assert blocks.getCount() == len(values)
+    assert np.isclose(blocks.getMean(), np.mean(values))
+    assert np.isclose(blocks.getVariance(), np.var(values))
+
+    # Level k holds the averages of consecutive blocks of 2^k values
+    blockSizes, errors, errorsOfErrors = blocks.getBlockErrors()
+    for level, blockSize in enumerate(blockSizes):
+        numBlocks = len(values) // blockSize
+        blockMeans = values[:numBlocks*blockSize].reshape(numBlocks,
+                blockSize).mean(axis=1)
+        assert blocks.levels[level].count == numBlocks
+        assert np.isclose(blocks.levels[level].mean, np.mean(blockMeans))
+        assert np.isclose(blocks.levels[level].getVariance(),
+                np.var(blockMeans))
+    assert len(blockSizes) == int(np.log2(len(values))) + 1
+
+
+def test_blockingError():
+
+    # AR(1) series: the error of the mean is sqrt((1 + a)/(1 - a)) times the
+    # naive error, which blocking must recover
+    a = 0.9
+    rng = np.random.RandomState(4)
+    numValues = 2**17
+    noise = rng.normal(0.0, 1.0, numValues)
+    blocks = mmpy.BlockAverage()
+    value = 0.0
+    for x in noise:
+        value = a * value + x
+        blocks.add(value)
+
+    stationaryError = np.sqrt(1.0 / (1.0 - a*a) / numValues)
+    trueError = stationaryError * np.sqrt((1.0 + a) / (1.0 - a))
+    blockSizes, errors, errorsOfErrors = blocks.getBlockErrors()
+    assert np.isclose(errors[0], stationaryError, rtol = 0.05)
+    assert np.isclose(blocks.getError(), trueError, rtol = 0.3)
+
+    restored = mmpy.BlockAverage()
+    restored.setState(blocks.getState())
+    assert restored.getError() == blocks.getError()
+    assert restored.getMean() == blocks.getMean()
+
+
+def test_simulationAverages(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(5)
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    ffManager = mmpy.ForceFieldManager(mmpy.LennardJones(cutoff = 3.0))
+    simulation = mmpy.Simulation(method = "monteCarlo", temperature = 0.9,
+            steps = 400, printProp = 100, printXYZ = 400, maxDisp = 0.1,
+            ffManager = ffManager, boxManager = myBoxManager,
+            verbose = False, propertyFreq = 1)
+    simulation.setup()
+    simulation.runSteps(200)
+    assert simulation.statistics.accumulators["energy"].getCount() == 200
+    simulation.runSteps(200)
+    simulation.finish()
+
+    properties = simulation.getProperties()
+    averages = simulation.getAverages()
+    assert np.isclose(averages["energy"][0], np.mean(properties["energy"]))
+    assert np.isclose(averages["pressure"][0], np.mean(properties["pressure"]))
+    assert np.isclose(averages["acceptance"][0], properties["acceptance"][-1])
+    assert averages["energy"][1] > 0.0
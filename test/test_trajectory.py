@@ -0,0 +1,175 @@
+import os
+import numpy as np
+import pytest
+import mm_python as mmpy
+
+configFile = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "lj_sample_config_periodic1.txt")
+
+
+def _mdSimulation(**kwargs):
+
+    np.random.seed(2)
+    myBox = mmpy.Box(length=10.0)
+    myBoxManager = mmpy.BoxManager(myBox)
+    myBoxManager.getConfigFromFile(restartFile = configFile, mass = 39.0)
+    myBoxManager.assignVelocities(0.9)
+
+    myForceField = mmpy.LennardJones(cutoff = 3.0)
+    ffManager = mmpy.ForceFieldManager(myForceField)
+    myIntegrator = mmpy.VelocityVerlet(timeStep = 0.001, box = myBox)
+
+    return mmpy.Simulation(
+        method="molecularDynamics",
+        temperature=0.9,
+        steps=20,
+        printProp=10,
+        printXYZ=10,
+        ffManager=ffManager,
+        boxManager=myBoxManager,
+        integrator=myIntegrator,
+        scaleFreq=10,
+        **kwargs)
+
+
+@pytest.mark.parametrize("precision", ["single", "double"])
+def test_binaryTrajectory(precision, tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    mySimulation = _mdSimulation(trajectoryFormat="binary",
+            trajectoryPrecision=precision, writeVelocities=True,
+            writeForces=True)
+    mySimulation.run()
+    myBox = mySimulation.boxManager.box
+
+    itemSize = 4 if precision == "single" else 8
+    frameDtype = mmpy.Trajectory.getFrameDtype(myBox.numParticles, itemSize,
+            velocities=True, forces=True)
+    data = open("trajectory.bin", "rb").read()
+    header = np.frombuffer(data[:mmpy.Trajectory.headerSize],
+            dtype=mmpy.Trajectory.headerDtype)[0]
+    frames = np.frombuffer(data[mmpy.Trajectory.headerSize:], dtype=frameDtype)
+
+    assert header["numParticles"] == myBox.numParticles
+    assert header["length"] == myBox.length
+    assert np.array_equal(frames["step"], [0, 10, 20])
+    assert np.allclose(frames["coordinates"][-1], myBox.coordinates, atol=1e-6)
+    assert np.allclose(frames["velocities"][-1], myBox.velocities, atol=1e-5)
+    assert np.allclose(frames["forces"][-1], myBox.forces, rtol=1e-5, atol=1e-3)
+
+
+def test_xyzRoundTrip(tmp_path):
+
+    np.random.seed(4)
+    myBox = mmpy.Box(length=10.0)
+    myBox.numParticles = 50
+    myBoxManager = mmpy.BoxManager(myBox)
+
+    frames = [(0.5 - np.random.rand(50, 3)) * 10.0 for iFrame in range(0, 3)]
+    fileName = str(tmp_path / "frames.xyz")
+    with open(fileName, "w") as trajectory:
+        for coordinates in frames:
+            myBox.coordinates = coordinates
+            myBoxManager.printXYZ(trajectory)
+
+    # Same text as the original per-atom formatting
+    bench_text = ""
+    for coordinates in frames:
+        bench_text += "50\n\n"
+        for iParticle in range(0, 50):
+            bench_text += "   ".join(["{0:4d}".format(iParticle + 1)]
+                    + ["{0:20.15f}".format(x) for x in coordinates[iParticle]]
+                    + ["\n"])
+    assert open(fileName).read() == bench_text
+
+    streamed = list(mmpy.Trajectory.readXYZFrames(fileName))
+    assert len(streamed) == 3
+    for coordinates, bench_coordinates in zip(streamed, frames):
+        assert np.allclose(coordinates, bench_coordinates, atol=1e-14)
+
+    readBox = mmpy.Box(length=10.0)
+    mmpy.BoxManager(readBox).getConfigFromFile(restartFile=fileName, frame=1)
+    assert np.allclose(readBox.coordinates, frames[1], atol=1e-14)
+    mmpy.BoxManager(readBox).getConfigFromFile(restartFile=fileName)
+    assert np.allclose(readBox.coordinates, frames[2], atol=1e-14)
+    assert readBox.numParticles == 50
+
+    with pytest.raises(Exception):
+        mmpy.BoxManager(readBox).getConfigFromFile(restartFile=fileName,
+                frame=3)
+
+
+def test_trajectoryReaders(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    mySimulation = _mdSimulation(trajectoryFormat="binary",
+            writeVelocities=True)
+    mySimulation.run()
+    myBox = mySimulation.boxManager.box
+
+    reader = mmpy.openTrajectory("trajectory.bin")
+    assert isinstance(reader, mmpy.BinaryTrajectoryReader)
+    assert len(reader) == 3
+    assert reader.forces is None
+    assert np.array_equal(reader.steps, [0, 10, 20])
+    assert np.array_equal(reader[-1], myBox.coordinates)
+    assert np.array_equal(reader.velocities[2], myBox.velocities)
+    # Slices are views of the mapped file
+    assert np.shares_memory(reader[::2], reader.frames)
+    assert reader[::2].shape == (2, myBox.numParticles, 3)
+
+    with open("trajectory.xyz", "w") as trajectory:
+        for coordinates in reader:
+            myBox.coordinates = coordinates
+            mySimulation.boxManager.printXYZ(trajectory)
+
+    xyzReader = mmpy.openTrajectory("trajectory.xyz")
+    assert isinstance(xyzReader, mmpy.XYZTrajectoryReader)
+    assert len(xyzReader) == 3
+    assert np.allclose(xyzReader[1], reader[1], atol=1e-14)
+    assert np.allclose(xyzReader[::2], reader[::2], atol=1e-14)
+
+
+@pytest.mark.parametrize("trajectoryFormat", ["xyz", "binary"])
+def test_asyncOutput(trajectoryFormat, tmp_path, monkeypatch, capsys):
+
+    monkeypatch.chdir(tmp_path)
+    files = []
+    printed = []
+    for asyncOutput in (False, True):
+        fileName = "trajectory%d.traj" % asyncOutput
+        mySimulation = _mdSimulation(trajectoryFormat=trajectoryFormat,
+                trajectoryFile=fileName, writeVelocities=True,
+                asyncOutput=asyncOutput, outputQueueSize=1)
+        mySimulation.run()
+        files.append(open(fileName, "rb").read())
+        printed.append(capsys.readouterr().out)
+
+    assert files[0] == files[1]
+    assert printed[0] == printed[1]
+
+
+def test_asyncOutputError(tmp_path):
+
+    class FailingWriter(object):
+        def __init__(self):
+            self.closed = False
+        def write(self, box, step):
+            raise IOError("disk full")
+        def close(self):
+            self.closed = True
+
+    myBox = mmpy.Box(length=10.0)
+    myBox.numParticles = 2
+    myBox.coordinates = np.zeros((2, 3))
+    writer = FailingWriter()
+    output = mmpy.AsyncWriter(writer)
+    output.write(myBox, 0)
+    with pytest.raises(Exception, match="disk full"):
+        output.flush()
+
+    # The trajectory is closed even when the last frame fails
+    output.write(myBox, 1)
+    with pytest.raises(Exception, match="disk full"):
+        output.close()
+    assert writer.closed